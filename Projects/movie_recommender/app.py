@@ -1,10 +1,21 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort, Response
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from app.models import db, User, Movie, Rating, WatchHistory
+from sqlalchemy.orm import joinedload
+from app.models import db, User, Movie, Rating, WatchHistory, hydrate_movies
 from app.tmdb_service import TMDbService
-from app.recommendation_engine import RecommendationEngine
+from app.engine_loader import LazyEngine
+from app.precompute import precompute_recommendations, load_precomputed_recommendations
+from app.ingestion import movie_row_from_tmdb, ingest_catalog, IngestionCheckpoint
+from app.movielens import read_links, import_movies, import_ratings, export_ratings
+from app.migrations import run_migrations
+from app.search_index import MovieSearchIndex, movie_to_result
+from app.recommendations_api import rating_version, recommendations_etag, encode_cursor, decode_cursor, resume_position
+from app.metrics import metrics, STAGE_METRIC, init_app as init_metrics
+from app.write_behind import WriteBehindQueue, RatingEvent, RatingDropped, enable_sqlite_wal
 from config import Config
+import click
 import json
+import time
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -17,7 +28,86 @@ login_manager.login_view = 'login'
 
 # Services
 tmdb_service = TMDbService()
-recommendation_engine = RecommendationEngine()
+# Silnik (numpy/scipy, modele) tworzony przy pierwszym użyciu albo w rozgrzewce w tle
+recommendation_engine = LazyEngine(lambda: _create_engine())
+search_index = MovieSearchIndex(
+    title_weight=Config.SEARCH_TITLE_WEIGHT,
+    popularity_weight=Config.SEARCH_POPULARITY_WEIGHT,
+    candidates=Config.SEARCH_CANDIDATES,
+    recheck_interval=Config.SEARCH_INDEX_RECHECK_INTERVAL
+)
+
+# Zapisy ocen i historii w tle (paczkami), SQLite w trybie WAL
+if Config.SQLITE_WAL:
+    enable_sqlite_wal(app)
+write_queue = WriteBehindQueue(
+    app,
+    flush_interval=Config.WRITE_BEHIND_FLUSH_INTERVAL,
+    max_pending=Config.WRITE_BEHIND_MAX_PENDING
+)
+
+
+def _create_engine():
+    """Silnik z dostępem do ocen z kolejki zapisów, których nie ma jeszcze w bazie"""
+    from app.recommendation_engine import RecommendationEngine
+    return RecommendationEngine(pending_ratings=write_queue.pending_ratings)
+
+
+def _apply_write_event(event):
+    """Przyrostowa aktualizacja silnika od razu po przyjęciu oceny"""
+    # Silnik, który jeszcze nie powstał, wczyta macierz ocen z bazy i kolejki zapisów
+    engine = recommendation_engine.if_loaded()
+    if engine is not None and isinstance(event, RatingEvent):
+        engine.rating_saved(event.user_id, event.movie_id, event.rating)
+    elif engine is not None and isinstance(event, RatingDropped):
+        engine.rating_dropped(event.user_id, event.movie_id)
+
+
+write_queue.subscribe(_apply_write_event)
+
+
+def _movie_exists(movie_id):
+    """
+    Czy film jest w katalogu - z migawki wczytanego silnika; baza tylko gdy
+    silnika nie ma albo filmu nie ma jeszcze w migawce (dodany przez inny proces)
+    """
+    engine = recommendation_engine.if_loaded()
+    if engine is not None and movie_id in engine.get_catalog():
+        return True
+    return db.session.query(Movie.id).filter_by(id=movie_id).first() is not None
+
+# Instrumentacja (czas żądań, zapytania SQL, wolne żądania)
+init_metrics(app, db)
+
+
+def _service_metrics():
+    """Liczniki cache rekomendacji, cache TMDb i transportu HTTP dla /metrics"""
+    samples = []
+    engine = recommendation_engine.if_loaded()
+    if engine is not None:
+        cache_stats = engine.cache.stats()
+        for name in ('hits', 'misses', 'evictions', 'invalidations'):
+            samples.append(('counter', f'recommendation_cache_{name}_total', {}, cache_stats[name]))
+        samples.append(('gauge', 'recommendation_cache_size', {}, cache_stats['size']))
+    if tmdb_service.cache is not None:
+        for name, value in tmdb_service.cache.stats().items():
+            samples.append(('counter', f'tmdb_cache_{name}_total', {}, value))
+    for endpoint, stats in tmdb_service.get_transport_stats().items():
+        for name in ('requests', 'errors', 'retries'):
+            samples.append(('counter', f'tmdb_{name}_total', {'endpoint': endpoint}, stats[name]))
+        samples.append(('gauge', 'tmdb_request_latency_max_seconds', {'endpoint': endpoint}, stats['latency_max']))
+    return samples
+
+
+metrics.register_collector(_service_metrics)
+
+
+@app.before_request
+def _warm_up_engine():
+    """Rozgrzewka silnika w tle po pierwszym żądaniu (serwer już przyjmuje ruch)"""
+    if Config.ENGINE_WARM_UP:
+        recommendation_engine.warm_up(app)
+
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -94,25 +184,117 @@ def logout():
 @login_required
 def dashboard():
     """Panel użytkownika z rekomendacjami"""
-    recommendations = recommendation_engine.get_recommendations(current_user.id)
+    # Najpierw rekomendacje przeliczone nocą, online tylko dla brakujących/nieaktualnych
+    # (pomijane, gdy w kolejce czekają jeszcze niezapisane oceny użytkownika)
+    recommendations = None
+    if not write_queue.has_pending_ratings(current_user.id):
+        with metrics.timer(STAGE_METRIC, stage='load_precomputed'):
+            recommendations = load_precomputed_recommendations(current_user.id)
+    if recommendations is None:
+        recommendations = recommendation_engine.get().get_recommendations(
+            current_user.id, rating_version=rating_version(current_user.id, write_queue)
+        )
     
-    # Pobierz obiekty filmów
-    movie_objects = []
-    for rec in recommendations:
-        movie = Movie.query.get(rec['movie_id'])
-        if movie:
-            movie_objects.append(movie)
+    # Pobierz obiekty filmów (jedno zapytanie, kolejność rekomendacji)
+    with metrics.timer(STAGE_METRIC, stage='hydrate_movies'):
+        movie_objects = hydrate_movies(rec['movie_id'] for rec in recommendations)
     
     return render_template('dashboard.html', recommendations=movie_objects)
 
 
+@app.route('/api/recommendations')
+def api_recommendations():
+    """Rekomendacje jako JSON ze stronicowaniem kursorem i ETag (304 bez przeliczania)"""
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Authentication required'}), 401
+    limit = min(max(request.args.get('limit', Config.API_PAGE_SIZE, type=int), 1), Config.API_MAX_PAGE_SIZE)
+    try:
+        cursor = decode_cursor(request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    # ETag z wersji ocen i modelu - sprawdzany przed liczeniem rekomendacji
+    engine = recommendation_engine.get()
+    user_rating_version = rating_version(current_user.id, write_queue)
+    etag = recommendations_etag(
+        current_user.id,
+        user_rating_version,
+        engine.model_version(),
+        Config.RECOMMENDATION_CACHE_TTL
+    )
+    if request.if_none_match.contains(etag):
+        metrics.inc('api_recommendations_total', status='304')
+        response = Response(status=304)
+    else:
+        metrics.inc('api_recommendations_total', status='200')
+        recommendations = engine.get_recommendations(
+            current_user.id, limit=Config.API_RECOMMENDATIONS_LIMIT, rating_version=user_rating_version
+        )
+        # Przy zimnym starcie artefakty powstają dopiero w trakcie liczenia -
+        # ETag z wersji modelu, z której faktycznie policzono wyniki
+        etag = recommendations_etag(
+            current_user.id,
+            user_rating_version,
+            engine.model_version(),
+            Config.RECOMMENDATION_CACHE_TTL
+        )
+        start = resume_position(recommendations, cursor)
+        page = recommendations[start:start + limit]
+        
+        # Tylko kolumny potrzebne w odpowiedzi, jedno zapytanie dla strony
+        with metrics.timer(STAGE_METRIC, stage='hydrate_movies'):
+            movies = {
+                row.id: row for row in db.session.query(Movie.id, Movie.tmdb_id, Movie.title, Movie.poster_path)
+                .filter(Movie.id.in_([item['movie_id'] for item in page]))
+            }
+        items = [
+            {
+                'id': movie.id,
+                'tmdb_id': movie.tmdb_id,
+                'title': movie.title,
+                'poster_url': tmdb_service.get_poster_url(movie.poster_path),
+                'score': round(item['score'], 6),
+            }
+            for item in page
+            for movie in [movies.get(item['movie_id'])] if movie is not None
+        ]
+        end = start + len(page)
+        next_cursor = encode_cursor(end, page[-1]['movie_id']) if page and end < len(recommendations) else None
+        response = jsonify({'items': items, 'next_cursor': next_cursor})
+    
+    response.set_etag(etag)
+    # Pośrednik (edge cache) może trzymać odpowiedź per sesja, ale zawsze ją rewaliduje
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Cookie')
+    return response
+
+
 @app.route('/search')
 def search():
-    """Wyszukiwanie filmów"""
+    """
+    Wyszukiwanie filmów - pierwsza strona z lokalnego katalogu. TMDb dla
+    zapytań bez lokalnych trafień (albo gdy indeks jest niedostępny), dalszych
+    stron i po wybraniu "więcej wyników z TMDb" (source=tmdb).
+    """
     query = request.args.get('q', '')
+    page = request.args.get('page', 1, type=int)
     if query:
-        results = tmdb_service.search_movies(query)
-        return render_template('search.html', movies=results['results'] if results else [], query=query)
+        local = None
+        if page == 1 and request.args.get('source') != 'tmdb':
+            local = search_index.search(query, limit=Config.SEARCH_PAGE_SIZE)
+        if local:
+            movies = [movie_to_result(movie) for movie in local]
+            source = 'local'
+            total_pages = None
+        else:
+            results = tmdb_service.search_movies(query, page=page)
+            movies = results['results'] if results else []
+            source = 'tmdb'
+            total_pages = results.get('total_pages') if results else None
+        metrics.inc('search_requests_total', source=source)
+        return render_template(
+            'search.html', movies=movies, query=query, page=page, source=source, total_pages=total_pages
+        )
     return render_template('search.html', movies=[], query='')
 
 
@@ -126,27 +308,21 @@ def movie_detail(tmdb_id):
         # Pobierz z TMDb i dodaj do bazy
         movie_data = tmdb_service.get_movie_details(tmdb_id)
         if movie_data:
-            genres = json.dumps([g['name'] for g in movie_data.get('genres', [])])
-            movie = Movie(
-                tmdb_id=tmdb_id,
-                title=movie_data['title'],
-                genres=genres,
-                release_year=int(movie_data.get('release_date', '0000')[:4]) if movie_data.get('release_date') else None,
-                overview=movie_data.get('overview'),
-                poster_path=movie_data.get('poster_path'),
-                backdrop_path=movie_data.get('backdrop_path'),
-                average_rating=movie_data.get('vote_average', 0),
-                vote_count=movie_data.get('vote_count', 0),
-                popularity=movie_data.get('popularity', 0)
-            )
+            movie = Movie(**movie_row_from_tmdb(movie_data))
             db.session.add(movie)
             db.session.commit()
+            # Tylko silnik już wczytany - strona filmu nie ładuje ani nie buduje modeli
+            engine = recommendation_engine.if_loaded()
+            if engine is not None:
+                engine.movie_added(movie)
     
     # Pobierz ocenę użytkownika jeśli zalogowany
     user_rating = None
     if current_user.is_authenticated:
-        rating_obj = Rating.query.filter_by(user_id=current_user.id, movie_id=movie.id).first()
-        user_rating = rating_obj.rating if rating_obj else None
+        user_rating = write_queue.pending_rating(current_user.id, movie.id)
+        if user_rating is None:
+            rating_obj = Rating.query.filter_by(user_id=current_user.id, movie_id=movie.id).first()
+            user_rating = rating_obj.rating if rating_obj else None
     
     return render_template('movie_detail.html', movie=movie, user_rating=user_rating)
 
@@ -160,16 +336,12 @@ def rate_movie(movie_id):
     if rating_value < 1 or rating_value > 5:
         return jsonify({'error': 'Rating must be between 1 and 5'}), 400
     
-    # Sprawdź czy ocena już istnieje
-    existing_rating = Rating.query.filter_by(user_id=current_user.id, movie_id=movie_id).first()
-    
-    if existing_rating:
-        existing_rating.rating = rating_value
-    else:
-        new_rating = Rating(user_id=current_user.id, movie_id=movie_id, rating=rating_value)
-        db.session.add(new_rating)
+    # Kolejka przyjmuje tylko istniejące filmy - błędny wiersz nie trafia do paczki zapisów
+    if not _movie_exists(movie_id):
+        return jsonify({'error': 'Movie not found'}), 404
     
-    db.session.commit()
+    # Zapis (insert lub update) w tle, silnik aktualizowany od razu
+    write_queue.rate(current_user.id, movie_id, rating_value)
     flash('Ocena zapisana!', 'success')
     return redirect(request.referrer or url_for('dashboard'))
 
@@ -178,22 +350,26 @@ def rate_movie(movie_id):
 @login_required
 def my_ratings():
     """Moje oceny"""
-    ratings = Rating.query.filter_by(user_id=current_user.id).order_by(Rating.timestamp.desc()).all()
-    return render_template('my_ratings.html', ratings=ratings)
+    page = request.args.get('page', 1, type=int)
+    pagination = (
+        Rating.query.filter_by(user_id=current_user.id)
+        .options(joinedload(Rating.movie))
+        .order_by(Rating.timestamp.desc())
+        .paginate(page=page, per_page=Config.LIST_PAGE_SIZE, error_out=False)
+    )
+    return render_template('my_ratings.html', ratings=pagination.items, pagination=pagination)
 
 
 @app.route('/add-to-history/<int:movie_id>', methods=['POST'])
 @login_required
 def add_to_history(movie_id):
     """Dodaj do historii oglądania"""
-    # Sprawdź czy już nie ma w historii
-    existing = WatchHistory.query.filter_by(user_id=current_user.id, movie_id=movie_id).first()
+    if not _movie_exists(movie_id):
+        return jsonify({'error': 'Movie not found'}), 404
     
-    if not existing:
-        history = WatchHistory(user_id=current_user.id, movie_id=movie_id)
-        db.session.add(history)
-        db.session.commit()
-        flash('Dodano do historii oglądania', 'success')
+    # Zapis w tle, duplikaty (film już w historii) są pomijane przy zapisie
+    write_queue.watch(current_user.id, movie_id)
+    flash('Dodano do historii oglądania', 'success')
     
     return redirect(request.referrer or url_for('dashboard'))
 
@@ -202,11 +378,166 @@ def add_to_history(movie_id):
 @login_required
 def my_history():
     """Moja historia oglądania"""
-    history = WatchHistory.query.filter_by(user_id=current_user.id).order_by(WatchHistory.watched_at.desc()).all()
-    return render_template('my_history.html', history=history)
+    page = request.args.get('page', 1, type=int)
+    pagination = (
+        WatchHistory.query.filter_by(user_id=current_user.id)
+        .options(joinedload(WatchHistory.movie))
+        .order_by(WatchHistory.watched_at.desc())
+        .paginate(page=page, per_page=Config.LIST_PAGE_SIZE, error_out=False)
+    )
+    return render_template('my_history.html', history=pagination.items, pagination=pagination)
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Metryki w formacie tekstowym Prometheusa"""
+    if not metrics.enabled:
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+# CLI
+
+@app.cli.command('migrate-db')
+def migrate_db():
+    """Aktualizuje schemat bazy (nowe kolumny, uzupełnienie danych)"""
+    applied = run_migrations()
+    print('Wykonano migracje: ' + (', '.join(applied) if applied else 'brak zmian'))
+
+
+@app.cli.command('build-content-index')
+def build_content_index():
+    """Buduje offline indeks top-K podobnych filmów (gatunki)"""
+    index = recommendation_engine.get().build_content_index()
+    print(f'Zbudowano indeks podobieństwa dla {len(index)} filmów')
+
+
+@app.cli.command('train-mf')
+def train_mf():
+    """Trenuje offline model czynników ukrytych (ALS) z tabeli ocen"""
+    model = recommendation_engine.get().train_mf_model()
+    print(f'Wytrenowano model {model.version}: {len(model.user_ids)} użytkowników, {len(model.movie_ids)} filmów')
+
+
+@app.cli.command('build-content-features')
+def build_content_features():
+    """Koduje offline opisy i gatunki filmów do wektorów treści"""
+    features = recommendation_engine.get().build_content_features()
+    print(f'Zakodowano wektory treści dla {len(features)} filmów')
+
+
+@app.cli.command('build-item-neighbors')
+def build_item_neighbors():
+    """Buduje offline top-K sąsiadów item-item (adjusted cosine) z tabeli ocen"""
+    index = recommendation_engine.get().build_item_neighbors()
+    print(f'Zbudowano sąsiedztwo item-item dla {len(index)} filmów')
+
+
+@app.cli.command('precompute-recommendations')
+@click.option('--workers', type=int, default=None, help='Liczba procesów (domyślnie wszystkie rdzenie)')
+@click.option('--batch-size', type=int, default=None, help='Liczba użytkowników w paczce')
+def precompute_recommendations_command(workers, batch_size):
+    """Przelicza top-N rekomendacji dla wszystkich aktywnych użytkowników"""
+    count = precompute_recommendations(app, recommendation_engine.get(), batch_size=batch_size, workers=workers)
+    print(f'Przeliczono rekomendacje dla {count} użytkowników')
+
+
+@app.cli.command('evaluate')
+@click.option('--grid', 'grid_specs', multiple=True, metavar='NAZWA=v1,v2',
+              help='Oś siatki, np. CONTENT_BASED_WEIGHT=0.5,0.7 (można powtarzać)')
+@click.option('--k', type=int, default=None, help='Długość listy dla precision/recall/NDCG')
+@click.option('--test-fraction', type=float, default=None, help='Udział najnowszych ocen w zbiorze testowym')
+@click.option('--split', type=click.Choice(['global', 'user']), default='global',
+              help='Wspólny punkt odcięcia w czasie albo najnowsze oceny każdego użytkownika')
+@click.option('--workers', type=int, default=None, help='Liczba procesów (domyślnie wszystkie rdzenie)')
+@click.option('--batch-size', type=int, default=None, help='Liczba użytkowników w zadaniu puli')
+@click.option('--max-users', type=int, default=None, help='Losowa próbka użytkowników testowych')
+@click.option('--latency-users', type=int, default=None, help='Użytkownicy do pomiaru opóźnienia serwowania')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help='Zapis wyników jako JSON')
+def evaluate_command(grid_specs, k, test_fraction, split, workers, batch_size, max_users, latency_users, output):
+    """Ewaluacja offline (podział czasowy): jakość i opóźnienie dla siatki parametrów"""
+    # numpy/scipy i silnik ładowane dopiero tutaj (szybki import aplikacji)
+    from app.evaluation import evaluate, parse_grid
+    try:
+        grid = parse_grid(grid_specs)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--grid')
+    report = evaluate(
+        app, grid, k=k, test_fraction=test_fraction, split=split, batch_size=batch_size, workers=workers,
+        latency_users=latency_users, max_users=max_users
+    )
+    k = report['k']
+    print(f"Podział: {report['cutoff'] or 'per użytkownik'}, {report['train_ratings']} ocen treningowych, "
+          f"{report['evaluated_users']} użytkowników, {report['seconds']['total']:.1f} s")
+    print(f"{'parametry':<48} {'P@' + str(k):>8} {'R@' + str(k):>8} {'NDCG':>8} {'pokrycie':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for result in report['results']:
+        params = ', '.join(f'{name}={value}' for name, value in result['params'].items()) or 'Config'
+        print(f"{params:<48} {result[f'precision@{k}']:>8.4f} {result[f'recall@{k}']:>8.4f} "
+              f"{result[f'ndcg@{k}']:>8.4f} {result['coverage']:>9.4f} "
+              f"{result['latency']['p50_ms']:>8.2f} {result['latency']['p95_ms']:>8.2f}")
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+@app.cli.command('ingest-catalog')
+@click.option('--pages', type=int, default=20, help='Liczba stron na źródło (TMDb: maks. 500)')
+@click.option('--by-genre', is_flag=True, help='Pobierz także discover dla każdego gatunku')
+@click.option('--workers', type=int, default=Config.INGEST_WORKERS, help='Liczba równoległych zapytań')
+@click.option('--batch-size', type=int, default=Config.INGEST_BATCH_SIZE, help='Filmów na jeden upsert')
+@click.option('--restart', is_flag=True, help='Zignoruj checkpoint i zacznij od początku')
+@click.option('--rebuild-index', is_flag=True, help='Przebuduj indeks podobieństwa po imporcie')
+def ingest_catalog_command(pages, by_genre, workers, batch_size, restart, rebuild_index):
+    """Masowy import katalogu filmów z TMDb do tabeli movies"""
+    if restart:
+        IngestionCheckpoint(Config.INGEST_CHECKPOINT_PATH).reset()
+    genre_ids = [g['id'] for g in tmdb_service.get_movie_genres()] if by_genre else None
+    stats = ingest_catalog(
+        tmdb_service,
+        pages=pages,
+        genre_ids=genre_ids,
+        workers=workers,
+        batch_size=batch_size,
+        checkpoint_path=Config.INGEST_CHECKPOINT_PATH
+    )
+    print(f"Zapisano {stats['movies']} filmów z {stats['pages']} stron "
+          f"(pominięte z checkpointu: {stats['skipped_pages']}, błędy: {stats['failed_pages']})")
+    if rebuild_index:
+        recommendation_engine.get().build_content_index()
+
+
+@app.cli.command('import-ratings')
+@click.argument('ratings_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--links', 'links_path', type=click.Path(exists=True, dir_okay=False), required=True,
+              help='links.csv MovieLens (movieId -> tmdbId)')
+@click.option('--movies', 'movies_path', type=click.Path(exists=True, dir_okay=False),
+              help='movies.csv MovieLens - dodaje brakujące filmy do katalogu')
+@click.option('--chunk-size', type=int, default=Config.RATINGS_CSV_CHUNK_SIZE, help='Wierszy na jeden zapis')
+def import_ratings_command(ratings_path, links_path, movies_path, chunk_size):
+    """Strumieniowy import ocen z pliku CSV w formacie MovieLens"""
+    started = time.perf_counter()
+    links = read_links(links_path)
+    if movies_path:
+        print(f'Dodano {import_movies(movies_path, links)} filmów z {movies_path}')
+    stats = import_ratings(ratings_path, links, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - started
+    print(f"Zapisano {stats['ratings']} ocen w {elapsed:.1f} s ({stats['ratings'] / max(elapsed, 1e-9):.0f}/s), "
+          f"nowi użytkownicy: {stats['users']}, pominięte (brak filmu): {stats['skipped']}, "
+          f"przycięte do skali 1-5: {stats['clipped']}")
+
+
+@app.cli.command('export-ratings')
+@click.argument('ratings_path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--links', 'links_path', type=click.Path(dir_okay=False, writable=True),
+              help='Zapisz też links.csv (movieId -> tmdbId)')
+@click.option('--chunk-size', type=int, default=Config.RATINGS_CSV_CHUNK_SIZE, help='Wierszy na jedno zapytanie')
+def export_ratings_command(ratings_path, links_path, chunk_size):
+    """Strumieniowy eksport ocen do pliku CSV w formacie MovieLens"""
+    count = export_ratings(ratings_path, links_path=links_path, chunk_size=chunk_size)
+    print(f'Wyeksportowano {count} ocen do {ratings_path}')
 
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        run_migrations()
     app.run(debug=True)
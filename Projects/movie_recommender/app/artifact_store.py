@@ -0,0 +1,116 @@
+"""
+Wersjonowane artefakty modeli jako płaskie pliki .npy.
+
+Układ katalogu:
+    <root>/<nazwa>/<wersja>/<tablica>.npy
+    <root>/<nazwa>/<wersja>/meta.json
+    <root>/<nazwa>/CURRENT        - nazwa bieżącej wersji
+
+Nowa wersja zapisywana jest do katalogu tymczasowego, przenoszona na miejsce
+i dopiero wtedy publikowana podmianą pliku CURRENT (os.replace - atomowo).
+Procesy robocze otwierają tablice przez np.load(mmap_mode='r'), więc wszystkie
+korzystają z jednej kopii w page cache systemu zamiast wczytywać własną.
+"""
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+import numpy as np
+
+CURRENT = 'CURRENT'
+META = 'meta.json'
+
+
+class ArtifactStore:
+    def __init__(self, root, keep_versions=3):
+        self.root = root
+        self.keep_versions = keep_versions
+
+    def publish(self, name, arrays, meta=None):
+        """
+        Zapisuje nową wersję artefaktu (słownik nazwa -> tablica) i ustawia
+        ją jako bieżącą. Zwraca identyfikator wersji.
+        """
+        directory = os.path.join(self.root, name)
+        os.makedirs(directory, exist_ok=True)
+        version = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+        tmp_dir = os.path.join(directory, f'.tmp-{version}-{uuid.uuid4().hex[:8]}')
+        os.makedirs(tmp_dir)
+        try:
+            for array_name, array in arrays.items():
+                np.save(os.path.join(tmp_dir, f'{array_name}.npy'), np.ascontiguousarray(array))
+            with open(os.path.join(tmp_dir, META), 'w') as f:
+                json.dump(dict(meta or {}, version=version, arrays=sorted(arrays)), f)
+            os.replace(tmp_dir, os.path.join(directory, version))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        pointer = os.path.join(directory, f'.{CURRENT}-{uuid.uuid4().hex[:8]}')
+        with open(pointer, 'w') as f:
+            f.write(version)
+        os.replace(pointer, os.path.join(directory, CURRENT))
+        self._prune(name, version)
+        return version
+
+    def current_version(self, name):
+        """Bieżąca wersja artefaktu (None jeśli nigdy nie opublikowano)"""
+        try:
+            with open(os.path.join(self.root, name, CURRENT)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def open(self, name, version=None):
+        """
+        Otwiera wersję artefaktu (domyślnie bieżącą) tylko do odczytu.
+        Zwraca (tablice zmapowane w pamięć, meta z kluczem path - katalog
+        wersji). FileNotFoundError gdy brak.
+        """
+        version = version or self.current_version(name)
+        if version is None:
+            raise FileNotFoundError(f'Brak artefaktu {name} w {self.root}')
+        directory = os.path.join(self.root, name, version)
+        with open(os.path.join(directory, META)) as f:
+            meta = json.load(f)
+        meta['path'] = directory
+        arrays = {
+            array_name: np.load(os.path.join(directory, f'{array_name}.npy'), mmap_mode='r')
+            for array_name in meta['arrays']
+        }
+        return arrays, meta
+
+    def path(self, name, version):
+        """Katalog wersji artefaktu"""
+        return os.path.join(self.root, name, version)
+
+    def _prune(self, name, current):
+        """
+        Usuwa najstarsze wersje ponad keep_versions. Procesy, które mają je
+        jeszcze zmapowane, czytają dalej (plik znika dopiero po munmap).
+        """
+        directory = os.path.join(self.root, name)
+        versions = sorted(
+            entry for entry in os.listdir(directory)
+            if not entry.startswith('.') and entry != CURRENT and entry != current
+        )
+        for version in versions[:max(0, len(versions) - (self.keep_versions - 1))]:
+            shutil.rmtree(os.path.join(directory, version), ignore_errors=True)
+
+
+def dense_lookup(ids):
+    """Tablica id -> pozycja (-1 dla nieobecnych) dla nieujemnych identyfikatorów"""
+    ids = np.asarray(ids, dtype=np.int64)
+    lookup = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int64)
+    lookup[ids] = np.arange(len(ids), dtype=np.int64)
+    return lookup
+
+
+def lookup_positions(lookup, ids):
+    """Pozycje identyfikatorów w tablicy z dense_lookup (-1 dla nieznanych)"""
+    ids = np.asarray(ids, dtype=np.int64)
+    known = (ids >= 0) & (ids < len(lookup))
+    positions = np.full(len(ids), -1, dtype=np.int64)
+    positions[known] = lookup[ids[known]]
+    return positions
@@ -0,0 +1,169 @@
+import threading
+import time
+from datetime import timedelta
+import numpy as np
+
+COLUMNS = (
+    ('id', np.int64),
+    ('tmdb_id', np.int64),
+    ('popularity', np.float32),
+    ('average_rating', np.float32),
+    ('vote_count', np.int32),
+    ('release_year', np.int32),
+    ('genre_mask', np.uint64),
+)
+
+# Zmiana trafia do bazy chwilę po ustawieniu updated_at - odświeżanie czyta też
+# filmy zmienione do tyle wcześniej niż ostatnia widziana zmiana
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+class CatalogSnapshot:
+    """
+    Kolumnowa migawka katalogu filmów w pamięci (ciągłe tablice NumPy).
+
+    Wczytywana raz jednym zapytaniem o kolumny (bez obiektów ORM), potem
+    uzupełniana przyrostowo: upsert() dla filmów zapisanych w tym procesie
+    i refresh() dla wierszy dodanych lub zmienionych przez inne procesy
+    (nowe id albo nowszy Movie.updated_at).
+    Rok wydania 0 oznacza brak danych.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._size = 0
+        self._arrays = {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS}
+        self._row_by_id = np.full(0, -1, dtype=np.int64)
+        self._version = 0
+        self._popular = None
+        self._synced_updated_at = None
+        self.loaded_at = None
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, movie_id):
+        return self._row(movie_id) >= 0
+
+    @classmethod
+    def load(cls, session):
+        snapshot = cls()
+        snapshot.refresh(session)
+        return snapshot
+
+    def refresh(self, session, overlap=REFRESH_OVERLAP):
+        """
+        Dociąga filmy o identyfikatorach większych niż ostatni wczytany oraz
+        zmienione od ostatniego odświeżenia. Zwraca liczbę zmienionych wierszy.
+        """
+        from sqlalchemy import func
+        from app.models import Movie
+        last_id = int(self._arrays['id'][:self._size].max()) if self._size else 0
+        # Znacznik sprzed zapytania - zmiany zapisane w trakcie wczyta następne odświeżenie
+        synced_updated_at = session.query(func.max(Movie.updated_at)).scalar()
+        changed_rows = Movie.id > last_id
+        if self._synced_updated_at is not None:
+            changed_rows = changed_rows | (Movie.updated_at >= self._synced_updated_at - overlap)
+        rows = (
+            session.query(*[getattr(Movie, name) for name, _ in COLUMNS])
+            .filter(changed_rows)
+            .order_by(Movie.id)
+            .all()
+        )
+        with self._lock:
+            changed = sum(self._upsert_row(row) for row in rows)
+            if synced_updated_at is not None:
+                self._synced_updated_at = max(self._synced_updated_at or synced_updated_at, synced_updated_at)
+            self.loaded_at = time.monotonic()
+        return changed
+
+    def upsert(self, movie):
+        """Dodaje lub aktualizuje film (obiekt Movie) w migawce"""
+        with self._lock:
+            self._upsert_row(tuple(getattr(movie, name) for name, _ in COLUMNS))
+
+    def column(self, name):
+        """Widok kolumny (bez kopiowania) o długości równej liczbie filmów"""
+        return self._arrays[name][:self._size]
+
+    def rows(self, movie_ids):
+        """Wiersze dla tablicy identyfikatorów filmów (-1 dla nieznanych)"""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        lookup = self._row_by_id
+        known = (movie_ids >= 0) & (movie_ids < len(lookup))
+        result = np.full(len(movie_ids), -1, dtype=np.int64)
+        result[known] = lookup[movie_ids[known]]
+        return result
+
+    def mask(self, movie_ids):
+        """Maska logiczna długości katalogu z zaznaczonymi podanymi filmami"""
+        mask = np.zeros(self._size, dtype=bool)
+        rows = self.rows(movie_ids)
+        mask[rows[rows >= 0]] = True
+        return mask
+
+    def top_popular(self, k, exclude_movie_ids=()):
+        """
+        Top-k filmów według popularności (argpartition zamiast sortowania).
+        Wynik bez wykluczeń jest zapamiętywany do następnej zmiany katalogu.
+        """
+        if not len(exclude_movie_ids):
+            popular = self._popular
+            if popular is not None and popular[0] == (self._version, k):
+                return popular[1]
+            result = self._top_popular(k, ())
+            for array in result:
+                array.flags.writeable = False
+            self._popular = ((self._version, k), result)
+            return result
+        return self._top_popular(k, exclude_movie_ids)
+
+    def _top_popular(self, k, exclude_movie_ids):
+        popularity = self.column('popularity').astype(np.float64)
+        if len(exclude_movie_ids):
+            popularity = np.where(self.mask(exclude_movie_ids), -np.inf, popularity)
+        k = min(k, len(popularity))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        top = np.argpartition(-popularity, k - 1)[:k]
+        top = top[np.argsort(-popularity[top], kind='stable')]
+        top = top[np.isfinite(popularity[top])]
+        return self.column('id')[top], popularity[top]
+
+    def _row(self, movie_id):
+        if 0 <= movie_id < len(self._row_by_id):
+            return int(self._row_by_id[movie_id])
+        return -1
+
+    def _upsert_row(self, values):
+        """Zapisuje wiersz, zwraca False, jeśli film był już w migawce z tymi samymi wartościami"""
+        movie_id = int(values[0])
+        row = self._row(movie_id)
+        if row < 0:
+            row = self._size
+            self._ensure_capacity(row + 1, movie_id + 1)
+            self._row_by_id[movie_id] = row
+            self._size += 1
+        elif all(
+            self._arrays[name][row] == dtype(value if value is not None else 0)
+            for (name, dtype), value in zip(COLUMNS, values)
+        ):
+            return False
+        for (name, dtype), value in zip(COLUMNS, values):
+            self._arrays[name][row] = value if value is not None else 0
+        self._version += 1
+        return True
+
+    def _ensure_capacity(self, size, id_range):
+        """Powiększa tablice geometrycznie (amortyzowane O(1) na wstawienie)"""
+        capacity = len(self._arrays['id'])
+        if size > capacity:
+            new_capacity = max(size, 2 * capacity, 1024)
+            for name, dtype in COLUMNS:
+                grown = np.zeros(new_capacity, dtype=dtype)
+                grown[:self._size] = self._arrays[name][:self._size]
+                self._arrays[name] = grown
+        if id_range > len(self._row_by_id):
+            grown = np.full(max(id_range, 2 * len(self._row_by_id), 1024), -1, dtype=np.int64)
+            grown[:len(self._row_by_id)] = self._row_by_id
+            self._row_by_id = grown
@@ -0,0 +1,304 @@
+"""
+Wektory treści filmów (opis + gatunki) do podobieństwa content-based.
+
+Tekst kodowany jest bez dopasowywania słownika: tokeny haszowane są do
+n_features kubełków ze znakiem (hashing trick, crc32 - ten sam wynik w każdym
+procesie), a wektor rzadki rzutowany losową macierzą gaussowską do dim
+wymiarów i normalizowany. Nowy film koduje się więc niezależnie od reszty
+katalogu, bez ponownego dopasowania ani przeliczania wszystkich wektorów.
+
+Bazowe wektory to artefakt w ArtifactStore (float32, memmap). Filmy dodane
+po zbudowaniu dopisywane są do pliku w katalogu tej samej wersji
+(appended_vectors.f32 + appended_movie_ids.i64), także z innych procesów -
+czytelnicy mapują go ponownie, gdy urośnie.
+"""
+import os
+import re
+import threading
+import zlib
+import numpy as np
+from scipy import sparse
+from app.artifact_store import dense_lookup, lookup_positions
+
+try:
+    import fcntl
+except ImportError:  # Windows - serwer deweloperski to jeden proces, blokada zbędna
+    fcntl = None
+
+_TOKEN = re.compile(r'\w{2,}', re.UNICODE)
+
+APPENDED_VECTORS = 'appended_vectors.f32'
+APPENDED_MOVIE_IDS = 'appended_movie_ids.i64'
+
+
+class HashingEncoder:
+    """
+    Koduje (opis, lista gatunków) do znormalizowanych wektorów float32.
+    Gatunki są osobnymi tokenami z wagą genre_weight.
+    """
+
+    def __init__(self, n_features=2 ** 14, dim=128, genre_weight=2.0, seed=7):
+        self.n_features = n_features
+        self.dim = dim
+        self.genre_weight = genre_weight
+        self.seed = seed
+        self._projection = None
+        self._lock = threading.Lock()
+
+    @property
+    def projection(self):
+        """Losowa macierz rzutowania n_features×dim (deterministyczna dla seed)"""
+        if self._projection is None:
+            with self._lock:
+                if self._projection is None:
+                    rng = np.random.default_rng(self.seed)
+                    self._projection = rng.standard_normal((self.n_features, self.dim), dtype=np.float32)
+        return self._projection
+
+    def config(self):
+        return {'n_features': self.n_features, 'dim': self.dim, 'genre_weight': self.genre_weight, 'seed': self.seed}
+
+    def encode(self, documents):
+        """Macierz (liczba dokumentów × dim) dla listy par (opis, gatunki)"""
+        rows, cols, values = [], [], []
+        n_documents = 0
+        for row, (overview, genres) in enumerate(documents):
+            n_documents += 1
+            for token in _TOKEN.findall((overview or '').lower()):
+                self._hash(token, 1.0, row, rows, cols, values)
+            for genre in genres or []:
+                self._hash('genre:' + genre.lower(), self.genre_weight, row, rows, cols, values)
+
+        hashed = sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float32), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+            shape=(n_documents, self.n_features)
+        )
+        # Logarytm liczności tokenów (znak z haszowania zachowany)
+        hashed.data = np.sign(hashed.data) * np.log1p(np.abs(hashed.data))
+        return normalize_rows(np.asarray(hashed @ self.projection, dtype=np.float32))
+
+    def _hash(self, token, weight, row, rows, cols, values):
+        h = zlib.crc32(token.encode('utf-8'))
+        rows.append(row)
+        cols.append(h % self.n_features)
+        # Najwyższy bit wyznacza znak - kolizje kubełków częściowo się znoszą
+        values.append(weight if h & 0x80000000 else -weight)
+
+
+def normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class ContentFeatures:
+    """
+    Macierz wektorów treści filmów: bazowa (memmap z artefaktu) plus filmy
+    dopisane później. Wyszukiwanie podobnych to iloczyny skalarne blokami
+    wierszy z zachowaniem top-K dla każdego profilu.
+    """
+
+    KIND = 'hashed-text-projection'
+
+    def __init__(self, encoder, movie_ids, vectors, row_by_id=None, path=None):
+        self.encoder = encoder
+        self._lock = threading.Lock()
+        self._movie_ids = movie_ids
+        self._vectors = vectors
+        self._row_by_id = dense_lookup(movie_ids) if row_by_id is None else row_by_id
+        self.path = path
+        self._appended_ids = np.empty(0, dtype=np.int64)
+        self._appended_vectors = np.empty((0, encoder.dim), dtype=np.float32)
+        self._appended_rows = {}
+
+    def __len__(self):
+        self._refresh_appended()
+        return len(self._movie_ids) + len(self._appended_ids)
+
+    def __contains__(self, movie_id):
+        self._refresh_appended()
+        return self.rows([movie_id])[0] >= 0
+
+    def max_movie_id(self):
+        """Największy identyfikator filmu (0 dla pustej macierzy)"""
+        self._refresh_appended()
+        with self._lock:
+            appended_ids = self._appended_ids
+        return max(
+            int(self._movie_ids.max()) if len(self._movie_ids) else 0,
+            int(appended_ids.max()) if len(appended_ids) else 0
+        )
+
+    @classmethod
+    def build(cls, movies, encoder, chunk_size=5000):
+        """Koduje katalog - lista krotek (movie_id, opis, lista gatunków)"""
+        movie_ids = np.array([movie_id for movie_id, _, _ in movies], dtype=np.int64)
+        vectors = np.zeros((len(movies), encoder.dim), dtype=np.float32)
+        for start in range(0, len(movies), chunk_size):
+            chunk = movies[start:start + chunk_size]
+            vectors[start:start + len(chunk)] = encoder.encode((overview, genres) for _, overview, genres in chunk)
+        return cls(encoder, movie_ids, vectors)
+
+    def to_arrays(self):
+        """Tablice i metadane do zapisu w ArtifactStore (łącznie z dopisanymi filmami)"""
+        self._refresh_appended()
+        with self._lock:
+            movie_ids = np.concatenate([self._movie_ids, self._appended_ids])
+            vectors = np.concatenate([self._vectors, self._appended_vectors])
+        arrays = {'movie_ids': movie_ids, 'vectors': vectors, 'row_by_id': dense_lookup(movie_ids)}
+        return arrays, dict(self.encoder.config(), kind=self.KIND)
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        """Wektory z ArtifactStore.open (memmap). ValueError dla artefaktu innego rodzaju."""
+        if meta.get('kind') != cls.KIND:
+            raise ValueError(f"Nieobsługiwany format wektorów treści: {meta.get('kind')}")
+        encoder = HashingEncoder(meta['n_features'], meta['dim'], meta['genre_weight'], meta['seed'])
+        return cls(encoder, arrays['movie_ids'], arrays['vectors'], arrays['row_by_id'], path=meta.get('path'))
+
+    def append(self, movie_id, overview, genres):
+        """
+        Koduje nowy film i dopisuje go do pliku wersji (blokada flock - pliki
+        współdzielą wszystkie procesy). Filmy już obecne są pomijane.
+        """
+        vector = self.encoder.encode([(overview, genres)])[0]
+        if self.path is None:
+            # Wektory tylko w pamięci (nieopublikowane)
+            with self._lock:
+                self._add_appended(np.array([movie_id], dtype=np.int64), vector[None, :])
+            return
+        ids_path = os.path.join(self.path, APPENDED_MOVIE_IDS)
+        with open(os.path.join(self.path, APPENDED_VECTORS), 'ab') as vectors_file:
+            if fcntl is not None:
+                fcntl.flock(vectors_file, fcntl.LOCK_EX)
+            try:
+                self._refresh_appended()
+                if movie_id in self:
+                    return
+                # Wiersz wektora bez identyfikatora (przerwany zapis) jest nadpisywany
+                n_ids = os.path.getsize(ids_path) // 8 if os.path.exists(ids_path) else 0
+                vectors_file.truncate(n_ids * self.encoder.dim * 4)
+                vectors_file.write(vector.astype(np.float32).tobytes())
+                vectors_file.flush()
+                # Identyfikator po wektorze - czytelnik widzi tylko pełne wiersze
+                with open(ids_path, 'ab') as ids_file:
+                    ids_file.write(np.int64(movie_id).tobytes())
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(vectors_file, fcntl.LOCK_UN)
+        self._refresh_appended()
+
+    def rows(self, movie_ids):
+        """Wiersze filmów (bazowe, potem dopisane) - -1 dla nieznanych"""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        rows = lookup_positions(self._row_by_id, movie_ids)
+        if self._appended_rows:
+            for position in np.flatnonzero(rows < 0):
+                row = self._appended_rows.get(int(movie_ids[position]))
+                if row is not None:
+                    rows[position] = row
+        return rows
+
+    def profiles(self, movie_id_lists):
+        """Znormalizowana średnia wektorów podanych filmów - jeden profil na listę"""
+        self._refresh_appended()
+        result = np.zeros((len(movie_id_lists), self.encoder.dim), dtype=np.float32)
+        for index, movie_ids in enumerate(movie_id_lists):
+            rows = self.rows(np.asarray(movie_ids, dtype=np.int64))
+            rows = rows[rows >= 0]
+            if len(rows):
+                result[index] = self._gather(rows).mean(axis=0)
+        return normalize_rows(result)
+
+    def search(self, profiles, k, excluded=None, chunk_size=65536):
+        """
+        Top-k filmów o największym iloczynie skalarnym z każdym profilem
+        (tylko dodatnie wyniki, bez filmów z excluded[i]).
+        Zwraca listę par (movie_ids, scores) malejąco.
+        """
+        self._refresh_appended()
+        profiles = np.asarray(profiles, dtype=np.float32)
+        n_profiles = len(profiles)
+        with self._lock:
+            appended_ids, appended_vectors = self._appended_ids, self._appended_vectors
+        n_base = len(self._movie_ids)
+        n_rows = n_base + len(appended_ids)
+        excluded_rows = [
+            self.rows(np.asarray(ids, dtype=np.int64)) if ids is not None and len(ids) else np.empty(0, dtype=np.int64)
+            for ids in (excluded or [None] * n_profiles)
+        ]
+
+        best_rows = np.empty((n_profiles, 0), dtype=np.int64)
+        best_scores = np.empty((n_profiles, 0), dtype=np.float32)
+        for start in range(0, n_rows, chunk_size):
+            stop = min(start + chunk_size, n_rows)
+            block = self._block(start, stop, n_base, appended_vectors)
+            scores = profiles @ block.T
+            for index, rows in enumerate(excluded_rows):
+                inside = rows[(rows >= start) & (rows < stop)]
+                scores[index, inside - start] = -np.inf
+            rows = np.broadcast_to(np.arange(start, stop, dtype=np.int64), scores.shape)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_rows = np.concatenate([best_rows, rows], axis=1)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            if best_scores.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+
+        all_ids = np.concatenate([np.asarray(self._movie_ids), appended_ids]) if len(appended_ids) else self._movie_ids
+        results = []
+        for rows, scores in zip(best_rows, best_scores):
+            order = np.argsort(-scores, kind='stable')
+            rows, scores = rows[order], scores[order]
+            positive = scores > 0
+            results.append((np.asarray(all_ids[rows[positive]], dtype=np.int64), scores[positive].astype(np.float64)))
+        return results
+
+    def _block(self, start, stop, n_base, appended_vectors):
+        if stop <= n_base:
+            return self._vectors[start:stop]
+        if start >= n_base:
+            return appended_vectors[start - n_base:stop - n_base]
+        return np.concatenate([self._vectors[start:n_base], appended_vectors[:stop - n_base]])
+
+    def _gather(self, rows):
+        n_base = len(self._movie_ids)
+        base = rows[rows < n_base]
+        extra = rows[rows >= n_base] - n_base
+        with self._lock:
+            appended_vectors = self._appended_vectors
+        return np.concatenate([self._vectors[np.sort(base)], appended_vectors[extra]])
+
+    def _refresh_appended(self):
+        """Mapuje ponownie plik dopisanych filmów, jeśli urósł (także w innym procesie)"""
+        if self.path is None:
+            return
+        try:
+            n_ids = os.path.getsize(os.path.join(self.path, APPENDED_MOVIE_IDS)) // 8
+        except FileNotFoundError:
+            return
+        if n_ids <= len(self._appended_ids):
+            return
+        with self._lock:
+            if n_ids <= len(self._appended_ids):
+                return
+            movie_ids = np.fromfile(os.path.join(self.path, APPENDED_MOVIE_IDS), dtype=np.int64, count=n_ids)
+            vectors = np.memmap(
+                os.path.join(self.path, APPENDED_VECTORS), dtype=np.float32, mode='r',
+                shape=(n_ids, self.encoder.dim)
+            )
+            self._appended_ids = np.empty(0, dtype=np.int64)
+            self._appended_vectors = np.empty((0, self.encoder.dim), dtype=np.float32)
+            self._appended_rows = {}
+            self._add_appended(movie_ids, vectors)
+
+    def _add_appended(self, movie_ids, vectors):
+        n_base = len(self._movie_ids)
+        offset = len(self._appended_ids)
+        for position, movie_id in enumerate(movie_ids.tolist()):
+            self._appended_rows.setdefault(movie_id, n_base + offset + position)
+        self._appended_ids = np.concatenate([self._appended_ids, movie_ids])
+        self._appended_vectors = vectors if offset == 0 else np.concatenate([self._appended_vectors, vectors])
@@ -0,0 +1,69 @@
+"""
+Leniwe tworzenie silnika rekomendacji.
+
+Import app.recommendation_engine ładuje numpy i scipy, a RecommendationEngine
+wczytuje katalog, macierz ocen i artefakty modeli. app.py trzyma tylko ten
+lekki uchwyt, więc start procesu i komendy CLI nie płacą za stos numeryczny,
+a trasy bez rekomendacji (/login, /search) nigdy go nie ładują. Rozgrzewka
+w tle startuje przy pierwszym żądaniu - gdy serwer już przyjmuje ruch.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _create_engine():
+    from app.recommendation_engine import RecommendationEngine
+    return RecommendationEngine()
+
+
+class LazyEngine:
+    """Uchwyt RecommendationEngine tworzonego przy pierwszym użyciu"""
+
+    def __init__(self, factory=_create_engine):
+        self._factory = factory
+        self._engine = None
+        self._lock = threading.Lock()
+        self._warm_up_thread = None
+
+    def get(self):
+        """Silnik (tworzony przy pierwszym wywołaniu, jeden na proces)"""
+        engine = self._engine
+        if engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = self._factory()
+                engine = self._engine
+        return engine
+
+    def if_loaded(self):
+        """Silnik, jeśli już powstał - None bez tworzenia go"""
+        return self._engine
+
+    def warm_up(self, app):
+        """
+        Uruchamia (raz na proces) wątek w tle, który tworzy silnik i wczytuje
+        jego dane. Żądania nie czekają na rozgrzewkę - te, które potrzebują
+        silnika wcześniej, dostaną go przez get() jak dotąd.
+        """
+        if self._warm_up_thread is not None:
+            return
+        with self._lock:
+            if self._warm_up_thread is not None:
+                return
+            self._warm_up_thread = threading.Thread(
+                target=self._warm_up, args=(app,), name='engine-warm-up', daemon=True
+            )
+        self._warm_up_thread.start()
+
+    def _warm_up(self, app):
+        started = time.perf_counter()
+        try:
+            with app.app_context():
+                self.get().warm_up()
+        except Exception:
+            logger.exception('Rozgrzewka silnika rekomendacji nie powiodła się')
+        else:
+            logger.info('Silnik rekomendacji gotowy po %.0f ms', (time.perf_counter() - started) * 1000)
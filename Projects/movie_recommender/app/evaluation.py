@@ -0,0 +1,306 @@
+"""
+Ewaluacja offline jakości rekomendacji i kosztu ich serwowania.
+
+Oceny dzielone są w czasie (Rating.timestamp): starsze niż punkt odcięcia
+tworzą zbiór treningowy, nowsze - testowy. Silnik dostaje macierz ocen
+treningowych i modele collaborative zbudowane tylko z niej (w tymczasowej
+składnicy artefaktów), a rekomendacje porównywane są z filmami, które
+użytkownik ocenił w okresie testowym na co najmniej RELEVANT_RATING.
+
+Dla każdego punktu siatki parametrów liczone są precision@K, recall@K,
+NDCG@K (trafność binarna), pokrycie katalogu oraz opóźnienie serwowania
+(p50/p95 ścieżki na pojedynczego użytkownika). Paczki użytkowników
+wszystkich punktów siatki liczone są w puli procesów ścieżką wsadową
+(get_recommendations_batch).
+"""
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sqlalchemy import func, or_
+from app.models import db, Movie, Rating
+from app.rating_store import RatingStore
+from app.artifact_store import ArtifactStore
+from app.recommendation_engine import RecommendationEngine
+from config import Config
+
+# Minimalna ocena testowa uznawana za trafienie (jak próg polubienia w silniku)
+RELEVANT_RATING = 3.5
+
+# Parametry dostępne w siatce: nazwa z Config -> (atrybut silnika, typ)
+GRID_PARAMETERS = {
+    'CONTENT_BASED_WEIGHT': ('content_weight', float),
+    'COLLABORATIVE_WEIGHT': ('collaborative_weight', float),
+    'CONTENT_TEXT_WEIGHT': ('text_weight', float),
+    'MIN_RATINGS_FOR_COLLABORATIVE': ('min_ratings', int),
+}
+
+# Stan procesów roboczych (dziedziczony przez fork)
+_worker_app = None
+_worker_split = None
+_worker_artifact_store = None
+_worker_engine = None
+
+
+class TimeSplit:
+    """
+    Podział ocen w czasie: train to RatingStore ocen starszych, test to
+    słownik user_id -> posortowane movie_ids trafień z okresu testowego.
+
+    global_cutoff - jeden punkt odcięcia dla wszystkich (najbliższy wdrożeniu);
+    per_user - najnowszy udział ocen każdego użytkownika (gdy użytkownicy
+    są aktywni w rozłącznych okresach i wspólny punkt odcięcia zostawia
+    niewielu z ocenami po obu stronach).
+    """
+
+    def __init__(self, train, test, cutoff=None):
+        self.train = train
+        self.test = test
+        self.cutoff = cutoff
+
+    @classmethod
+    def global_cutoff(cls, session, test_fraction=0.2):
+        """Oceny po kwantylu 1 - test_fraction znaczników czasu trafiają do testu"""
+        total = session.query(func.count(Rating.id)).filter(Rating.timestamp.isnot(None)).scalar()
+        if not total:
+            raise ValueError('Brak ocen ze znacznikiem czasu do podziału')
+        cutoff = (
+            session.query(Rating.timestamp)
+            .filter(Rating.timestamp.isnot(None))
+            .order_by(Rating.timestamp)
+            .offset(min(int(total * (1 - test_fraction)), total - 1))
+            .limit(1)
+            .scalar()
+        )
+        train = RatingStore.from_ratings(
+            session.query(Rating.user_id, Rating.movie_id, Rating.rating)
+            .filter(or_(Rating.timestamp.is_(None), Rating.timestamp <= cutoff))
+            .yield_per(10000)
+        )
+        rows = (
+            session.query(Rating.user_id, Rating.movie_id)
+            .filter(Rating.timestamp > cutoff, Rating.rating >= RELEVANT_RATING)
+            .yield_per(10000)
+        )
+        relevant = {}
+        for user_id, movie_id in rows:
+            relevant.setdefault(user_id, []).append(movie_id)
+        return cls(train, _sorted_lists(relevant), cutoff)
+
+    @classmethod
+    def per_user(cls, session, test_fraction=0.2):
+        """
+        Najnowsze int(n · test_fraction) ocen każdego użytkownika trafia do
+        testu - jeden przebieg po indeksie (user_id, timestamp)
+        """
+        rows = (
+            session.query(Rating.user_id, Rating.movie_id, Rating.rating)
+            .order_by(Rating.user_id, Rating.timestamp, Rating.id)
+            .yield_per(10000)
+        )
+        train_rows = []
+        relevant = {}
+        for user_id, user_rows in itertools.groupby(rows, key=lambda row: row[0]):
+            user_rows = list(user_rows)
+            split_at = len(user_rows) - int(len(user_rows) * test_fraction)
+            train_rows.extend(user_rows[:split_at])
+            liked = [movie_id for _, movie_id, rating in user_rows[split_at:] if rating >= RELEVANT_RATING]
+            if liked:
+                relevant[user_id] = liked
+        return cls(RatingStore.from_ratings(train_rows), _sorted_lists(relevant))
+
+    def eval_user_ids(self):
+        """Użytkownicy z ocenami w obu okresach (cold start nie ma czego przewidywać z historii)"""
+        return sorted(user_id for user_id in self.test if user_id in self.train)
+
+
+def _sorted_lists(movie_ids_by_user):
+    return {user_id: np.unique(np.asarray(movie_ids, dtype=np.int64)) for user_id, movie_ids in movie_ids_by_user.items()}
+
+
+def ranking_metrics(recommended, relevant, k):
+    """precision@k, recall@k i NDCG@k jednej listy (relevant posortowane)"""
+    recommended = np.asarray(recommended[:k], dtype=np.int64)
+    if len(recommended) == 0 or len(relevant) == 0:
+        return 0.0, 0.0, 0.0
+    positions = np.searchsorted(relevant, recommended)
+    positions[positions == len(relevant)] = 0
+    hits = relevant[positions] == recommended
+    n_hits = int(hits.sum())
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = float(discounts[:len(hits)][hits].sum())
+    ideal = float(discounts[:min(len(relevant), k)].sum())
+    return n_hits / k, n_hits / len(relevant), dcg / ideal
+
+
+def parse_grid(specs):
+    """
+    Siatka z opcji NAZWA=v1,v2,... (iloczyn kartezjański). Pusta lista
+    specyfikacji daje jeden punkt - bieżące wartości z Config.
+    """
+    axes = []
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        name = name.strip().upper()
+        if name not in GRID_PARAMETERS or not values:
+            raise ValueError(f"Nieprawidłowy parametr siatki: {spec} (dostępne: {', '.join(GRID_PARAMETERS)})")
+        cast = GRID_PARAMETERS[name][1]
+        axes.append([(name, cast(value)) for value in values.split(',') if value.strip()])
+    return [dict(point) for point in itertools.product(*axes)]
+
+
+def configure(engine, params, k):
+    """Ustawia parametry punktu siatki na silniku"""
+    engine.top_n = k
+    for name, value in params.items():
+        setattr(engine, GRID_PARAMETERS[name][0], value)
+    return engine
+
+
+def _init_worker():
+    """Proces roboczy: własne połączenia DB i silnik na macierzy treningowej"""
+    global _worker_engine
+    with _worker_app.app_context():
+        db.engine.dispose(close=False)
+        _worker_engine = _create_engine(_worker_split.train, _worker_artifact_store)
+        _worker_engine.get_catalog()
+
+
+def _score_chunk(task):
+    config_index, params, k, user_ids = task
+    with _worker_app.app_context():
+        return config_index, _chunk_metrics(configure(_worker_engine, params, k), _worker_split.test, user_ids, k)
+
+
+def _chunk_metrics(engine, test, user_ids, k):
+    """Sumy metryk paczki i zbiór zarekomendowanych filmów (do pokrycia)"""
+    sums = np.zeros(3, dtype=np.float64)
+    recommended = set()
+    for user_id, items in engine.get_recommendations_batch(user_ids).items():
+        movie_ids = [item['movie_id'] for item in items]
+        sums += ranking_metrics(movie_ids, test[user_id], k)
+        recommended.update(movie_ids[:k])
+    return sums, recommended
+
+
+def _create_engine(train, artifact_store):
+    engine = RecommendationEngine(rating_store=train, artifact_store=artifact_store)
+    # Tymczasowa składnica nie zmienia się w trakcie ewaluacji - bez sprawdzania CURRENT
+    engine.artifact_check_interval = float('inf')
+    return engine
+
+
+def serving_latency(engine, user_ids):
+    """p50/p95 (ms) ścieżki serwowania jednego użytkownika (bez cache)"""
+    timings = []
+    for user_id in user_ids:
+        started = time.perf_counter()
+        engine._compute_recommendations(user_id)
+        timings.append(time.perf_counter() - started)
+    if not timings:
+        return {'p50_ms': 0.0, 'p95_ms': 0.0}
+    return {
+        'p50_ms': float(np.percentile(timings, 50)) * 1000,
+        'p95_ms': float(np.percentile(timings, 95)) * 1000,
+    }
+
+
+def evaluate(app, grid, k=None, test_fraction=None, split='global', batch_size=None, workers=None,
+             latency_users=None, max_users=None, seed=0):
+    """
+    Ocenia każdy punkt siatki na jednym podziale czasowym ('global' lub 'user'). Zwraca słownik
+    z opisem podziału i listą wyników (parametry, metryki, opóźnienie).
+    """
+    global _worker_app, _worker_split, _worker_artifact_store
+    k = k or Config.EVALUATION_K
+    test_fraction = Config.EVALUATION_TEST_FRACTION if test_fraction is None else test_fraction
+    batch_size = batch_size or Config.EVALUATION_BATCH_SIZE
+    workers = workers or Config.PRECOMPUTE_WORKERS or os.cpu_count() or 1
+    latency_users = Config.EVALUATION_LATENCY_USERS if latency_users is None else latency_users
+    grid = grid or [{}]
+
+    started = time.perf_counter()
+    if split == 'user':
+        split = TimeSplit.per_user(db.session, test_fraction)
+    else:
+        split = TimeSplit.global_cutoff(db.session, test_fraction)
+    user_ids = split.eval_user_ids()
+    rng = np.random.default_rng(seed)
+    if max_users and len(user_ids) > max_users:
+        user_ids = sorted(rng.choice(user_ids, max_users, replace=False).tolist())
+    catalog_size = db.session.query(func.count(Movie.id)).scalar() or 1
+
+    workdir = tempfile.mkdtemp(prefix='movierec-eval-')
+    try:
+        # Modele collaborative tylko z ocen treningowych - bez wycieku ocen testowych
+        artifact_store = ArtifactStore(workdir)
+        engine = _create_engine(split.train, artifact_store)
+        engine.get_content_index()
+        if any(params.get('CONTENT_TEXT_WEIGHT', engine.text_weight) > 0 for params in grid):
+            engine.get_content_features()
+        if engine.collaborative_backend == 'mf':
+            engine.train_mf_model(split.train)
+        elif engine.collaborative_backend == 'item':
+            engine.build_item_neighbors(split.train)
+        prepared = time.perf_counter()
+
+        chunks = [user_ids[i:i + batch_size] for i in range(0, len(user_ids), batch_size)]
+        tasks = [
+            (config_index, params, k, chunk)
+            for config_index, params in enumerate(grid)
+            for chunk in chunks
+        ]
+        totals = [np.zeros(3, dtype=np.float64) for _ in grid]
+        recommended = [set() for _ in grid]
+
+        if workers > 1 and len(tasks) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            _worker_app, _worker_split, _worker_artifact_store = app, split, artifact_store
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+                for config_index, (sums, movie_ids) in pool.map(_score_chunk, tasks):
+                    totals[config_index] += sums
+                    recommended[config_index] |= movie_ids
+        else:
+            for config_index, params, _, chunk in tasks:
+                sums, movie_ids = _chunk_metrics(configure(engine, params, k), split.test, chunk, k)
+                totals[config_index] += sums
+                recommended[config_index] |= movie_ids
+        scored = time.perf_counter()
+
+        # Opóźnienie mierzone po kolei w tym procesie - pula nie zaburza pomiaru
+        sample = user_ids
+        if len(sample) > latency_users:
+            sample = rng.choice(user_ids, latency_users, replace=False).tolist()
+        results = []
+        for config_index, params in enumerate(grid):
+            n_users = max(len(user_ids), 1)
+            precision, recall, ndcg = totals[config_index] / n_users
+            results.append({
+                'params': params,
+                f'precision@{k}': precision,
+                f'recall@{k}': recall,
+                f'ndcg@{k}': ndcg,
+                'coverage': len(recommended[config_index]) / catalog_size,
+                'latency': serving_latency(configure(engine, params, k), sample),
+            })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'cutoff': split.cutoff.isoformat() if split.cutoff is not None else None,
+        'k': k,
+        'train_ratings': split.train.nnz,
+        'test_users': len(split.test),
+        'evaluated_users': len(user_ids),
+        'workers': workers,
+        'seconds': {
+            'prepare': prepared - started,
+            'score': scored - prepared,
+            'total': time.perf_counter() - started,
+        },
+        'results': results,
+    }
@@ -0,0 +1,116 @@
+import threading
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Genre
+
+# Bity 0..62 - maska mieści się w dodatnim BIGINT (SQLite/PostgreSQL)
+MAX_GENRES = 63
+
+# Próby zapisu nowego gatunku, gdy bit lub nazwę zajmuje równolegle inny proces
+INSERT_ATTEMPTS = 3
+
+# numpy importowany w funkcjach: rejestr gatunków używany jest przez migracje
+# i import katalogu, które nie powinny ładować stosu numerycznego
+
+_M1 = 0x5555555555555555
+_M2 = 0x3333333333333333
+_M4 = 0x0F0F0F0F0F0F0F0F
+_H01 = 0x0101010101010101
+
+
+def popcount(values):
+    """Liczba ustawionych bitów dla każdego elementu tablicy uint64"""
+    import numpy as np
+    values = np.asarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.uint8)
+    # SWAR popcount dla numpy < 2.0
+    m1, m2, m4, h01 = (np.uint64(m) for m in (_M1, _M2, _M4, _H01))
+    values = values - ((values >> np.uint64(1)) & m1)
+    values = (values & m2) + ((values >> np.uint64(2)) & m2)
+    values = (values + (values >> np.uint64(4))) & m4
+    return ((values * h01) >> np.uint64(56)).astype(np.uint8)
+
+
+def jaccard(masks_a, masks_b):
+    """
+    Podobieństwo Jaccarda masek gatunków: |A ∩ B| / |A ∪ B|
+    (z broadcastingiem, np. masks[:, None] vs masks[None, :])
+    """
+    import numpy as np
+    masks_a = np.asarray(masks_a, dtype=np.uint64)
+    masks_b = np.asarray(masks_b, dtype=np.uint64)
+    intersection = popcount(masks_a & masks_b).astype(np.float32)
+    union = popcount(masks_a | masks_b).astype(np.float32)
+    return np.divide(intersection, union, out=np.zeros_like(union), where=union > 0)
+
+
+class GenreRegistry:
+    """
+    Mapowanie nazwa gatunku -> bit w masce Movie.genre_mask, trzymane
+    w tabeli genres i buforowane w pamięci procesu.
+    Nowe gatunki dostają kolejny wolny bit przy pierwszym zapisie - we własnej
+    transakcji, zatwierdzonej przed zapamiętaniem bitu, więc wycofanie
+    transakcji wywołującego nie zostawia w pamięci bitu bez wiersza w bazie.
+    Maski liczone są przed zapisami w sesji wywołującego (w SQLite osobne
+    połączenie czekałoby na blokadę zapisu trzymaną przez sesję).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bits = {}
+        self._known_mask = 0
+
+    def mask(self, names):
+        """Maska bitowa dla listy nazw gatunków (tworzy brakujące gatunki)"""
+        mask = 0
+        for name in names:
+            bit = self.bit(name)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def bit(self, name):
+        bit = self._bits.get(name)
+        if bit is not None:
+            return bit
+        with self._lock:
+            self._reload()
+            attempts = 0
+            while name not in self._bits:
+                if len(self._bits) >= MAX_GENRES:
+                    return None
+                try:
+                    self._insert(name, max(self._bits.values(), default=-1) + 1)
+                except IntegrityError:
+                    # Bit albo nazwę zapisał w międzyczasie inny proces - ponownie z aktualną tabelą
+                    attempts += 1
+                    if attempts >= INSERT_ATTEMPTS:
+                        raise
+                self._reload()
+            return self._bits[name]
+
+    def names(self, mask):
+        """Lista nazw gatunków zakodowanych w masce"""
+        if mask & ~self._known_mask:
+            # Bity nieznane temu procesowi - gatunki dodane przez inne procesy
+            with self._lock:
+                self._reload()
+        return [name for name, bit in sorted(self._bits.items(), key=lambda item: item[1]) if mask >> bit & 1]
+
+    def clear(self):
+        """Czyści bufor w pamięci (np. po przełączeniu na inną bazę)"""
+        with self._lock:
+            self._bits = {}
+            self._known_mask = 0
+
+    def _insert(self, name, bit):
+        with db.engine.begin() as connection:
+            connection.execute(db.insert(Genre).values(name=name, bit=bit))
+
+    def _reload(self):
+        bits = dict(db.session.query(Genre.name, Genre.bit))
+        self._bits = bits
+        self._known_mask = sum(1 << bit for bit in bits.values())
+
+
+genre_registry = GenreRegistry()
@@ -0,0 +1,166 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from app.metrics import metrics
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Limiter po stronie klienta: rate żądań na sekundę, chwilowo do capacity"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blokuje do momentu uzyskania tokenu"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class EndpointStats:
+    """Liczniki opóźnień i błędów per endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, endpoint, latency=None, error=False, retry=False):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {
+                'requests': 0, 'errors': 0, 'retries': 0,
+                'latency_total': 0.0, 'latency_max': 0.0,
+            })
+            if latency is not None:
+                metrics.observe('tmdb_request_seconds', latency, endpoint=endpoint)
+                stats['requests'] += 1
+                stats['latency_total'] += latency
+                stats['latency_max'] = max(stats['latency_max'], latency)
+            if error:
+                stats['errors'] += 1
+            if retry:
+                stats['retries'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for endpoint, stats in self._stats.items():
+                result[endpoint] = dict(stats)
+                result[endpoint]['latency_avg'] = (
+                    stats['latency_total'] / stats['requests'] if stats['requests'] else 0.0
+                )
+            return result
+
+
+class HTTPTransport:
+    """
+    Współdzielona sesja HTTP z pulą połączeń (keep-alive), timeoutami,
+    limiterem token-bucket i ponawianiem z wykładniczym backoffem,
+    które respektuje nagłówek Retry-After przy odpowiedziach 429/5xx.
+    """
+
+    def __init__(self, pool_size=10, timeout=(3.05, 10), max_retries=3,
+                 backoff_factor=0.5, max_backoff=30, rate_limit=None, rate_burst=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.rate_limiter = TokenBucket(rate_limit, rate_burst) if rate_limit else None
+        self.stats = EndpointStats()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, endpoint, url, params=None):
+        """
+        GET z ponawianiem. Zwraca ostatnią odpowiedź lub None, jeśli
+        wszystkie próby zakończyły się błędem połączenia.
+        """
+        response = None
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException:
+                self.stats.record(endpoint, latency=time.perf_counter() - started, error=True)
+                response = None
+                delay = self._backoff(attempt)
+            else:
+                failed = response.status_code >= 400
+                self.stats.record(endpoint, latency=time.perf_counter() - started, error=failed)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+
+            if attempt < self.max_retries:
+                self.stats.record(endpoint, retry=True)
+                time.sleep(min(delay, self.max_backoff))
+        return response
+
+    def _backoff(self, attempt):
+        """Wykładniczy backoff z losowym rozrzutem (jitter)"""
+        return self.backoff_factor * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    @staticmethod
+    def _retry_after(response):
+        """Czas oczekiwania z nagłówka Retry-After (sekundy lub data HTTP)"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport():
+    """Wspólny transport procesu zbudowany z konfiguracji"""
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                from config import Config
+                _default_transport = HTTPTransport(
+                    pool_size=Config.TMDB_POOL_SIZE,
+                    timeout=(Config.TMDB_CONNECT_TIMEOUT, Config.TMDB_READ_TIMEOUT),
+                    max_retries=Config.TMDB_MAX_RETRIES,
+                    backoff_factor=Config.TMDB_BACKOFF_FACTOR,
+                    max_backoff=Config.TMDB_MAX_BACKOFF,
+                    rate_limit=Config.TMDB_RATE_LIMIT,
+                    rate_burst=Config.TMDB_RATE_BURST
+                )
+    return _default_transport
@@ -0,0 +1,172 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from app.models import db, Movie
+from app.genres import genre_registry
+
+UPDATABLE_COLUMNS = (
+    'title', 'genres', 'genre_mask', 'release_year', 'overview', 'poster_path',
+    'backdrop_path', 'average_rating', 'vote_count', 'popularity', 'updated_at',
+)
+
+
+def movie_row_from_tmdb(movie_data, genre_names=None):
+    """
+    Mapuje odpowiedź TMDb na kolumny tabeli movies.
+    Szczegóły filmu mają listę 'genres', a wyniki list tylko 'genre_ids' -
+    wtedy nazwy brane są ze słownika genre_names (id -> nazwa).
+    """
+    if 'genres' in movie_data:
+        genres = [g['name'] for g in movie_data.get('genres', [])]
+    else:
+        genre_names = genre_names or {}
+        genres = [genre_names[gid] for gid in movie_data.get('genre_ids', []) if gid in genre_names]
+
+    release_date = movie_data.get('release_date')
+    return {
+        'tmdb_id': movie_data['id'],
+        'title': movie_data['title'],
+        'genres': json.dumps(genres),
+        'genre_mask': genre_registry.mask(genres),
+        'release_year': int(release_date[:4]) if release_date else None,
+        'overview': movie_data.get('overview'),
+        'poster_path': movie_data.get('poster_path'),
+        'backdrop_path': movie_data.get('backdrop_path'),
+        'average_rating': movie_data.get('vote_average', 0),
+        'vote_count': movie_data.get('vote_count', 0),
+        'popularity': movie_data.get('popularity', 0),
+    }
+
+
+def upsert_movies(rows):
+    """
+    Zapisuje paczkę filmów jednym poleceniem INSERT ... ON CONFLICT (tmdb_id)
+    DO UPDATE (SQLite/PostgreSQL); dla innych baz rozdziela insert i update.
+    """
+    if not rows:
+        return 0
+
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(Movie)
+        statement = statement.on_conflict_do_update(
+            index_elements=['tmdb_id'],
+            set_={column: statement.excluded[column] for column in UPDATABLE_COLUMNS}
+        )
+        # executemany jednego skompilowanego polecenia zamiast VALUES z setkami parametrów
+        db.session.connection().execute(statement, rows)
+    else:
+        tmdb_ids = [row['tmdb_id'] for row in rows]
+        existing = dict(
+            db.session.query(Movie.tmdb_id, Movie.id).filter(Movie.tmdb_id.in_(tmdb_ids))
+        )
+        updates = [dict(row, id=existing[row['tmdb_id']]) for row in rows if row['tmdb_id'] in existing]
+        inserts = [row for row in rows if row['tmdb_id'] not in existing]
+        if inserts:
+            db.session.execute(db.insert(Movie), inserts)
+        if updates:
+            db.session.execute(db.update(Movie), updates)
+
+    db.session.commit()
+    return len(rows)
+
+
+class IngestionCheckpoint:
+    """Lista ukończonych stron zapisywana atomowo do pliku JSON"""
+
+    def __init__(self, path):
+        self.path = path
+        self.completed = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.completed = {tuple(task) for task in json.load(f)['completed']}
+
+    def __contains__(self, task):
+        return task in self.completed
+
+    def mark(self, tasks):
+        self.completed.update(tasks)
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'completed': sorted(list(task) for task in self.completed)}, f)
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        self.completed = set()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def ingest_catalog(tmdb_service, pages=20, genre_ids=None, workers=8, batch_size=500, checkpoint_path=None):
+    """
+    Pobiera strony popularnych filmów (i opcjonalnie discover dla gatunków)
+    równolegle w ograniczonej puli wątków i zapisuje je paczkami upsertów.
+    Strona trafia do checkpointu dopiero po zatwierdzeniu jej filmów w bazie,
+    więc przerwany import można wznowić bez ponownego pobierania.
+    Zwraca słownik ze statystykami.
+    """
+    checkpoint = IngestionCheckpoint(checkpoint_path)
+    genre_names = {g['id']: g['name'] for g in tmdb_service.get_movie_genres()}
+
+    tasks = [('popular', 0, page) for page in range(1, pages + 1)]
+    for genre_id in genre_ids or []:
+        tasks.extend(('discover', genre_id, page) for page in range(1, pages + 1))
+    tasks = [task for task in tasks if task not in checkpoint]
+
+    def fetch(task):
+        source, genre_id, page = task
+        if source == 'popular':
+            return tmdb_service.get_popular_movies(page=page)
+        return tmdb_service.discover_by_genre(genre_id, page=page)
+
+    stats = {'pages': 0, 'failed_pages': 0, 'movies': 0, 'skipped_pages': len(checkpoint.completed)}
+    buffer = {}
+    buffered_tasks = []
+
+    def flush():
+        stats['movies'] += upsert_movies(list(buffer.values()))
+        checkpoint.mark(buffered_tasks)
+        buffer.clear()
+        buffered_tasks.clear()
+
+    pending_tasks = iter(tasks)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = {}
+        # Ograniczona liczba zadań w locie - strumieniowo, bez kolejkowania wszystkich stron
+        for task in pending_tasks:
+            in_flight[pool.submit(fetch, task)] = task
+            if len(in_flight) >= workers * 2:
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = in_flight.pop(future)
+                data = future.result()
+                if data is None:
+                    stats['failed_pages'] += 1
+                else:
+                    stats['pages'] += 1
+                    for movie_data in data.get('results', []):
+                        if movie_data.get('id') and movie_data.get('title'):
+                            row = movie_row_from_tmdb(movie_data, genre_names)
+                            buffer[row['tmdb_id']] = row
+                    buffered_tasks.append(task)
+
+                next_task = next(pending_tasks, None)
+                if next_task is not None:
+                    in_flight[pool.submit(fetch, next_task)] = next_task
+
+            if len(buffer) >= batch_size:
+                flush()
+
+    if buffer or buffered_tasks:
+        flush()
+    return stats
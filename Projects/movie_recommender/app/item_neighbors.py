@@ -0,0 +1,98 @@
+import numpy as np
+from scipy import sparse
+from app.similarity_index import NeighborIndex
+
+
+class ItemNeighborIndex(NeighborIndex):
+    """
+    Sąsiedzi filmów według ocen użytkowników (item-item collaborative filtering).
+
+    Podobieństwo to adjusted cosine: oceny pomniejszone o średnią użytkownika,
+    potem cosinus kolumn macierzy ocen. Iloczyny współocen liczone są mnożeniem
+    macierzy rzadkich blokami filmów (chunk_size × liczba filmów), więc pamięć
+    jest ograniczona niezależnie od rozmiaru katalogu. Przechowywani są tylko
+    sąsiedzi o dodatnim podobieństwie i co najmniej min_support wspólnych ocenach.
+    """
+
+    KIND = 'item-adjusted-cosine'
+
+    @classmethod
+    def build(cls, ratings, movie_ids, top_k=50, chunk_size=1024, min_support=2):
+        """
+        Buduje indeks z macierzy ocen CSR (użytkownicy × filmy) i identyfikatorów
+        filmów odpowiadających jej kolumnom (RatingStore.to_csr)
+        """
+        index = cls(top_k=top_k)
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        n_movies = len(movie_ids)
+        index._set_movie_ids(movie_ids)
+        index._neighbors = np.full((n_movies, top_k), cls.EMPTY, dtype=np.int64)
+        index._scores = np.zeros((n_movies, top_k), dtype=np.float32)
+        if n_movies == 0:
+            return index
+
+        ratings = sparse.csr_matrix(ratings, dtype=np.float64)
+        centered = center_by_user(ratings)
+        norms = np.sqrt(np.asarray(centered.multiply(centered).sum(axis=0)).ravel())
+        centered_t = centered.T.tocsr()
+        rated = ratings.copy()
+        rated.data[:] = 1.0
+        rated_t = rated.T.tocsr()
+
+        for start in range(0, n_movies, chunk_size):
+            stop = min(start + chunk_size, n_movies)
+            dots = (centered_t[start:stop] @ centered).tocsr()
+            support = None
+            if min_support > 1:
+                support = (rated_t[start:stop] @ rated).tocsr()
+                support.sort_indices()
+            for offset in range(stop - start):
+                movie = start + offset
+                lo, hi = dots.indptr[offset], dots.indptr[offset + 1]
+                cols, values = dots.indices[lo:hi], dots.data[lo:hi]
+                denominator = norms[movie] * norms[cols]
+                keep = (cols != movie) & (denominator > 0)
+                if support is not None:
+                    # Wzorzec support zawiera wzorzec dots (te same pary współocen)
+                    s_lo, s_hi = support.indptr[offset], support.indptr[offset + 1]
+                    positions = np.searchsorted(support.indices[s_lo:s_hi], cols)
+                    keep &= support.data[s_lo:s_hi][positions] >= min_support
+                cols, sims = cols[keep], values[keep] / denominator[keep]
+                ids, scores = index._top_k(sims, movie_ids[cols])
+                index._neighbors[movie, :len(ids)] = ids
+                index._scores[movie, :len(ids)] = scores
+
+        return index
+
+
+def center_by_user(ratings):
+    """Oceny CSR pomniejszone o średnią ocenę użytkownika (wiersza)"""
+    counts = np.diff(ratings.indptr)
+    sums = np.asarray(ratings.sum(axis=1), dtype=np.float64).ravel()
+    means = np.divide(sums, counts, out=np.zeros(len(counts)), where=counts > 0)
+    centered = ratings.astype(np.float64, copy=True)
+    centered.data = centered.data - np.repeat(means, counts)
+    return centered
+
+
+def predict_scores(index, rated_movie_ids, ratings):
+    """
+    Przewidywane oceny filmów sąsiadujących z ocenionymi (zbieranie z indeksu):
+    średnia użytkownika + Σ s·(r - średnia) / Σ s.
+    Zwraca (movie_ids, scores) - także dla filmów już ocenionych.
+    """
+    ratings = np.asarray(ratings, dtype=np.float64)
+    if len(ratings) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    mean = ratings.mean()
+    neighbors = [index.neighbors(movie_id) for movie_id in np.asarray(rated_movie_ids).tolist()]
+    movie_ids = np.concatenate([ids for ids, _ in neighbors])
+    if len(movie_ids) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    sims = np.concatenate([scores for _, scores in neighbors]).astype(np.float64)
+    deviations = np.repeat(ratings - mean, [len(ids) for ids, _ in neighbors])
+
+    unique_ids, inverse = np.unique(movie_ids, return_inverse=True)
+    numerator = np.bincount(inverse, weights=sims * deviations, minlength=len(unique_ids))
+    denominator = np.bincount(inverse, weights=sims, minlength=len(unique_ids))
+    return unique_ids, mean + numerator / denominator
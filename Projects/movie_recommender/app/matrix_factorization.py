@@ -0,0 +1,134 @@
+from datetime import datetime
+import numpy as np
+from app.artifact_store import dense_lookup, lookup_positions
+
+
+class MatrixFactorizationModel:
+    """
+    Model czynników ukrytych (ALS) dla filtrowania kolaboratywnego.
+
+    Trenowany offline z tabeli ocen do macierzy float32 użytkowników i filmów,
+    zapisywanych jako artefakt razem ze znacznikiem wersji. Serwowanie to jeden
+    iloczyn macierz-wektor i wybór top-K.
+    """
+
+    KIND = 'als'
+
+    def __init__(self, user_ids, movie_ids, user_factors, item_factors, global_mean, version,
+                 user_rows=None, movie_columns=None):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.global_mean = float(global_mean)
+        self.version = version
+        # Tablice id -> wiersz/kolumna (zamiast słowników - mogą być zmapowane z pliku)
+        self._user_rows = dense_lookup(self.user_ids) if user_rows is None else user_rows
+        self._movie_columns = dense_lookup(self.movie_ids) if movie_columns is None else movie_columns
+
+    def __contains__(self, user_id):
+        return self.user_index(user_id) >= 0
+
+    @classmethod
+    def train(cls, ratings, user_ids, movie_ids, factors=32, regularization=0.1, iterations=15, seed=42):
+        """
+        Trenuje model metodą ALS (Alternating Least Squares).
+        ratings - macierz CSR użytkownik×film, user_ids/movie_ids - mapowanie indeksów
+        """
+        rng = np.random.default_rng(seed)
+        n_users, n_movies = ratings.shape
+        global_mean = float(ratings.data.mean()) if ratings.nnz else 0.0
+
+        user_factors = (rng.standard_normal((n_users, factors)) * 0.1).astype(np.float32)
+        item_factors = (rng.standard_normal((n_movies, factors)) * 0.1).astype(np.float32)
+        ratings_t = ratings.T.tocsr()
+
+        for _ in range(iterations):
+            user_factors = cls._als_step(ratings, item_factors, regularization, global_mean)
+            item_factors = cls._als_step(ratings_t, user_factors, regularization, global_mean)
+
+        version = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+        return cls(user_ids, movie_ids, user_factors, item_factors, global_mean, version)
+
+    @staticmethod
+    def _als_step(ratings, fixed, regularization, global_mean):
+        """Jeden krok ALS: rozwiązuje regresję grzbietową dla każdego wiersza"""
+        factors = fixed.shape[1]
+        solved = np.zeros((ratings.shape[0], factors), dtype=np.float32)
+        fixed = fixed.astype(np.float64)
+        identity = np.eye(factors)
+        for row in range(ratings.shape[0]):
+            start, stop = ratings.indptr[row], ratings.indptr[row + 1]
+            if start == stop:
+                continue
+            cols = ratings.indices[start:stop]
+            residuals = ratings.data[start:stop] - global_mean
+            fixed_rows = fixed[cols]
+            a = fixed_rows.T @ fixed_rows + regularization * (stop - start) * identity
+            solved[row] = np.linalg.solve(a, fixed_rows.T @ residuals)
+        return solved
+
+    def user_index(self, user_id):
+        """Wiersz użytkownika w macierzy czynników (-1 jeśli nieznany)"""
+        if 0 <= user_id < len(self._user_rows):
+            return int(self._user_rows[user_id])
+        return -1
+
+    def movie_columns(self, movie_ids):
+        """Kolumny filmów w macierzy czynników (-1 dla nieznanych)"""
+        return lookup_positions(self._movie_columns, movie_ids)
+
+    def recommend(self, user_id, exclude_movie_ids=(), k=100):
+        """Top-k filmów według przewidywanej oceny (bez filmów wykluczonych)"""
+        movie_ids, scores = self.top_movies(user_id, exclude_movie_ids, k)
+        return [
+            {'movie_id': int(mid), 'score': float(score)}
+            for mid, score in zip(movie_ids.tolist(), scores.tolist())
+        ]
+
+    def top_movies(self, user_id, exclude_movie_ids=(), k=100):
+        """Jak recommend, ale zwraca tablice (movie_ids, scores)"""
+        u = self.user_index(user_id)
+        if u < 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        scores = self.item_factors @ self.user_factors[u] + self.global_mean
+
+        exclude = self.movie_columns(exclude_movie_ids)
+        exclude = exclude[exclude >= 0]
+        scores[exclude] = -np.inf
+
+        k = min(k, len(scores) - len(exclude))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        top = top[np.isfinite(scores[top])]
+        return self.movie_ids[top].astype(np.int64), scores[top].astype(np.float64)
+
+    def to_arrays(self):
+        """Tablice i metadane do zapisu w ArtifactStore"""
+        arrays = {
+            'user_ids': self.user_ids,
+            'movie_ids': self.movie_ids,
+            'user_factors': self.user_factors,
+            'item_factors': self.item_factors,
+            'user_rows': self._user_rows,
+            'movie_columns': self._movie_columns,
+        }
+        return arrays, {'kind': self.KIND, 'global_mean': self.global_mean, 'model_version': self.version}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        """Model na tablicach z ArtifactStore.open (bez kopiowania - memmap)"""
+        if meta.get('kind') != cls.KIND:
+            raise ValueError(f"Nieobsługiwany format modelu: {meta.get('kind')}")
+        return cls(
+            arrays['user_ids'],
+            arrays['movie_ids'],
+            arrays['user_factors'],
+            arrays['item_factors'],
+            meta['global_mean'],
+            meta['model_version'],
+            user_rows=arrays['user_rows'],
+            movie_columns=arrays['movie_columns'],
+        )
@@ -0,0 +1,192 @@
+import logging
+import threading
+import time
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_NOOP = nullcontext()
+
+STAGE_METRIC = 'recommendation_stage_seconds'
+
+
+class _Timer:
+    __slots__ = ('registry', 'name', 'labels', 'started')
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Minimalny rejestr metryk w formacie tekstowym Prometheusa
+    (liczniki i histogramy z etykietami, plus kolektory wywoływane przy eksporcie).
+    Gdy enabled=False, timer() zwraca współdzielony pusty kontekst,
+    a inc()/observe() kończą się na jednym porównaniu.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._buckets = {}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name, help_text, buckets=None):
+        self._help[name] = help_text
+        if buckets is not None:
+            self._buckets[name] = tuple(buckets)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self._buckets.get(name, DEFAULT_BUCKETS)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0, 0.0, [0] * len(buckets)]
+            histogram[0] += 1
+            histogram[1] += value
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[2][i] += 1
+
+    def timer(self, name, **labels):
+        """Kontekst mierzący czas bloku (w sekundach) do histogramu name"""
+        if not self.enabled:
+            return _NOOP
+        return _Timer(self, name, labels)
+
+    def register_collector(self, collector):
+        """
+        collector() zwraca listę krotek (typ, nazwa, etykiety, wartość),
+        np. ('counter', 'tmdb_requests_total', {'endpoint': 'search'}, 12)
+        """
+        self._collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Eksport w formacie tekstowym Prometheusa (0.0.4)"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (h[0], h[1], list(h[2])) for key, h in self._histograms.items()}
+
+        families = {}
+        for (name, labels), value in counters.items():
+            families.setdefault((name, 'counter'), []).append((name, labels, value))
+        for collector in self._collectors:
+            for kind, name, labels, value in collector():
+                families.setdefault((name, kind), []).append((name, tuple(sorted(labels.items())), value))
+        for (name, labels), (count, total, bucket_counts) in histograms.items():
+            samples = families.setdefault((name, 'histogram'), [])
+            for bound, bucket_count in zip(self._buckets.get(name, DEFAULT_BUCKETS), bucket_counts):
+                samples.append((f'{name}_bucket', labels + (('le', _format_number(bound)),), bucket_count))
+            samples.append((f'{name}_bucket', labels + (('le', '+Inf'),), count))
+            samples.append((f'{name}_sum', labels, total))
+            samples.append((f'{name}_count', labels, count))
+
+        lines = []
+        for (name, kind), samples in sorted(families.items()):
+            if name in self._help:
+                lines.append(f'# HELP {name} {self._help[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample_name, labels, value in samples:
+                lines.append(f'{sample_name}{_format_labels(labels)} {_format_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+metrics = MetricsRegistry()
+metrics.describe('http_request_seconds', 'Czas obsługi żądania HTTP')
+metrics.describe('http_request_db_queries', 'Liczba zapytań SQL na żądanie', buckets=COUNT_BUCKETS)
+metrics.describe('db_queries_total', 'Liczba zapytań SQL')
+metrics.describe(STAGE_METRIC, 'Czas etapów silnika rekomendacji')
+metrics.describe('recommendation_requests_total', 'Rekomendacje z cache i przeliczone')
+metrics.describe('tmdb_request_seconds', 'Czas zapytań HTTP do TMDb')
+metrics.describe('search_requests_total', 'Wyszukiwania obsłużone lokalnie i przez TMDb')
+metrics.describe('api_recommendations_total', 'Odpowiedzi /api/recommendations (200 lub 304)')
+
+
+def init_app(app, db):
+    """
+    Podpina pomiary żądań Flask: czas per endpoint, liczbę zapytań SQL
+    i logowanie wolnych żądań (SLOW_REQUEST_THRESHOLD_MS > 0)
+    """
+    from flask import g, request
+    from sqlalchemy import event
+
+    metrics.enabled = app.config.get('METRICS_ENABLED', False)
+    slow_threshold = app.config.get('SLOW_REQUEST_THRESHOLD_MS', 0) / 1000.0
+    if not metrics.enabled and not slow_threshold:
+        return
+
+    def count_query(*args):
+        if g:
+            g.db_queries = g.get('db_queries', 0) + 1
+        metrics.inc('db_queries_total')
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_query)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.db_queries = 0
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or 'unknown'
+        metrics.observe('http_request_seconds', elapsed, endpoint=endpoint, status=response.status_code)
+        metrics.observe('http_request_db_queries', g.get('db_queries', 0), endpoint=endpoint)
+        if slow_threshold and elapsed >= slow_threshold:
+            logger.warning(
+                'Wolne żądanie %s %s: %.1f ms, %d zapytań SQL',
+                request.method, request.path, elapsed * 1000, g.get('db_queries', 0)
+            )
+        return response
@@ -0,0 +1,70 @@
+import json
+from sqlalchemy import inspect, text
+from app.models import db, Movie, Rating, WatchHistory
+from app.genres import genre_registry
+from app.search_index import create_search_index, FTS_TABLE
+
+
+def run_migrations(batch_size=1000):
+    """
+    Idempotentne migracje schematu dla istniejących baz
+    (db.create_all tworzy brakujące tabele, ale nie zmienia istniejących).
+    Zwraca listę nazw wykonanych kroków.
+    """
+    db.create_all()
+    applied = []
+    movie_columns = {column['name'] for column in inspect(db.engine).get_columns('movies')}
+
+    if 'genre_mask' not in movie_columns:
+        db.session.execute(text('ALTER TABLE movies ADD COLUMN genre_mask BIGINT NOT NULL DEFAULT 0'))
+        db.session.commit()
+        applied.append('movies.genre_mask')
+
+    if 'updated_at' not in movie_columns:
+        db.session.execute(text('ALTER TABLE movies ADD COLUMN updated_at DATETIME'))
+        db.session.commit()
+        applied.append('movies.updated_at')
+
+    if backfill_genre_masks(batch_size):
+        applied.append('backfill genre_mask')
+
+    # Indeksy dla list per użytkownik i odświeżania katalogu oraz ocen (create_all nie dodaje ich do istniejących tabel)
+    for model in (Movie, Rating, WatchHistory):
+        existing = {index['name'] for index in inspect(db.engine).get_indexes(model.__tablename__)}
+        for index in model.__table__.indexes:
+            if index.name not in existing:
+                index.create(db.engine, checkfirst=True)
+                applied.append(index.name)
+
+    # Pełnotekstowy indeks filmów (FTS5, tylko SQLite) z triggerami synchronizacji
+    if create_search_index():
+        applied.append(FTS_TABLE)
+
+    return applied
+
+
+def backfill_genre_masks(batch_size=1000):
+    """Uzupełnia maski gatunków i tabelę genres na podstawie Movie.genres (JSON)"""
+    updated = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(Movie.id, Movie.genres)
+            .filter(Movie.id > last_id, Movie.genre_mask == 0, Movie.genres.isnot(None))
+            .order_by(Movie.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        updates = []
+        for movie_id, genres in rows:
+            mask = genre_registry.mask(json.loads(genres))
+            if mask:
+                updates.append({'id': movie_id, 'genre_mask': mask})
+        if updates:
+            db.session.execute(db.update(Movie), updates)
+        db.session.commit()
+        updated += len(updates)
+        last_id = rows[-1][0]
+    return updated
@@ -35,6 +35,7 @@ class Movie(db.Model):
     tmdb_id = db.Column(db.Integer, unique=True, nullable=False)
     title = db.Column(db.String(200), nullable=False)
     genres = db.Column(db.Text)  # JSON string of genres
+    genre_mask = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')  # Bits from genres.bit
     release_year = db.Column(db.Integer)
     overview = db.Column(db.Text)
     poster_path = db.Column(db.String(200))
@@ -42,6 +43,8 @@ class Movie(db.Model):
     average_rating = db.Column(db.Float, default=0.0)
     vote_count = db.Column(db.Integer, default=0)
     popularity = db.Column(db.Float, default=0.0)
+    # Czas ostatniej zmiany - CatalogSnapshot.refresh dociąga po nim zmienione filmy
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     ratings = db.relationship('Rating', backref='movie', lazy=True, cascade='all, delete-orphan')
@@ -51,6 +54,29 @@ class Movie(db.Model):
         return f'<Movie {self.title}>'
 
 
+def hydrate_movies(movie_ids):
+    """
+    Wczytuje filmy jednym zapytaniem IN, w kolejności podanych identyfikatorów
+    (nieistniejące są pomijane)
+    """
+    movie_ids = [int(movie_id) for movie_id in movie_ids]
+    if not movie_ids:
+        return []
+    movies = {movie.id: movie for movie in Movie.query.filter(Movie.id.in_(set(movie_ids)))}
+    return [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
+
+
+class Genre(db.Model):
+    __tablename__ = 'genres'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    bit = db.Column(db.Integer, unique=True, nullable=False)  # Bit position in Movie.genre_mask (0-62)
+    
+    def __repr__(self):
+        return f'<Genre {self.name} bit={self.bit}>'
+
+
 class Rating(db.Model):
     __tablename__ = 'ratings'
     
@@ -60,7 +86,12 @@ class Rating(db.Model):
     rating = db.Column(db.Float, nullable=False)  # 1.0 to 5.0
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
-    __table_args__ = (db.UniqueConstraint('user_id', 'movie_id', name='unique_user_movie_rating'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'movie_id', name='unique_user_movie_rating'),
+        db.Index('ix_ratings_user_timestamp', 'user_id', 'timestamp'),
+        # Przyrostowe odświeżanie macierzy ocen (RatingStore.refresh)
+        db.Index('ix_ratings_timestamp', 'timestamp'),
+    )
     
     def __repr__(self):
         return f'<Rating user={self.user_id} movie={self.movie_id} rating={self.rating}>'
@@ -74,5 +105,23 @@ class WatchHistory(db.Model):
     movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), nullable=False)
     watched_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (db.Index('ix_watch_history_user_watched', 'user_id', 'watched_at'),)
+    
     def __repr__(self):
         return f'<WatchHistory user={self.user_id} movie={self.movie_id}>'
+
+
+class Recommendation(db.Model):
+    __tablename__ = 'recommendations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    generated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (db.Index('ix_recommendations_user_rank', 'user_id', 'rank'),)
+    
+    def __repr__(self):
+        return f'<Recommendation user={self.user_id} movie={self.movie_id} rank={self.rank}>'
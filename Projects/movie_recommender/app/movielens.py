@@ -0,0 +1,255 @@
+"""
+Strumieniowy import i eksport ocen w formacie MovieLens (CSV).
+
+ratings.csv: userId,movieId,rating,timestamp (czas uniksowy)
+links.csv:   movieId,imdbId,tmdbId
+movies.csv:  movieId,title,genres (gatunki rozdzielone '|'), opcjonalny
+
+Plik ocen czytany jest wiersz po wierszu i zapisywany paczkami po chunk_size
+wierszy (executemany INSERT ... ON CONFLICT (user_id, movie_id) DO UPDATE),
+więc pamięć zależy od rozmiaru paczki, a nie pliku. W pamięci trzymane są
+tylko mapowania identyfikatorów filmów i użytkowników. Użytkownicy MovieLens
+zakładani są jako konta syntetyczne ml<userId> bez hasła.
+"""
+import csv
+import json
+import re
+from datetime import datetime, timedelta
+from app.models import db, User, Movie, Rating
+from app.ingestion import upsert_movies
+from app.genres import genre_registry
+from app.write_behind import RatingEvent, upsert_ratings
+
+SYNTHETIC_USER_PREFIX = 'ml'
+SYNTHETIC_EMAIL_DOMAIN = 'movielens.invalid'
+
+# Limit parametrów zapytania IN przy wyszukiwaniu kont
+USER_LOOKUP_BATCH = 500
+
+# Skala MovieLens to 0.5-5.0, aplikacja przyjmuje oceny 1-5
+MIN_RATING = 1.0
+MAX_RATING = 5.0
+
+_TITLE_YEAR = re.compile(r'^(.*?)\s*\((\d{4})\)\s*$')
+
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+
+# executemany bezpośrednio w sqlite3 - parametry nie przechodzą przez
+# przetwarzanie SQLAlchemy (wielokrotnie wolniejsze przy milionach wierszy).
+# Czas uniksowy zamieniany jest w SQLite na format kolumny DateTime SQLAlchemy.
+_SQLITE_UPSERT = (
+    'INSERT INTO ratings (user_id, movie_id, rating, timestamp) '
+    "VALUES (?, ?, ?, datetime(?, 'unixepoch') || '.000000') "
+    'ON CONFLICT (user_id, movie_id) DO UPDATE SET rating = excluded.rating, timestamp = excluded.timestamp'
+)
+
+
+def read_links(links_path):
+    """Słownik movieId MovieLens -> tmdb_id (wiersze bez tmdbId są pomijane)"""
+    links = {}
+    with open(links_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if len(row) >= 3 and row[2]:
+                links[int(row[0])] = int(row[2])
+    return links
+
+
+def import_movies(movies_path, links, batch_size=500):
+    """
+    Dodaje do katalogu filmy z movies.csv, których tmdb_id jeszcze nie ma
+    w tabeli movies (tytuł, rok z tytułu, gatunki). Zwraca liczbę dodanych.
+    """
+    known = {tmdb_id for (tmdb_id,) in db.session.query(Movie.tmdb_id)}
+    added = 0
+    batch = []
+    with open(movies_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for movie_id, title, genres in reader:
+            tmdb_id = links.get(int(movie_id))
+            if tmdb_id is None or tmdb_id in known:
+                continue
+            known.add(tmdb_id)
+            batch.append(movie_row_from_movielens(tmdb_id, title, genres))
+            if len(batch) >= batch_size:
+                added += upsert_movies(batch)
+                batch = []
+    if batch:
+        added += upsert_movies(batch)
+    return added
+
+
+def movie_row_from_movielens(tmdb_id, title, genres):
+    """Mapuje wiersz movies.csv na kolumny tabeli movies"""
+    match = _TITLE_YEAR.match(title)
+    genre_names = [] if genres == '(no genres listed)' else [g for g in genres.split('|') if g]
+    return {
+        'tmdb_id': tmdb_id,
+        'title': (match.group(1) if match else title)[:200],
+        'genres': json.dumps(genre_names),
+        'genre_mask': genre_registry.mask(genre_names),
+        'release_year': int(match.group(2)) if match else None,
+        'overview': None,
+        'poster_path': None,
+        'backdrop_path': None,
+        'average_rating': 0.0,
+        'vote_count': 0,
+        'popularity': 0.0,
+    }
+
+
+def import_ratings(ratings_path, links, chunk_size=50_000):
+    """
+    Strumieniowo importuje ratings.csv. Oceny filmów spoza katalogu
+    (brak linku lub brak filmu w movies) są pomijane. Zwraca statystyki.
+    """
+    movie_rows = movie_ids_by_movielens_id(links)
+    users = UserMapper()
+    stats = {'ratings': 0, 'skipped': 0, 'clipped': 0, 'users': 0}
+    chunk = []
+
+    def flush():
+        user_rows = users.resolve({row[0] for row in chunk})
+        rows = [(user_rows[user], movie, rating, timestamp) for user, movie, rating, timestamp in chunk]
+        upsert_rating_rows(rows)
+        db.session.commit()
+        stats['ratings'] += len(rows)
+        chunk.clear()
+
+    with open(ratings_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for user, movie, rating, timestamp in reader:
+            movie_row = movie_rows.get(int(movie))
+            if movie_row is None:
+                stats['skipped'] += 1
+                continue
+            rating = float(rating)
+            if rating < MIN_RATING or rating > MAX_RATING:
+                rating = min(max(rating, MIN_RATING), MAX_RATING)
+                stats['clipped'] += 1
+            chunk.append((int(user), movie_row, rating, int(timestamp)))
+            if len(chunk) >= chunk_size:
+                flush()
+    if chunk:
+        flush()
+    stats['users'] = users.created
+    return stats
+
+
+def movie_ids_by_movielens_id(links):
+    """Słownik movieId MovieLens -> movies.id dla filmów obecnych w katalogu"""
+    movie_by_tmdb = dict(db.session.query(Movie.tmdb_id, Movie.id))
+    return {
+        movielens_id: movie_by_tmdb[tmdb_id]
+        for movielens_id, tmdb_id in links.items() if tmdb_id in movie_by_tmdb
+    }
+
+
+class UserMapper:
+    """
+    userId MovieLens -> users.id. Brakujące konta syntetyczne zakładane są
+    paczką przy pierwszym wystąpieniu użytkownika.
+    """
+
+    def __init__(self):
+        self._rows = {}
+        self.created = 0
+
+    def resolve(self, movielens_ids):
+        missing = sorted(user for user in movielens_ids if user not in self._rows)
+        for start in range(0, len(missing), USER_LOOKUP_BATCH):
+            names = {f'{SYNTHETIC_USER_PREFIX}{user}': user for user in missing[start:start + USER_LOOKUP_BATCH]}
+            existing = dict(db.session.query(User.username, User.id).filter(User.username.in_(names)))
+            new_users = [
+                {
+                    'username': name,
+                    'email': f'{name}@{SYNTHETIC_EMAIL_DOMAIN}',
+                    'password_hash': '!',
+                }
+                for name in names if name not in existing
+            ]
+            if new_users:
+                db.session.execute(db.insert(User), new_users)
+                existing = dict(db.session.query(User.username, User.id).filter(User.username.in_(names)))
+                self.created += len(new_users)
+            for name, user in names.items():
+                self._rows[user] = existing[name]
+        return self._rows
+
+
+def upsert_rating_rows(rows):
+    """
+    Zapisuje paczkę ocen (krotki user_id, movie_id, rating, czas uniksowy)
+    jednym executemany z ON CONFLICT (user_id, movie_id) DO UPDATE
+    (SQLite/PostgreSQL); dla innych baz rozdziela insert i update jak kolejka zapisów.
+    """
+    if not rows:
+        return
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        db.session.connection().exec_driver_sql(_SQLITE_UPSERT, rows)
+        return
+
+    rows = [(user_id, movie_id, rating, _EPOCH + timedelta(seconds=timestamp)) for user_id, movie_id, rating, timestamp in rows]
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        statement = insert(Rating)
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id', 'movie_id'],
+            set_={'rating': statement.excluded.rating, 'timestamp': statement.excluded.timestamp}
+        )
+        db.session.connection().execute(statement, [
+            {'user_id': user_id, 'movie_id': movie_id, 'rating': rating, 'timestamp': timestamp}
+            for user_id, movie_id, rating, timestamp in rows
+        ])
+    else:
+        upsert_ratings([RatingEvent(*row) for row in rows])
+
+
+def export_ratings(ratings_path, links_path=None, chunk_size=50_000):
+    """
+    Strumieniowo eksportuje oceny do ratings.csv (userId = users.id,
+    movieId = movies.id) i opcjonalnie links.csv (movies.id -> tmdb_id).
+    Oceny czytane są paczkami po kluczu (Rating.id > ostatni), bez OFFSET.
+    Zwraca liczbę wyeksportowanych ocen.
+    """
+    exported = 0
+    last_id = 0
+    with open(ratings_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(('userId', 'movieId', 'rating', 'timestamp'))
+        while True:
+            rows = db.session.connection().execute(
+                db.select(Rating.id, Rating.user_id, Rating.movie_id, Rating.rating, Rating.timestamp)
+                .where(Rating.id > last_id)
+                .order_by(Rating.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            writer.writerows(
+                (user_id, movie_id, f'{rating:g}', _unix_time(timestamp))
+                for _, user_id, movie_id, rating, timestamp in rows
+            )
+            exported += len(rows)
+            last_id = rows[-1][0]
+
+    if links_path:
+        with open(links_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(('movieId', 'imdbId', 'tmdbId'))
+            writer.writerows(
+                (movie_id, '', tmdb_id)
+                for movie_id, tmdb_id in db.session.query(Movie.id, Movie.tmdb_id).order_by(Movie.id).yield_per(chunk_size)
+            )
+    return exported
+
+
+def _unix_time(timestamp):
+    if timestamp is None:
+        return ''
+    return (timestamp - _EPOCH) // _SECOND
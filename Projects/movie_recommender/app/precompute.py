@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app.models import db, Rating, Recommendation
+from config import Config
+
+# Stan procesów roboczych (dziedziczony przez fork)
+_worker_app = None
+_worker_engine = None
+
+
+def _init_worker():
+    """Inicjalizacja procesu roboczego: własne połączenia DB i własny silnik"""
+    global _worker_engine
+    from app.recommendation_engine import RecommendationEngine
+    with _worker_app.app_context():
+        # Połączenia odziedziczone po procesie nadrzędnym nie mogą być współdzielone
+        db.engine.dispose(close=False)
+        _worker_engine = RecommendationEngine()
+        _worker_engine.get_content_index()
+        _worker_engine.get_rating_store()
+
+
+def _score_chunk(user_ids):
+    with _worker_app.app_context():
+        return _worker_engine.get_recommendations_batch(user_ids)
+
+
+def active_user_ids():
+    """Użytkownicy, którzy mają co najmniej jedną ocenę"""
+    return [row[0] for row in db.session.query(Rating.user_id).distinct().order_by(Rating.user_id)]
+
+
+def precompute_recommendations(app, engine, batch_size=None, workers=None):
+    """
+    Przelicza top-N rekomendacji wszystkich aktywnych użytkowników do tabeli
+    recommendations. Paczki użytkowników liczone są w puli procesów
+    (get_recommendations_batch), a zapis wykonuje tylko proces nadrzędny.
+    Zwraca liczbę przeliczonych użytkowników.
+    """
+    global _worker_app
+    batch_size = batch_size or Config.PRECOMPUTE_BATCH_SIZE
+    workers = workers or Config.PRECOMPUTE_WORKERS or os.cpu_count() or 1
+
+    user_ids = active_user_ids()
+    chunks = [user_ids[i:i + batch_size] for i in range(0, len(user_ids), batch_size)]
+    generated_at = datetime.utcnow()
+
+    if workers > 1 and len(chunks) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        _worker_app = app
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+            for results in pool.map(_score_chunk, chunks):
+                _store_results(results, generated_at)
+    else:
+        for chunk in chunks:
+            _store_results(engine.get_recommendations_batch(chunk), generated_at)
+
+    return len(user_ids)
+
+
+def _store_results(results, generated_at):
+    """Podmienia zapisane rekomendacje użytkowników z paczki (jeden commit)"""
+    Recommendation.query.filter(Recommendation.user_id.in_(list(results))).delete(synchronize_session=False)
+    rows = [
+        {
+            'user_id': user_id,
+            'movie_id': item['movie_id'],
+            'rank': rank,
+            'score': item['score'],
+            'generated_at': generated_at,
+        }
+        for user_id, items in results.items()
+        for rank, item in enumerate(items)
+    ]
+    if rows:
+        db.session.execute(db.insert(Recommendation), rows)
+    db.session.commit()
+
+
+def load_precomputed_recommendations(user_id, max_age=None):
+    """
+    Zwraca przeliczone rekomendacje użytkownika lub None, jeśli ich brak
+    albo są nieaktualne (starsze niż max_age lub sprzed ostatniej oceny)
+    """
+    max_age = Config.PRECOMPUTE_MAX_AGE if max_age is None else max_age
+    rows = (
+        Recommendation.query
+        .filter_by(user_id=user_id)
+        .order_by(Recommendation.rank)
+        .all()
+    )
+    if not rows:
+        return None
+
+    generated_at = rows[0].generated_at
+    if generated_at < datetime.utcnow() - timedelta(seconds=max_age):
+        return None
+
+    last_rating = db.session.query(func.max(Rating.timestamp)).filter(Rating.user_id == user_id).scalar()
+    if last_rating is not None and last_rating > generated_at:
+        return None
+
+    return [{'movie_id': row.movie_id, 'score': row.score} for row in rows]
@@ -0,0 +1,313 @@
+import threading
+import time
+from datetime import timedelta
+import numpy as np
+from scipy import sparse
+
+# Oceny trafiają do bazy z opóźnieniem (kolejka zapisów, ponowienia) - odświeżanie
+# czyta też wiersze o czasie oceny do tyle wcześniejszym niż ostatni widziany
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+class RatingStore:
+    """
+    Rezydentna, rzadka macierz ocen użytkownik×film.
+
+    Oceny trzymane są w macierzy CSR (wiersze użytkowników) i jej kopii CSC
+    (kolumny filmów), indeksowanych wewnętrznymi numerami. Nowe oceny trafiają
+    najpierw do małego bufora zmian, który co compact_threshold zapisów jest
+    scalany z macierzami bazowymi. Dzięki temu zapis jest O(1), a wiersz
+    podobieństwa liczony jest tylko dla użytkowników, którzy ocenili te same filmy.
+    Magazyn wczytany z bazy (load) dociąga przez refresh() oceny dodane
+    i zmienione w niej od tego czasu.
+    """
+
+    def __init__(self, compact_threshold=1000):
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._user_index = {}
+        self._movie_index = {}
+        self._user_ids = []
+        self._movie_ids = []
+        self._csr = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._csc = sparse.csc_matrix((0, 0), dtype=np.float32)
+        self._pending_by_user = {}
+        self._pending_by_movie = {}
+        self._pending_count = 0
+        self._sq_norms = np.zeros(0, dtype=np.float64)
+        self._nnz = 0
+        # Znaczniki ostatniego wczytania z bazy (największe id i czas oceny)
+        self._synced_id = 0
+        self._synced_timestamp = None
+        self.loaded_at = None
+
+    @classmethod
+    def from_ratings(cls, ratings, compact_threshold=1000):
+        """Buduje magazyn z iterowalnej kolekcji krotek (user_id, movie_id, rating)"""
+        store = cls(compact_threshold=compact_threshold)
+        rows, cols, values = [], [], []
+        for user_id, movie_id, rating in ratings:
+            rows.append(store._user_idx(user_id))
+            cols.append(store._movie_idx(movie_id))
+            values.append(rating)
+
+        shape = (len(store._user_ids), len(store._movie_ids))
+        coo = sparse.coo_matrix(
+            (np.asarray(values, dtype=np.float32), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+            shape=shape
+        )
+        store._set_base(coo.tocsr())
+        return store
+
+    @classmethod
+    def load(cls, session, compact_threshold=1000):
+        """Wczytuje wszystkie oceny z bazy (bez budowania obiektów ORM)"""
+        from app.models import Rating
+        # Znaczniki sprzed zapytania - wiersze zapisane w trakcie wczyta następne odświeżenie
+        synced = _rating_watermark(session)
+        rows = session.query(Rating.user_id, Rating.movie_id, Rating.rating).yield_per(10000)
+        store = cls.from_ratings(rows, compact_threshold=compact_threshold)
+        store._synced_id, store._synced_timestamp = synced
+        store.loaded_at = time.monotonic()
+        return store
+
+    def refresh(self, session, overlap=REFRESH_OVERLAP):
+        """
+        Dociąga oceny zapisane w bazie od ostatniego wczytania: wiersze
+        o większym id (nowe) i o czasie oceny nie starszym niż ostatni widziany
+        minus overlap (zmienione). Zwraca liczbę zmienionych ocen.
+        """
+        from app.models import Rating
+        synced_id, synced_timestamp = _rating_watermark(session)
+        changed_rows = Rating.id > self._synced_id
+        if self._synced_timestamp is not None:
+            changed_rows = changed_rows | (Rating.timestamp >= self._synced_timestamp - overlap)
+        rows = session.query(Rating.user_id, Rating.movie_id, Rating.rating).filter(changed_rows).all()
+        changed = 0
+        with self._lock:
+            for user_id, movie_id, rating in rows:
+                u = self._user_idx(user_id)
+                i = self._movie_idx(movie_id)
+                if self._value(u, i) != rating:
+                    self._set_value(u, i, rating)
+                    changed += 1
+            self._synced_id = max(self._synced_id, synced_id)
+            if synced_timestamp is not None:
+                self._synced_timestamp = max(self._synced_timestamp or synced_timestamp, synced_timestamp)
+            self.loaded_at = time.monotonic()
+        return changed
+
+    @property
+    def nnz(self):
+        """Liczba zapisanych ocen"""
+        return self._nnz
+
+    def __contains__(self, user_id):
+        return user_id in self._user_index
+
+    def upsert(self, user_id, movie_id, rating):
+        """Dodaje lub aktualizuje ocenę w miejscu"""
+        with self._lock:
+            self._set_value(self._user_idx(user_id), self._movie_idx(movie_id), rating)
+
+    def remove(self, user_id, movie_id):
+        """Usuwa ocenę (np. gdy nie udało się jej zapisać w bazie)"""
+        with self._lock:
+            u = self._user_index.get(user_id)
+            i = self._movie_index.get(movie_id)
+            if u is not None and i is not None:
+                self._set_value(u, i, 0.0)
+
+    def set_user_ratings(self, user_id, ratings):
+        """
+        Zastępuje oceny użytkownika słownikiem movie_id -> ocena (filmy spoza
+        niego są usuwane). Zwraca liczbę zmienionych ocen.
+        """
+        with self._lock:
+            u = self._user_idx(user_id)
+            current, _ = self._row(u)
+            changed = 0
+            for i in current.tolist():
+                if self._movie_ids[i] not in ratings:
+                    self._set_value(u, i, 0.0)
+                    changed += 1
+            for movie_id, rating in ratings.items():
+                i = self._movie_idx(movie_id)
+                if self._value(u, i) != rating:
+                    self._set_value(u, i, rating)
+                    changed += 1
+            return changed
+
+    def user_ratings(self, user_id):
+        """Zwraca (movie_ids, ratings) ocenione przez użytkownika"""
+        with self._lock:
+            u = self._user_index.get(user_id)
+            if u is None:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            cols, values = self._row(u)
+            # Tylko kolumny tego użytkownika (bez kopiowania całej listy filmów)
+            movie_ids = np.fromiter((self._movie_ids[c] for c in cols.tolist()), dtype=np.int64, count=len(cols))
+            return movie_ids, values
+
+    def similar_users(self, user_id, k=10):
+        """
+        Top-k najbardziej podobnych użytkowników (cosine similarity).
+        Liczony jest tylko wiersz podobieństwa danego użytkownika, po kolumnach
+        filmów, które ocenił - koszt zależy od jego ocen, nie od rozmiaru macierzy.
+        """
+        with self._lock:
+            u = self._user_index.get(user_id)
+            if u is None:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+            cols, values = self._row(u)
+            dots = np.zeros(len(self._user_ids), dtype=np.float64)
+
+            base_mask = cols < self._csc.shape[1]
+            if base_mask.any():
+                co_raters = self._csc[:, cols[base_mask]] @ values[base_mask].astype(np.float64)
+                dots[:len(co_raters)] += co_raters
+
+            # Poprawki z bufora zmian (tylko filmy ocenione przez użytkownika)
+            user_values = dict(zip(cols.tolist(), values.tolist()))
+            for i, x in user_values.items():
+                for v, rating in self._pending_by_movie.get(i, {}).items():
+                    dots[v] += (rating - self._base_value(v, i)) * x
+
+            dots[u] = 0.0
+            candidates = np.flatnonzero(dots > 0)
+            if len(candidates) == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+            norms = np.sqrt(self._sq_norms[candidates]) * np.sqrt(self._sq_norms[u])
+            sims = dots[candidates] / norms
+            if len(candidates) > k:
+                top = np.argpartition(-sims, k - 1)[:k]
+                candidates, sims = candidates[top], sims[top]
+            order = np.argsort(-sims, kind='stable')
+            return np.asarray(self._user_ids, dtype=np.int64)[candidates[order]], sims[order]
+
+    def to_csr(self):
+        """Zwraca (macierz CSR, user_ids, movie_ids) po scaleniu bufora zmian"""
+        with self._lock:
+            self.compact()
+            return (
+                self._csr,
+                np.asarray(self._user_ids, dtype=np.int64),
+                np.asarray(self._movie_ids, dtype=np.int64),
+            )
+
+    def compact(self):
+        """Scala bufor zmian z macierzami bazowymi"""
+        with self._lock:
+            if self._pending_count == 0:
+                return
+            n_users, n_movies = len(self._user_ids), len(self._movie_ids)
+            base = self._csr.tocoo()
+            base_keys = base.row.astype(np.int64) * n_movies + base.col
+
+            p_rows, p_cols, p_values = [], [], []
+            for u, items in self._pending_by_user.items():
+                for i, rating in items.items():
+                    p_rows.append(u)
+                    p_cols.append(i)
+                    p_values.append(rating)
+            p_rows = np.asarray(p_rows, dtype=np.int64)
+            p_cols = np.asarray(p_cols, dtype=np.int64)
+            keep = ~np.isin(base_keys, p_rows * n_movies + p_cols)
+
+            merged = sparse.coo_matrix(
+                (
+                    np.concatenate([base.data[keep], np.asarray(p_values, dtype=np.float32)]),
+                    (np.concatenate([base.row[keep], p_rows]), np.concatenate([base.col[keep], p_cols]))
+                ),
+                shape=(n_users, n_movies)
+            )
+            self._set_base(merged.tocsr())
+
+    def _set_value(self, u, i, rating):
+        """Zapis do bufora zmian - ocena 0 oznacza usunięcie"""
+        old = self._value(u, i)
+        if old == rating:
+            return
+        self._nnz += (rating != 0) - (old != 0)
+        self._pending_by_user.setdefault(u, {})[i] = rating
+        self._pending_by_movie.setdefault(i, {})[u] = rating
+        self._sq_norms[u] += rating ** 2 - old ** 2
+        self._pending_count += 1
+        if self._pending_count >= self.compact_threshold:
+            self.compact()
+
+    def _set_base(self, csr):
+        csr.sum_duplicates()
+        csr.eliminate_zeros()
+        csr.sort_indices()
+        self._csr = csr
+        self._csc = csr.tocsc()
+        self._pending_by_user = {}
+        self._pending_by_movie = {}
+        self._pending_count = 0
+        self._sq_norms = np.zeros(csr.shape[0], dtype=np.float64)
+        self._sq_norms[:] = np.asarray(csr.multiply(csr).sum(axis=1), dtype=np.float64).ravel()
+        self._nnz = csr.nnz
+
+    def _user_idx(self, user_id):
+        u = self._user_index.get(user_id)
+        if u is None:
+            u = len(self._user_ids)
+            self._user_index[user_id] = u
+            self._user_ids.append(user_id)
+            if u >= len(self._sq_norms):
+                grown = np.zeros(max(16, 2 * len(self._sq_norms)), dtype=np.float64)
+                grown[:len(self._sq_norms)] = self._sq_norms
+                self._sq_norms = grown
+        return u
+
+    def _movie_idx(self, movie_id):
+        i = self._movie_index.get(movie_id)
+        if i is None:
+            i = len(self._movie_ids)
+            self._movie_index[movie_id] = i
+            self._movie_ids.append(movie_id)
+        return i
+
+    def _base_value(self, u, i):
+        if u >= self._csr.shape[0] or i >= self._csr.shape[1]:
+            return 0.0
+        start, stop = self._csr.indptr[u], self._csr.indptr[u + 1]
+        pos = start + np.searchsorted(self._csr.indices[start:stop], i)
+        if pos < stop and self._csr.indices[pos] == i:
+            return float(self._csr.data[pos])
+        return 0.0
+
+    def _value(self, u, i):
+        pending = self._pending_by_user.get(u)
+        if pending is not None and i in pending:
+            return pending[i]
+        return self._base_value(u, i)
+
+    def _row(self, u):
+        """Wiersz użytkownika (indeksy filmów, oceny) z uwzględnieniem bufora"""
+        if u < self._csr.shape[0]:
+            start, stop = self._csr.indptr[u], self._csr.indptr[u + 1]
+            cols = self._csr.indices[start:stop].astype(np.int64)
+            values = self._csr.data[start:stop]
+        else:
+            cols = np.empty(0, dtype=np.int64)
+            values = np.empty(0, dtype=np.float32)
+
+        pending = self._pending_by_user.get(u)
+        if pending:
+            merged = dict(zip(cols.tolist(), values.tolist()))
+            merged.update(pending)
+            merged = {i: rating for i, rating in merged.items() if rating != 0}
+            cols = np.fromiter(merged.keys(), dtype=np.int64, count=len(merged))
+            values = np.fromiter(merged.values(), dtype=np.float32, count=len(merged))
+        return cols, values
+
+
+def _rating_watermark(session):
+    """(największe id, najnowszy czas oceny) w tabeli ocen"""
+    from sqlalchemy import func
+    from app.models import Rating
+    last_id, last_timestamp = session.query(func.max(Rating.id), func.max(Rating.timestamp)).one()
+    return last_id or 0, last_timestamp
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecommendationCache:
+    """
+    Cache wyników rekomendacji per użytkownik (LRU + TTL).
+
+    Wpis użytkownika jest usuwany natychmiast, gdy on sam zapisze ocenę.
+    Zmiany globalne (oceny innych użytkowników, nowe filmy) podbijają tylko
+    numer generacji - wpis z poprzedniej generacji jest przeliczany dopiero
+    wtedy, gdy jest starszy niż global_refresh_interval sekund.
+    Wpis zapisany z wersją (np. wersja ocen użytkownika w bazie i wersja
+    modelu) jest chybieniem, gdy odczyt podaje inną - zmiany z innych
+    procesów, których unieważnienie tu nie dociera.
+    """
+
+    def __init__(self, max_size=1000, ttl=600, global_refresh_interval=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.global_refresh_interval = global_refresh_interval
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, user_id, version=None):
+        """Zwraca zapisane rekomendacje lub None (miss)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            value, created_at, generation, entry_version = entry
+            age = now - created_at
+            expired = age >= self.ttl
+            outdated = generation != self._generation and age >= self.global_refresh_interval
+            if version is not None and entry_version != version:
+                del self._entries[user_id]
+                self._invalidations += 1
+                self._misses += 1
+                return None
+            if expired or outdated:
+                del self._entries[user_id]
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self._hits += 1
+            return value
+
+    def set(self, user_id, value, version=None):
+        """Zapisuje rekomendacje użytkownika, usuwając najdawniej używane wpisy"""
+        with self._lock:
+            self._entries[user_id] = (value, time.monotonic(), self._generation, version)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, user_id):
+        """Usuwa wpis użytkownika (np. po jego nowej ocenie)"""
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self._invalidations += 1
+
+    def global_changed(self):
+        """Sygnalizuje zmianę danych globalnych (leniwe odświeżanie wpisów)"""
+        with self._lock:
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Liczniki trafień/chybień do doboru rozmiaru cache"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'generation': self._generation,
+            }
@@ -1,202 +1,905 @@
-import pandas as pd
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from app.models import Movie, Rating, User
+from scipy import sparse
+from app.models import db, Movie, Rating
+from app.similarity_index import GenreSimilarityIndex
+from app.rating_store import RatingStore
+from app.matrix_factorization import MatrixFactorizationModel
+from app.item_neighbors import ItemNeighborIndex, center_by_user, predict_scores
+from app.content_features import ContentFeatures, HashingEncoder
+from app.recommendation_cache import RecommendationCache
+from app.catalog_snapshot import CatalogSnapshot
+from app.metrics import metrics, STAGE_METRIC
+from app.retrieval import (
+    CandidateSource, RetrievalPipeline, UserContext,
+    candidates, exclude, mean_by_movie, top_k, to_recommendations,
+)
+from app.artifact_store import ArtifactStore
 from config import Config
-import json
+
+logger = logging.getLogger(__name__)
+
+RatingUpdate = namedtuple('RatingUpdate', 'user_id movie_id rating')
+
+# Nazwy artefaktów w ArtifactStore
+CONTENT_INDEX = 'content_index'
+MF_MODEL = 'mf_model'
+ITEM_NEIGHBORS = 'item_neighbors'
+CONTENT_FEATURES = 'content_features'
 
 class RecommendationEngine:
-    def __init__(self):
+    def __init__(self, rating_store=None, artifact_store=None, pending_ratings=None):
+        """
+        rating_store i artifact_store pozwalają podać własną macierz ocen
+        i składnicę modeli (np. zbiór treningowy w ewaluacji offline) -
+        domyślnie oceny z bazy i MODEL_DIR. pending_ratings() zwraca oceny
+        przyjęte, ale jeszcze nie zapisane w bazie (kolejka zapisów) -
+        dołączane do macierzy wczytywanej z bazy.
+        """
         self.content_weight = Config.CONTENT_BASED_WEIGHT
         self.collaborative_weight = Config.COLLABORATIVE_WEIGHT
+        self.text_weight = Config.CONTENT_TEXT_WEIGHT
+        self.text_candidates = Config.CONTENT_TEXT_CANDIDATES
         self.min_ratings = Config.MIN_RATINGS_FOR_COLLABORATIVE
         self.top_n = Config.TOP_N_RECOMMENDATIONS
+        self.candidate_budget = Config.RETRIEVAL_CANDIDATE_BUDGET
+        self.content_index_top_k = Config.CONTENT_INDEX_TOP_K
+        self.artifact_store = artifact_store or ArtifactStore(Config.MODEL_DIR, keep_versions=Config.ARTIFACT_KEEP_VERSIONS)
+        self.artifact_check_interval = Config.ARTIFACT_CHECK_INTERVAL
+        self._artifacts = {}  # nazwa -> (wersja, obiekt, czas sprawdzenia)
+        self._artifacts_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._rating_store = rating_store
+        self._rating_store_lock = threading.Lock()
+        self.pending_ratings = pending_ratings
+        self.rating_store_refresh_interval = Config.RATING_STORE_REFRESH_INTERVAL
+        # Oceny przyjęte w trakcie wczytywania lub odświeżania macierzy (None poza nimi)
+        self._unsaved_ratings = None
+        self._rating_events_lock = threading.Lock()
+        self.collaborative_backend = Config.COLLABORATIVE_BACKEND
+        self.mf_candidates = Config.MF_CANDIDATES
+        self.catalog_refresh_interval = Config.CATALOG_REFRESH_INTERVAL
+        self._catalog = None
+        self._catalog_lock = threading.Lock()
+        self.cache = RecommendationCache(
+            max_size=Config.RECOMMENDATION_CACHE_SIZE,
+            ttl=Config.RECOMMENDATION_CACHE_TTL,
+            global_refresh_interval=Config.RECOMMENDATION_CACHE_GLOBAL_REFRESH
+        )
     
-    def get_recommendations(self, user_id):
+    def get_recommendations(self, user_id, limit=None, rating_version=None):
         """
         Główna metoda - zwraca hybrydowe rekomendacje dla użytkownika
+        (top_n albo limit najlepszych). rating_version (wersja ocen użytkownika
+        w bazie i kolejce zapisów, recommendations_api.rating_version) wiąże
+        wpis cache z ocenami i model_version() - oceny zapisane przez inny
+        proces albo nowy model unieważniają go także tutaj, a przed
+        przeliczeniem oceny użytkownika są dociągane z bazy.
         """
-        content_scores = self._content_based_filtering(user_id)
-        collaborative_scores = self._collaborative_filtering(user_id)
+        limit = limit or self.top_n
+        version = (rating_version, self.model_version()) if rating_version is not None else None
+        # Wpis cache to (długość policzonej listy, rekomendacje) - krótsze listy są jej prefiksem
+        cached = self.cache.get(user_id, version)
+        if cached is not None and cached[0] >= limit:
+            metrics.inc('recommendation_requests_total', source='cache')
+            return cached[1][:limit]
         
-        # Kombinacja wyników
-        if collaborative_scores is not None and len(collaborative_scores) > 0:
-            # Użyj obu metod
-            hybrid_scores = self._combine_scores(content_scores, collaborative_scores)
-        else:
-            # Tylko content-based dla nowych użytkowników
-            hybrid_scores = content_scores
+        metrics.inc('recommendation_requests_total', source='computed')
+        length = max(limit, self.top_n)
+        with metrics.timer(STAGE_METRIC, stage='total'):
+            if rating_version is not None:
+                self.sync_user_ratings(user_id)
+            recommendations = self._compute_recommendations(user_id, length)
+        if version is not None:
+            # Artefakty mogły zostać wczytane lub zbudowane w trakcie liczenia
+            version = (rating_version, self.model_version())
+        self.cache.set(user_id, (length, recommendations), version)
+        return recommendations[:limit]
+    
+    def _compute_recommendations(self, user_id, limit=None):
+        """
+        Przelicza pełny hybrydowy pipeline (bez cache)
+        """
+        # Nowi użytkownicy dostają tylko content-based (źródło collaborative nic nie zwraca)
+        return to_recommendations(self._pipeline(limit).run(self._user_context(user_id)))
+    
+    def model_version(self):
+        """
+        Wersja danych, od których poza ocenami użytkownika zależą jego
+        rekomendacje: bieżące wersje artefaktów używanych przez backend,
+        liczba filmów w katalogu i wagi. Bez liczenia rekomendacji
+        (odczyt wskaźników CURRENT) - do ETag odpowiedzi API.
+        """
+        names = [CONTENT_INDEX]
+        if self.text_weight > 0:
+            names.append(CONTENT_FEATURES)
+        if self.collaborative_backend == 'mf':
+            names.append(MF_MODEL)
+        elif self.collaborative_backend == 'item':
+            names.append(ITEM_NEIGHBORS)
+        parts = [f'{name}={self.artifact_store.current_version(name)}' for name in names]
+        parts.append(f'catalog={len(self.get_catalog())}')
+        parts.append(f'weights={self.content_weight},{self.collaborative_weight},{self.text_weight}')
+        return ';'.join(parts)
+    
+    def get_recommendations_batch(self, user_ids):
+        """
+        Rekomendacje dla wielu użytkowników naraz - operacje na macierzach
+        rzadkich zamiast pętli po get_recommendations.
+        Zwraca słownik user_id -> lista {'movie_id', 'score'}
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
         
-        return hybrid_scores[:self.top_n]
+        with metrics.timer(STAGE_METRIC, stage='batch'):
+            return self._compute_recommendations_batch(user_ids)
     
-    def _content_based_filtering(self, user_id):
+    def _compute_recommendations_batch(self, user_ids):
         """
-        Content-Based Filtering: rekomendacje na podstawie gatunków filmów
+        Przelicza rekomendacje paczki (bez cache)
         """
-        # Pobierz oceny użytkownika
-        user_ratings = Rating.query.filter_by(user_id=user_id).all()
-        
-        if not user_ratings:
-            # Zwróć popularne filmy dla nowych użytkowników
-            return self._get_popular_movies()
-        
-        # Pobierz filmy które użytkownik ocenił pozytywnie (>= 3.5)
-        liked_movie_ids = [r.movie_id for r in user_ratings if r.rating >= 3.5]
-        
-        if not liked_movie_ids:
-            return self._get_popular_movies()
-        
-        # Pobierz wszystkie filmy z bazy
-        all_movies = Movie.query.all()
-        
-        # Stwórz macierz cech (genres jako tekst)
-        movies_data = []
-        for movie in all_movies:
-            genres_str = ' '.join(json.loads(movie.genres)) if movie.genres else ''
-            movies_data.append({
-                'id': movie.id,
-                'genres': genres_str,
-                'title': movie.title
-            })
-        
-        df = pd.DataFrame(movies_data)
-        
-        # TF-IDF vectorization
-        tfidf = TfidfVectorizer(stop_words='english')
-        tfidf_matrix = tfidf.fit_transform(df['genres'])
-        
-        # Oblicz podobieństwo
-        cosine_sim = cosine_similarity(tfidf_matrix, tfidf_matrix)
-        
-        # Znajdź podobne filmy do tych które użytkownik lubi
-        similar_movies = []
-        for movie_id in liked_movie_ids:
-            idx = df[df['id'] == movie_id].index[0]
-            sim_scores = list(enumerate(cosine_sim[idx]))
-            sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-            
-            for i, score in sim_scores[1:31]:  # Top 30 podobnych
-                movie_id_candidate = df.iloc[i]['id']
-                # Nie rekomenduj filmów już ocenionych
-                if movie_id_candidate not in [r.movie_id for r in user_ratings]:
-                    similar_movies.append({
-                        'movie_id': movie_id_candidate,
-                        'score': score
-                    })
-        
-        # Agreguj wyniki i posortuj
-        movie_scores = {}
-        for item in similar_movies:
-            mid = item['movie_id']
-            if mid not in movie_scores:
-                movie_scores[mid] = []
-            movie_scores[mid].append(item['score'])
-        
-        # Średni score dla każdego filmu
-        recommendations = [
-            {'movie_id': mid, 'score': np.mean(scores)}
-            for mid, scores in movie_scores.items()
-        ]
-        recommendations = sorted(recommendations, key=lambda x: x['score'], reverse=True)
+        ratings, store_user_ids, store_movie_ids = self.get_rating_store().to_csr()
+        content_index = self.get_content_index()
+        content_features = self.get_content_features() if self.text_weight > 0 else None
+        popular = self._get_popular_movies()
+        
+        # Wspólna przestrzeń kolumn: identyfikatory filmów
+        width = 1 + max(
+            int(store_movie_ids.max()) if len(store_movie_ids) else 0,
+            content_index.max_movie_id(),
+            content_features.max_movie_id() if content_features is not None else 0,
+            max((item['movie_id'] for item in popular), default=0)
+        )
+        store_rows = {int(uid): row for row, uid in enumerate(store_user_ids)}
+        batch_rows = np.array([store_rows.get(uid, -1) for uid in user_ids], dtype=np.int64)
         
-        return recommendations
+        # Oceny użytkowników z paczki (B×W)
+        present = np.flatnonzero(batch_rows >= 0)
+        selector = sparse.csr_matrix(
+            (np.ones(len(present), dtype=np.float32), (present, batch_rows[present])),
+            shape=(len(user_ids), ratings.shape[0])
+        )
+        rated = self._to_movie_columns(selector @ ratings, store_movie_ids, width)
+        rated_mask = rated.copy()
+        rated_mask.data[:] = 1.0
+        
+        content = self._batch_content_scores(rated, rated_mask, content_index, popular, width)
+        collaborative = self._batch_collaborative_scores(
+            user_ids, batch_rows, ratings, store_user_ids, store_movie_ids, rated, rated_mask, width
+        )
+        
+        # Wagi normalizowane w każdym wierszu do źródeł, które coś zwróciły (jak RetrievalPipeline)
+        sources = [(self.content_weight, content)]
+        if collaborative is not None:
+            sources.append((self.collaborative_weight, collaborative))
+        if content_features is not None:
+            sources.append((self.text_weight, self._batch_text_scores(content_features, rated, width)))
+        active = [weight * (scores.getnnz(axis=1) > 0) for weight, scores in sources]
+        total = np.sum(active, axis=0)
+        total[total == 0] = 1.0
+        hybrid = sparse.csr_matrix((len(user_ids), width), dtype=np.float64)
+        for weights, (_, scores) in zip(active, sources):
+            hybrid = hybrid + sparse.diags(weights / total) @ scores
+        hybrid = hybrid.tocsr()
+        
+        results = {}
+        for row, user_id in enumerate(user_ids):
+            start, stop = hybrid.indptr[row], hybrid.indptr[row + 1]
+            movie_ids = hybrid.indices[start:stop]
+            scores = hybrid.data[start:stop]
+            if len(scores) > self.top_n:
+                top = np.argpartition(-scores, self.top_n - 1)[:self.top_n]
+                movie_ids, scores = movie_ids[top], scores[top]
+            order = np.argsort(-scores, kind='stable')
+            results[user_id] = [
+                {'movie_id': int(mid), 'score': float(score)}
+                for mid, score in zip(movie_ids[order], scores[order])
+            ]
+        return results
     
-    def _collaborative_filtering(self, user_id):
+    def _batch_content_scores(self, rated, rated_mask, content_index, popular, width):
         """
-        Collaborative Filtering: rekomendacje na podstawie podobnych użytkowników
+        Content-based dla paczki: średnia podobieństw = (L @ S) / (L @ [S > 0]),
+        gdzie L to polubione filmy (B×W), a S to macierz sąsiadów z indeksu (W×W)
         """
-        # Pobierz wszystkie oceny
-        all_ratings = Rating.query.all()
+        liked = rated.copy()
+        liked.data = (liked.data >= 3.5).astype(np.float32)
+        liked.eliminate_zeros()
+        
+        neighbors = content_index.to_sparse(width)
+        neighbors_mask = neighbors.copy()
+        neighbors_mask.data[:] = 1.0
+        
+        counts = liked @ neighbors_mask
+        counts.data = 1.0 / counts.data
+        content = (liked @ neighbors).multiply(counts).tocsr()
         
-        if len(all_ratings) < self.min_ratings:
+        # Użytkownicy bez polubionych filmów dostają popularne filmy
+        cold = (liked.getnnz(axis=1) == 0).astype(np.float32)
+        if cold.any() and popular:
+            popular_row = sparse.csr_matrix(
+                (
+                    np.array([item['score'] or 0.0 for item in popular], dtype=np.float64),
+                    ([0] * len(popular), [item['movie_id'] for item in popular])
+                ),
+                shape=(1, width)
+            )
+            content = content + sparse.csr_matrix(cold[:, None]) @ popular_row
+        
+        # Nie rekomenduj filmów już ocenionych
+        content = (content - content.multiply(rated_mask)).tocsr()
+        content.eliminate_zeros()
+        return content
+    
+    def _batch_collaborative_scores(self, user_ids, batch_rows, ratings, store_user_ids, store_movie_ids, rated, rated_mask, width):
+        """
+        Collaborative dla paczki: macierz wag W (B×U, top-10 podobnych na wiersz),
+        średnia ważona = (W @ R_liked) / (W_bin @ [R_liked > 0]).
+        Tylko dla użytkowników z co najmniej min_ratings ocenami.
+        """
+        eligible = rated.getnnz(axis=1) >= self.min_ratings
+        if not eligible.any():
             return None
         
-        # Stwórz macierz user-movie
-        ratings_data = [
-            {'user_id': r.user_id, 'movie_id': r.movie_id, 'rating': r.rating}
-            for r in all_ratings
-        ]
-        df = pd.DataFrame(ratings_data)
-        
-        # User-movie matrix
-        user_movie_matrix = df.pivot_table(
-            index='user_id',
-            columns='movie_id',
-            values='rating'
-        ).fillna(0)
-        
-        # Oblicz podobieństwo między użytkownikami (Cosine Similarity)
-        user_similarity = cosine_similarity(user_movie_matrix)
-        user_similarity_df = pd.DataFrame(
-            user_similarity,
-            index=user_movie_matrix.index,
-            columns=user_movie_matrix.index
+        n_batch = len(user_ids)
+        collaborative = sparse.csr_matrix((n_batch, width), dtype=np.float64)
+        neighborhood_rows = batch_rows.copy()
+        neighborhood_rows[~eligible] = -1
+        
+        if self.collaborative_backend == 'mf':
+            mf_model = self.get_mf_model()
+            if mf_model is not None:
+                collaborative = collaborative + self._batch_mf_scores(mf_model, user_ids, rated_mask, width)
+                in_model = np.array([uid in mf_model for uid in user_ids])
+                neighborhood_rows[in_model] = -1
+        elif self.collaborative_backend == 'item':
+            item_neighbors = self.get_item_neighbors()
+            if item_neighbors is not None:
+                collaborative = collaborative + self._batch_item_scores(item_neighbors, rated, rated_mask, width)
+                # Wszyscy użytkownicy z ocenami obsłużeni przez sąsiadów filmów
+                neighborhood_rows[:] = -1
+        
+        present = np.flatnonzero(neighborhood_rows >= 0)
+        if len(present) == 0:
+            return (sparse.diags(eligible.astype(np.float64)) @ collaborative).tocsr()
+        
+        sq_norms = np.asarray(ratings.multiply(ratings).sum(axis=1), dtype=np.float64).ravel()
+        dots = (ratings[neighborhood_rows[present]] @ ratings.T).tocsr()
+        
+        weight_rows, weight_cols, weight_values = [], [], []
+        for row, batch_row in enumerate(present):
+            u = neighborhood_rows[batch_row]
+            start, stop = dots.indptr[row], dots.indptr[row + 1]
+            others = dots.indices[start:stop]
+            values = dots.data[start:stop]
+            keep = (others != u) & (values > 0)
+            others, values = others[keep], values[keep]
+            sims = values / (np.sqrt(sq_norms[others]) * np.sqrt(sq_norms[u]))
+            if len(sims) > 10:  # Top 10 podobnych
+                top = np.argpartition(-sims, 9)[:10]
+                others, sims = others[top], sims[top]
+            weight_rows.extend([batch_row] * len(others))
+            weight_cols.extend(others.tolist())
+            weight_values.extend(sims.tolist())
+        
+        weights = sparse.csr_matrix(
+            (weight_values, (weight_rows, weight_cols)),
+            shape=(n_batch, ratings.shape[0])
         )
+        weights_mask = weights.copy()
+        weights_mask.data[:] = 1.0
         
-        # Znajdź podobnych użytkowników
-        if user_id not in user_similarity_df.index:
-            return None
+        liked = ratings.copy().astype(np.float64)
+        liked.data[liked.data < 3.5] = 0.0
+        liked.eliminate_zeros()
+        liked_mask = liked.copy()
+        liked_mask.data[:] = 1.0
         
-        similar_users = user_similarity_df[user_id].sort_values(ascending=False)[1:11]  # Top 10 podobnych
-        
-        # Znajdź filmy ocenione przez podobnych użytkowników
-        recommendations = {}
-        user_rated_movies = set(df[df['user_id'] == user_id]['movie_id'])
-        
-        for similar_user_id, similarity_score in similar_users.items():
-            similar_user_ratings = df[df['user_id'] == similar_user_id]
-            
-            for _, row in similar_user_ratings.iterrows():
-                movie_id = row['movie_id']
-                rating = row['rating']
-                
-                # Nie rekomenduj filmów już ocenionych
-                if movie_id not in user_rated_movies and rating >= 3.5:
-                    if movie_id not in recommendations:
-                        recommendations[movie_id] = []
-                    # Ważona ocena według podobieństwa użytkowników
-                    recommendations[movie_id].append(rating * similarity_score)
-        
-        # Oblicz średnią ważoną dla każdego filmu
-        result = [
-            {'movie_id': mid, 'score': np.mean(scores)}
-            for mid, scores in recommendations.items()
-        ]
-        result = sorted(result, key=lambda x: x['score'], reverse=True)
+        counts = weights_mask @ liked_mask
+        counts.data = 1.0 / counts.data
+        neighborhood = (weights @ liked).multiply(counts).tocsr()
+        neighborhood = self._to_movie_columns(neighborhood, store_movie_ids, width)
         
-        return result
+        # Nie rekomenduj filmów już ocenionych
+        neighborhood = neighborhood - neighborhood.multiply(rated_mask)
+        collaborative = sparse.diags(eligible.astype(np.float64)) @ (collaborative + neighborhood)
+        collaborative = collaborative.tocsr()
+        collaborative.eliminate_zeros()
+        return collaborative
     
-    def _combine_scores(self, content_scores, collaborative_scores):
+    def _batch_mf_scores(self, mf_model, user_ids, rated_mask, width):
         """
-        Łączy wyniki z obu metod używając wag
+        Model czynników dla paczki: jedno mnożenie macierzy (B×F @ F×M)
+        i top-K w każdym wierszu przez argpartition
         """
-        combined = {}
+        rows = np.array([mf_model.user_index(uid) for uid in user_ids], dtype=np.int64)
+        present = np.flatnonzero(rows >= 0)
+        n_batch = len(user_ids)
+        if len(present) == 0:
+            return sparse.csr_matrix((n_batch, width), dtype=np.float64)
         
-        # Content-based scores
-        for item in content_scores:
-            mid = item['movie_id']
-            combined[mid] = item['score'] * self.content_weight
+        scores = mf_model.user_factors[rows[present]] @ mf_model.item_factors.T + mf_model.global_mean
         
-        # Collaborative scores
-        for item in collaborative_scores:
-            mid = item['movie_id']
-            if mid in combined:
-                combined[mid] += item['score'] * self.collaborative_weight
-            else:
-                combined[mid] = item['score'] * self.collaborative_weight
+        # Wyklucz ocenione filmy (przestrzeń kolumn modelu)
+        rated_present = rated_mask[present].tocoo()
+        model_cols = mf_model.movie_columns(rated_present.col)
+        known = model_cols >= 0
+        scores[rated_present.row[known], model_cols[known]] = -np.inf
         
-        result = [
-            {'movie_id': mid, 'score': score}
-            for mid, score in combined.items()
+        k = min(self.mf_candidates, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        finite = np.isfinite(top_scores)
+        batch_index = np.repeat(present, k).reshape(len(present), k)
+        return sparse.csr_matrix(
+            (
+                top_scores[finite].astype(np.float64),
+                (batch_index[finite], mf_model.movie_ids[top[finite]])
+            ),
+            shape=(n_batch, width)
+        )
+    
+    def _batch_item_scores(self, item_neighbors, rated, rated_mask, width):
+        """
+        Item-item dla paczki: średnia użytkownika + (C @ S) / (R_bin @ S),
+        gdzie C to oceny pomniejszone o średnią użytkownika, a S macierz sąsiadów
+        """
+        size = max(width, item_neighbors.max_movie_id() + 1)
+        neighbors = item_neighbors.to_sparse(size)[:width, :width].tocsr()
+        rated = sparse.csr_matrix(rated, dtype=np.float64)
+        counts = np.diff(rated.indptr)
+        means = np.divide(
+            np.asarray(rated.sum(axis=1)).ravel(), counts,
+            out=np.zeros(len(counts)), where=counts > 0
+        )
+        
+        numerator = center_by_user(rated) @ neighbors
+        denominator = (rated_mask @ neighbors).tocsr()
+        inverse = denominator.copy()
+        inverse.data = 1.0 / inverse.data
+        denominator.data[:] = 1.0
+        scores = sparse.diags(means) @ denominator + numerator.multiply(inverse)
+        
+        # Nie rekomenduj filmów już ocenionych
+        scores = (scores - scores.multiply(rated_mask)).tocsr()
+        scores.eliminate_zeros()
+        return scores
+    
+    def _batch_text_scores(self, content_features, rated, width):
+        """
+        Podobieństwo treści dla paczki: profile (średnie wektory polubionych
+        filmów) razy macierz wektorów, top text_candidates na użytkownika
+        """
+        liked_lists, excluded, batch_rows = [], [], []
+        for row in range(rated.shape[0]):
+            start, stop = rated.indptr[row], rated.indptr[row + 1]
+            movie_ids = rated.indices[start:stop]
+            liked = movie_ids[rated.data[start:stop] >= 3.5]
+            if len(liked):
+                batch_rows.append(row)
+                liked_lists.append(liked)
+                excluded.append(movie_ids)
+        
+        rows, cols, values = [], [], []
+        if batch_rows:
+            found = content_features.search(
+                content_features.profiles(liked_lists), self.text_candidates, excluded=excluded
+            )
+            for row, (movie_ids, scores) in zip(batch_rows, found):
+                rows.extend([row] * len(movie_ids))
+                cols.extend(movie_ids.tolist())
+                values.extend(scores.tolist())
+        return sparse.csr_matrix((values, (rows, cols)), shape=(rated.shape[0], width), dtype=np.float64)
+    
+    @staticmethod
+    def _to_movie_columns(matrix, movie_ids, width):
+        """Przenosi kolumny z wewnętrznych indeksów na identyfikatory filmów"""
+        coo = matrix.tocoo()
+        return sparse.csr_matrix(
+            (coo.data, (coo.row, movie_ids[coo.col])),
+            shape=(matrix.shape[0], width)
+        )
+    
+    def _user_context(self, user_id):
+        rated_movie_ids, ratings = self.get_rating_store().user_ratings(user_id)
+        return UserContext(user_id, rated_movie_ids, ratings)
+    
+    def _pipeline(self, limit=None):
+        """
+        Pipeline kandydaci -> scoring -> top-N (lub top-limit) z bieżącymi wagami silnika
+        """
+        sources = [
+            ContentSource(self, weight=self.content_weight),
+            CollaborativeSource(self, weight=self.collaborative_weight),
         ]
-        result = sorted(result, key=lambda x: x['score'], reverse=True)
+        if self.text_weight > 0:
+            sources.append(TextSource(self, weight=self.text_weight))
+        return RetrievalPipeline(
+            sources,
+            k=limit or self.top_n,
+            budget=self.candidate_budget
+        )
+    
+    def _content_based_filtering(self, user_id):
+        """
+        Content-Based Filtering: rekomendacje na podstawie gatunków filmów
+        (pełna posortowana lista, bez limitu kandydatów)
+        """
+        found = ContentSource(self).generate(self._user_context(user_id), budget=None)
+        return to_recommendations(top_k(found, None))
+    
+    def _collaborative_filtering(self, user_id):
+        """
+        Collaborative Filtering: rekomendacje na podstawie podobnych użytkowników
+        (lub modelu czynników ukrytych, jeśli COLLABORATIVE_BACKEND = 'mf')
+        """
+        found = CollaborativeSource(self).generate(self._user_context(user_id), budget=None)
+        if found is None:
+            return None
+        return to_recommendations(top_k(found, None))
+    
+    def _combine_scores(self, content_scores, collaborative_scores):
+        """
+        Łączy wyniki z obu metod używając wag
+        """
+        def as_candidates(items):
+            return candidates([item['movie_id'] for item in items], [item['score'] for item in items])
         
-        return result
+        combined = RetrievalPipeline.combine([
+            (self.content_weight, as_candidates(content_scores)),
+            (self.collaborative_weight, as_candidates(collaborative_scores)),
+        ])
+        return to_recommendations(top_k(combined, None))
     
     def _get_popular_movies(self):
         """
         Zwraca popularne filmy (dla cold start)
         """
-        popular = Movie.query.order_by(Movie.popularity.desc()).limit(50).all()
-        return [{'movie_id': m.id, 'score': m.popularity} for m in popular]
+        return to_recommendations(self._popular_candidates())
+    
+    def _popular_candidates(self):
+        movie_ids, popularity = self.get_catalog().top_popular(50)
+        return candidates(movie_ids, popularity)
+    
+    def get_catalog(self):
+        """
+        Zwraca kolumnową migawkę katalogu (wczytywaną raz, potem uzupełnianą
+        o nowe filmy co CATALOG_REFRESH_INTERVAL sekund)
+        """
+        if self._catalog is None:
+            with self._catalog_lock:
+                if self._catalog is None:
+                    with metrics.timer(STAGE_METRIC, stage='load_catalog'):
+                        self._catalog = CatalogSnapshot.load(db.session)
+        elif time.monotonic() - self._catalog.loaded_at > self.catalog_refresh_interval:
+            with self._catalog_lock:
+                if time.monotonic() - self._catalog.loaded_at > self.catalog_refresh_interval:
+                    with metrics.timer(STAGE_METRIC, stage='refresh_catalog'):
+                        refreshed = self._catalog.refresh(db.session)
+                    if refreshed:
+                        self.cache.global_changed()
+        return self._catalog
+    
+    def get_content_index(self):
+        """
+        Zwraca indeks podobieństwa gatunków - bieżącą wersję ze składnicy
+        artefaktów lub, jeśli jeszcze nie istnieje, zbudowany z bazy i opublikowany
+        """
+        try:
+            index = self._get_artifact(CONTENT_INDEX, GenreSimilarityIndex)
+        except ValueError:
+            # Artefakt w innym formacie
+            index = None
+        if index is None:
+            with self._build_lock:
+                index = self._artifacts.get(CONTENT_INDEX, (None, None))[1]
+                if index is None:
+                    index = self.build_content_index()
+        return index
+    
+    def build_content_index(self, chunk_size=512):
+        """
+        Buduje indeks top-K podobnych filmów z całego katalogu (offline)
+        """
+        movies = db.session.query(Movie.id, Movie.genre_mask).all()
+        index = GenreSimilarityIndex.build(movies, top_k=self.content_index_top_k, chunk_size=chunk_size)
+        self._publish(CONTENT_INDEX, index)
+        return index
+    
+    def get_content_features(self):
+        """
+        Zwraca wektory treści filmów (opis + gatunki) - bieżącą wersję ze
+        składnicy artefaktów lub, jeśli jeszcze nie istnieje, zakodowaną z bazy
+        """
+        try:
+            features = self._get_artifact(CONTENT_FEATURES, ContentFeatures)
+        except ValueError:
+            features = None
+        if features is None:
+            with self._build_lock:
+                features = self._artifacts.get(CONTENT_FEATURES, (None, None))[1]
+                if features is None:
+                    features = self.build_content_features()
+        return features
+    
+    def build_content_features(self):
+        """
+        Koduje opisy i gatunki całego katalogu (offline) i publikuje wektory
+        """
+        movies = [
+            (movie_id, overview, json.loads(genres) if genres else [])
+            for movie_id, overview, genres in db.session.query(Movie.id, Movie.overview, Movie.genres)
+        ]
+        encoder = HashingEncoder(
+            n_features=Config.CONTENT_HASH_FEATURES,
+            dim=Config.CONTENT_EMBEDDING_DIM,
+            genre_weight=Config.CONTENT_GENRE_WEIGHT
+        )
+        features = ContentFeatures.build(movies, encoder)
+        version = self._publish(CONTENT_FEATURES, features)
+        # Kolejne filmy dopisywane do plików opublikowanej wersji
+        features.path = self.artifact_store.path(CONTENT_FEATURES, version)
+        return features
+    
+    def get_rating_store(self):
+        """
+        Zwraca rezydentną macierz ocen (wczytywaną z bazy przy pierwszym użyciu,
+        potem uzupełnianą o oceny z innych procesów co RATING_STORE_REFRESH_INTERVAL sekund)
+        """
+        if self._rating_store is None:
+            with self._rating_store_lock:
+                if self._rating_store is None:
+                    with metrics.timer(STAGE_METRIC, stage='load_rating_store'):
+                        self._sync_rating_store()
+        elif self._rating_store_stale():
+            with self._rating_store_lock:
+                if self._rating_store_stale():
+                    with metrics.timer(STAGE_METRIC, stage='refresh_rating_store'):
+                        refreshed = self._sync_rating_store(self._rating_store)
+                    if refreshed:
+                        self.cache.global_changed()
+        return self._rating_store
+    
+    def _rating_store_stale(self):
+        # Macierze podane z zewnątrz (np. zbiór treningowy ewaluacji) nie mają loaded_at
+        loaded_at = self._rating_store.loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at > self.rating_store_refresh_interval
+    
+    def _sync_rating_store(self, store=None):
+        """
+        Wczytuje macierz z bazy (store=None) albo dociąga do store oceny
+        zmienione w bazie, a potem nakłada oceny jeszcze nie zapisane: migawkę
+        kolejki sprzed zapytania (co z niej zniknęło, jest już w bazie) oraz
+        oceny przyjęte w trakcie - starszy stan z bazy ich nie nadpisuje.
+        Zwraca liczbę ocen wczytanych lub zmienionych przez bazę.
+        """
+        with self._rating_events_lock:
+            self._unsaved_ratings = []
+        try:
+            unsaved = list(self.pending_ratings()) if self.pending_ratings is not None else []
+            if store is None:
+                store = RatingStore.load(db.session)
+                changed = store.nnz
+            else:
+                changed = store.refresh(db.session)
+        except Exception:
+            with self._rating_events_lock:
+                self._unsaved_ratings = None
+            raise
+        with self._rating_events_lock:
+            for rating_event in unsaved + self._unsaved_ratings:
+                if rating_event.rating is None:
+                    store.remove(rating_event.user_id, rating_event.movie_id)
+                else:
+                    store.upsert(rating_event.user_id, rating_event.movie_id, rating_event.rating)
+            self._unsaved_ratings = None
+            self._rating_store = store
+        return changed
+    
+    def get_mf_model(self):
+        """
+        Zwraca model czynników ukrytych (None jeśli nie wytrenowano albo
+        artefakt jest nieczytelny - wtedy rekomendacje z sąsiedztwa)
+        """
+        try:
+            return self._get_artifact(MF_MODEL, MatrixFactorizationModel)
+        except ValueError:
+            # Artefakt w innym formacie lub uszkodzony
+            logger.exception('Nie można wczytać artefaktu %s', MF_MODEL)
+            return self._skip_unreadable_artifact(MF_MODEL)
+    
+    def get_item_neighbors(self):
+        """
+        Zwraca indeks sąsiadów item-item (None jeśli nie zbudowano albo
+        artefakt jest nieczytelny - wtedy rekomendacje z sąsiedztwa użytkowników)
+        """
+        try:
+            return self._get_artifact(ITEM_NEIGHBORS, ItemNeighborIndex)
+        except ValueError:
+            logger.exception('Nie można wczytać artefaktu %s', ITEM_NEIGHBORS)
+            return self._skip_unreadable_artifact(ITEM_NEIGHBORS)
+    
+    def build_item_neighbors(self, rating_store=None):
+        """
+        Buduje offline top-K sąsiadów item-item (adjusted cosine) z tabeli ocen
+        lub podanego magazynu ocen
+        """
+        ratings, _, movie_ids = (rating_store or RatingStore.load(db.session)).to_csr()
+        index = ItemNeighborIndex.build(
+            ratings, movie_ids,
+            top_k=Config.ITEM_NEIGHBORS_TOP_K,
+            chunk_size=Config.ITEM_NEIGHBORS_CHUNK_SIZE,
+            min_support=Config.ITEM_NEIGHBORS_MIN_SUPPORT
+        )
+        self._publish(ITEM_NEIGHBORS, index)
+        return index
+    
+    def train_mf_model(self, rating_store=None):
+        """
+        Trenuje offline model czynników ukrytych z tabeli ocen (lub podanego
+        magazynu ocen) i publikuje go jako artefakt
+        """
+        ratings, user_ids, movie_ids = (rating_store or RatingStore.load(db.session)).to_csr()
+        model = MatrixFactorizationModel.train(
+            ratings, user_ids, movie_ids,
+            factors=Config.MF_FACTORS,
+            regularization=Config.MF_REGULARIZATION,
+            iterations=Config.MF_ITERATIONS
+        )
+        self._publish(MF_MODEL, model)
+        return model
+    
+    def _get_artifact(self, name, artifact_cls):
+        """
+        Bieżąca wersja artefaktu otwarta przez memmap (jedna fizyczna kopia
+        dla wszystkich procesów). Co ARTIFACT_CHECK_INTERVAL sekund sprawdzany
+        jest wskaźnik CURRENT - nowa wersja podmieniana jest bez restartu.
+        None jeśli artefakt nie został jeszcze opublikowany.
+        """
+        slot = self._artifacts.get(name)
+        now = time.monotonic()
+        if slot is not None and now - slot[2] < self.artifact_check_interval:
+            return slot[1]
+        with self._artifacts_lock:
+            slot = self._artifacts.get(name)
+            if slot is not None and now - slot[2] < self.artifact_check_interval:
+                return slot[1]
+            version = self.artifact_store.current_version(name)
+            if slot is not None and slot[0] == version:
+                self._artifacts[name] = (version, slot[1], now)
+                return slot[1]
+            value = None
+            if version is not None:
+                with metrics.timer(STAGE_METRIC, stage=f'load_{name}'):
+                    value = artifact_cls.from_arrays(*self.artifact_store.open(name, version))
+            self._artifacts[name] = (version, value, now)
+        if slot is not None:
+            # Podmieniony model - rekomendacje z cache są nieaktualne
+            self.cache.global_changed()
+        return value
+    
+    def _skip_unreadable_artifact(self, name):
+        """
+        Zapamiętuje nieczytelną bieżącą wersję artefaktu - kolejna próba dopiero
+        po publikacji nowej wersji. Zostaje wersja wczytana wcześniej (albo None).
+        """
+        version = self.artifact_store.current_version(name)
+        with self._artifacts_lock:
+            slot = self._artifacts.get(name)
+            value = slot[1] if slot is not None else None
+            self._artifacts[name] = (version, value, time.monotonic())
+        return value
+    
+    def _loaded_artifact(self, name):
+        """Artefakt wczytany już w tym procesie (None bez wczytywania i budowania)"""
+        slot = self._artifacts.get(name)
+        return slot[1] if slot is not None else None
+    
+    def _publish(self, name, artifact):
+        """Zapisuje nową wersję artefaktu i od razu używa jej w tym procesie"""
+        arrays, meta = artifact.to_arrays()
+        version = self.artifact_store.publish(name, arrays, meta)
+        with self._artifacts_lock:
+            replaced = name in self._artifacts
+            self._artifacts[name] = (version, artifact, time.monotonic())
+        if replaced:
+            self.cache.global_changed()
+        return version
+    
+    def warm_up(self):
+        """
+        Wczytuje z góry katalog, macierz ocen i artefakty modeli używane
+        przez bieżący backend, żeby pierwsze żądanie nie płaciło za ich ładowanie
+        """
+        with metrics.timer(STAGE_METRIC, stage='warm_up'):
+            self.get_catalog()
+            self.get_content_index()
+            self.get_rating_store()
+            if self.text_weight > 0:
+                self.get_content_features()
+            if self.collaborative_backend == 'mf':
+                self.get_mf_model()
+            elif self.collaborative_backend == 'item':
+                self.get_item_neighbors()
+
+    def rating_saved(self, user_id, movie_id, rating):
+        """
+        Aktualizuje macierz ocen w miejscu po zapisaniu oceny użytkownika
+        """
+        with self._rating_events_lock:
+            if self._rating_store is not None:
+                self._rating_store.upsert(user_id, movie_id, rating)
+            if self._unsaved_ratings is not None:
+                self._unsaved_ratings.append(RatingUpdate(user_id, movie_id, rating))
+            # Macierz jeszcze niewczytana weźmie ocenę z bazy albo z kolejki zapisów
+        self.cache.invalidate(user_id)
+        self.cache.global_changed()
+    
+    def sync_user_ratings(self, user_id):
+        """
+        Ustawia w macierzy oceny użytkownika z bazy i kolejki zapisów (oceny
+        zapisane przez inne procesy bez czekania na okresowe odświeżenie).
+        Zwraca liczbę zmienionych ocen.
+        """
+        store = self.get_rating_store()
+        # Pod blokadą zdarzeń - ocena przyjęta w trakcie nie zostanie nadpisana
+        with self._rating_events_lock:
+            # Migawka kolejki przed zapytaniem - co z niej zniknie, jest już w bazie
+            pending = self.pending_ratings(user_id) if self.pending_ratings is not None else []
+            ratings = dict(db.session.query(Rating.movie_id, Rating.rating).filter(Rating.user_id == user_id))
+            ratings.update((rating_event.movie_id, rating_event.rating) for rating_event in pending)
+            changed = store.set_user_ratings(user_id, ratings)
+        if changed:
+            self.cache.global_changed()
+        return changed
+    
+    def rating_dropped(self, user_id, movie_id):
+        """
+        Wycofuje ocenę, której nie udało się zapisać: przywraca w macierzy
+        ocenę z bazy (albo nowszą, czekającą już w kolejce zapisów)
+        """
+        pending = self.pending_ratings(user_id) if self.pending_ratings is not None else []
+        rating = next((e.rating for e in pending if e.movie_id == movie_id), None)
+        if rating is None:
+            rating = db.session.query(Rating.rating).filter_by(user_id=user_id, movie_id=movie_id).scalar()
+        with self._rating_events_lock:
+            if self._rating_store is not None:
+                if rating is None:
+                    self._rating_store.remove(user_id, movie_id)
+                else:
+                    self._rating_store.upsert(user_id, movie_id, rating)
+            if self._unsaved_ratings is not None:
+                self._unsaved_ratings.append(RatingUpdate(user_id, movie_id, rating))
+        self.cache.invalidate(user_id)
+        self.cache.global_changed()
+    
+    def movie_added(self, movie):
+        """
+        Aktualizuje już wczytane struktury silnika po dodaniu nowego filmu do bazy.
+        Brakujące artefakty nie są tu budowane (wywołanie na ścieżce żądania) -
+        film trafi do nich przy następnym build-content-index / build-content-features,
+        a inne procesy zobaczą go po wczytaniu nowej wersji artefaktu.
+        """
+        content_index = self._loaded_artifact(CONTENT_INDEX)
+        if content_index is not None:
+            content_index.add_movie(movie.id, movie.genre_mask)
+        content_features = self._loaded_artifact(CONTENT_FEATURES)
+        if content_features is not None:
+            # Dopisane wektory są w plikach wersji - widoczne także dla innych procesów
+            content_features.append(movie.id, movie.overview, json.loads(movie.genres or '[]'))
+        if self._catalog is not None:
+            self._catalog.upsert(movie)
+        self.cache.global_changed()
+
+
+class ContentSource(CandidateSource):
+    """
+    Kandydaci content-based: sąsiedzi polubionych filmów z indeksu
+    podobieństwa (średni wynik), popularne filmy dla cold start
+    """
+
+    name = 'content_based'
+
+    def __init__(self, engine, weight=1.0):
+        super().__init__(weight)
+        self.engine = engine
+
+    def generate(self, user, budget):
+        liked_movie_ids = user.liked_movie_ids()
+        if len(liked_movie_ids) == 0:
+            # Popularne filmy dla nowych użytkowników
+            return top_k(exclude(self.engine._popular_candidates(), user.excluded), budget)
+
+        # Znajdź podobne filmy do tych które użytkownik lubi (lookup w indeksie)
+        content_index = self.engine.get_content_index()
+        catalog = self.engine.get_catalog()
+        with metrics.timer(STAGE_METRIC, stage='similarity_lookup'):
+            neighbors = [content_index.neighbors(movie_id) for movie_id in liked_movie_ids.tolist()]
+            movie_ids = np.concatenate([ids for ids, _ in neighbors])
+            scores = np.concatenate([scores for _, scores in neighbors]).astype(np.float64)
+
+        # Średni score dla każdego filmu spoza ocenionych (i obecnego w katalogu)
+        known = catalog.rows(movie_ids) >= 0
+        found = exclude(mean_by_movie(movie_ids[known], scores[known]), user.excluded)
+        return top_k(found, budget)
+
+
+class CollaborativeSource(CandidateSource):
+    """
+    Kandydaci collaborative: model czynników ukrytych (backend 'mf'),
+    sąsiedzi ocenionych filmów (backend 'item') albo oceny 10 najbardziej
+    podobnych użytkowników
+    """
+
+    name = 'collaborative'
+
+    def __init__(self, engine, weight=1.0):
+        super().__init__(weight)
+        self.engine = engine
+
+    def generate(self, user, budget):
+        engine = self.engine
+        if len(user.rated_movie_ids) < engine.min_ratings:
+            return None
+        rating_store = engine.get_rating_store()
+
+        if engine.collaborative_backend == 'mf':
+            mf_model = engine.get_mf_model()
+            # Użytkownicy spoza wytrenowanego modelu korzystają z sąsiedztwa
+            if mf_model is not None and user.user_id in mf_model:
+                k = engine.mf_candidates if budget is None else min(engine.mf_candidates, budget)
+                return candidates(*mf_model.top_movies(user.user_id, user.rated_movie_ids.tolist(), k=k))
+        elif engine.collaborative_backend == 'item':
+            item_neighbors = engine.get_item_neighbors()
+            # Bez zbudowanego indeksu - sąsiedztwo użytkowników
+            if item_neighbors is not None and len(user.rated_movie_ids):
+                found = candidates(*predict_scores(item_neighbors, user.rated_movie_ids, user.ratings))
+                return top_k(exclude(found, user.excluded), budget)
+
+        if user.user_id not in rating_store:
+            return None
+
+        similar_user_ids, similarities = rating_store.similar_users(user.user_id, k=10)  # Top 10 podobnych
+        if len(similar_user_ids) == 0:
+            return None
+
+        # Oceny podobnych użytkowników ważone podobieństwem (tylko >= 3.5)
+        neighbor_ratings = [rating_store.user_ratings(uid) for uid in similar_user_ids.tolist()]
+        movie_ids = np.concatenate([ids for ids, _ in neighbor_ratings])
+        ratings = np.concatenate([values for _, values in neighbor_ratings]).astype(np.float64)
+        weights = np.repeat(similarities, [len(ids) for ids, _ in neighbor_ratings])
+        liked = ratings >= 3.5
+
+        found = mean_by_movie(movie_ids[liked], ratings[liked] * weights[liked])
+        return top_k(exclude(found, user.excluded), budget)
+
+
+class TextSource(CandidateSource):
+    """
+    Kandydaci z podobieństwa opisów i gatunków: profil użytkownika (średni
+    wektor polubionych filmów) razy macierz wektorów treści
+    """
+
+    name = 'content_text'
+
+    def __init__(self, engine, weight=1.0):
+        super().__init__(weight)
+        self.engine = engine
+
+    def generate(self, user, budget):
+        liked_movie_ids = user.liked_movie_ids()
+        if len(liked_movie_ids) == 0:
+            return None
+
+        engine = self.engine
+        content_features = engine.get_content_features()
+        k = engine.text_candidates if budget is None else min(engine.text_candidates, budget)
+        with metrics.timer(STAGE_METRIC, stage='text_similarity'):
+            profiles = content_features.profiles([liked_movie_ids])
+            movie_ids, scores = content_features.search(profiles, k, excluded=[user.excluded])[0]
+        return candidates(movie_ids, scores)
@@ -0,0 +1,70 @@
+"""
+Pomocnicze funkcje endpointu /api/recommendations.
+
+ETag odpowiedzi to skrót wersji ocen użytkownika (liczba i najnowszy czas
+ocen w bazie oraz oczekujących w kolejce zapisów), wersji modelu
+(RecommendationEngine.model_version) i okna czasowego długości TTL cache
+rekomendacji - zmiany globalne (oceny innych, popularność) trafiają do
+wyników najpóźniej po tym czasie, tak jak w cache silnika. Wszystko to
+liczone jest bez wyznaczania rekomendacji, więc niezmienione wyniki
+kończą się 304 przed jakimkolwiek przeliczeniem i serializacją.
+
+Kursor to zakodowana pozycja na liście i identyfikator ostatniego
+zwróconego filmu - jeśli lista się przesunęła, kolejna strona zaczyna się
+za tym filmem.
+"""
+import base64
+import binascii
+import hashlib
+import time
+from sqlalchemy import func
+from app.models import db, Rating
+
+
+def rating_version(user_id, write_queue=None):
+    """Wersja ocen użytkownika: jedno zapytanie po indeksie (user_id, timestamp)"""
+    count, last_rated_at = (
+        db.session.query(func.count(Rating.id), func.max(Rating.timestamp))
+        .filter(Rating.user_id == user_id)
+        .one()
+    )
+    pending = write_queue.pending_ratings_version(user_id) if write_queue is not None else None
+    return count, last_rated_at, pending
+
+
+def recommendations_etag(user_id, rating_version, model_version, window_seconds):
+    window = int(time.time() // window_seconds) if window_seconds else 0
+    key = f'{user_id}|{rating_version}|{model_version}|{window}'
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:24]
+
+
+def encode_cursor(position, movie_id):
+    return base64.urlsafe_b64encode(f'{position}:{movie_id}'.encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(pozycja, movie_id) z kursora, (0, None) dla pierwszej strony. ValueError dla błędnego."""
+    if not cursor:
+        return 0, None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        position, movie_id = raw.split(':')
+        position, movie_id = int(position), int(movie_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f'Nieprawidłowy kursor: {cursor}')
+    if position < 0:
+        raise ValueError(f'Nieprawidłowy kursor: {cursor}')
+    return position, movie_id
+
+
+def resume_position(recommendations, cursor):
+    """Indeks pierwszej rekomendacji kolejnej strony"""
+    position, movie_id = cursor
+    if movie_id is None:
+        return position
+    if 0 < position <= len(recommendations) and recommendations[position - 1]['movie_id'] == movie_id:
+        return position
+    for index, item in enumerate(recommendations):
+        if item['movie_id'] == movie_id:
+            return index + 1
+    return position
@@ -0,0 +1,133 @@
+"""
+Pipeline rekomendacji: generowanie kandydatów -> scoring -> top-K.
+
+Każde źródło kandydatów zwraca co najwyżej `budget` filmów (tablice
+identyfikatorów i wyników), wykluczenia robione są maską po posortowanej
+tablicy ocenionych filmów, a końcowy wybór to argpartition ograniczony do K.
+Koszt żądania zależy od K i budżetu kandydatów, nie od rozmiaru katalogu.
+"""
+from abc import ABC, abstractmethod
+from collections import namedtuple
+import numpy as np
+from app.metrics import metrics, STAGE_METRIC
+
+Candidates = namedtuple('Candidates', 'movie_ids scores')
+
+EMPTY = Candidates(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+
+class UserContext:
+    """Oceny użytkownika wczytane raz na żądanie i współdzielone przez źródła"""
+
+    def __init__(self, user_id, rated_movie_ids, ratings):
+        self.user_id = user_id
+        self.rated_movie_ids = np.asarray(rated_movie_ids, dtype=np.int64)
+        self.ratings = np.asarray(ratings)
+        self._excluded = None
+
+    @property
+    def excluded(self):
+        """Posortowane identyfikatory filmów do pominięcia (już ocenione)"""
+        if self._excluded is None:
+            self._excluded = np.unique(self.rated_movie_ids)
+        return self._excluded
+
+    def liked_movie_ids(self, threshold=3.5):
+        return self.rated_movie_ids[self.ratings >= threshold]
+
+
+def candidates(movie_ids, scores):
+    return Candidates(np.asarray(movie_ids, dtype=np.int64), np.asarray(scores, dtype=np.float64))
+
+
+def exclude(found, excluded_sorted):
+    """Usuwa kandydatów obecnych w posortowanej tablicy excluded_sorted"""
+    if len(excluded_sorted) == 0 or len(found.movie_ids) == 0:
+        return found
+    positions = np.searchsorted(excluded_sorted, found.movie_ids)
+    positions[positions == len(excluded_sorted)] = 0
+    keep = excluded_sorted[positions] != found.movie_ids
+    return Candidates(found.movie_ids[keep], found.scores[keep])
+
+
+def mean_by_movie(movie_ids, scores):
+    """Średni wynik dla każdego filmu (koszt zależny od liczby kandydatów)"""
+    if len(movie_ids) == 0:
+        return EMPTY
+    unique_ids, inverse = np.unique(movie_ids, return_inverse=True)
+    sums = np.bincount(inverse, weights=scores, minlength=len(unique_ids))
+    counts = np.bincount(inverse, minlength=len(unique_ids))
+    return Candidates(unique_ids, sums / counts)
+
+
+def top_k(found, k):
+    """Top-k kandydatów malejąco (argpartition, potem sortowanie tylko k)"""
+    scores = found.scores
+    if k is not None and len(scores) > k:
+        if k <= 0:
+            return EMPTY
+        top = np.argpartition(-scores, k - 1)[:k]
+        # Stabilna kolejność remisów: według pozycji wejściowej
+        top.sort()
+    else:
+        top = np.arange(len(scores))
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return Candidates(found.movie_ids[top], scores[top])
+
+
+def to_recommendations(found):
+    return [
+        {'movie_id': int(mid), 'score': float(score)}
+        for mid, score in zip(found.movie_ids.tolist(), found.scores.tolist())
+    ]
+
+
+class CandidateSource(ABC):
+    """Źródło kandydatów o wadze weight w RetrievalPipeline"""
+
+    name = 'source'
+
+    def __init__(self, weight=1.0):
+        self.weight = weight
+
+    @abstractmethod
+    def generate(self, user, budget):
+        """
+        Candidates (co najwyżej budget, bez filmów już ocenionych) lub None,
+        gdy źródło nie ma nic do zaproponowania
+        """
+
+
+class RetrievalPipeline:
+    """
+    Łączy źródła kandydatów ważoną sumą wyników. Wagi są normalizowane
+    do źródeł, które zwróciły kandydatów - jedyne aktywne źródło ma wagę 1.
+    """
+
+    def __init__(self, sources, k, budget=200):
+        self.sources = list(sources)
+        self.k = k
+        self.budget = budget
+
+    def run(self, user):
+        results = []
+        for source in self.sources:
+            with metrics.timer(STAGE_METRIC, stage=source.name):
+                found = source.generate(user, self.budget)
+            if found is not None and len(found.movie_ids):
+                results.append((source.weight, found))
+
+        with metrics.timer(STAGE_METRIC, stage='combine'):
+            return top_k(self.combine(results), self.k)
+
+    @staticmethod
+    def combine(results):
+        if not results:
+            return EMPTY
+        if len(results) == 1:
+            return results[0][1]
+        total_weight = sum(weight for weight, _ in results)
+        movie_ids = np.concatenate([found.movie_ids for _, found in results])
+        scores = np.concatenate([found.scores * (weight / total_weight) for weight, found in results])
+        unique_ids, inverse = np.unique(movie_ids, return_inverse=True)
+        return Candidates(unique_ids, np.bincount(inverse, weights=scores, minlength=len(unique_ids)))
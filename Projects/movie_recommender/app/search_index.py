@@ -0,0 +1,167 @@
+"""
+Lokalna wyszukiwarka filmów: SQLite FTS5 na kolumnach title i overview.
+
+Tabela movies_fts to indeks z zewnętrzną treścią (content='movies') -
+przechowuje tylko tokeny, a wiersze czyta z movies. Triggery na movies
+aktualizują indeks przy każdym insercie, zmianie i usunięciu filmu (także
+przy upsertach z importu katalogu). Wynik to bm25 (tytuł ważniejszy od
+opisu) połączony z log(1 + popularity). Dla baz innych niż SQLite
+wyszukiwarka jest niedostępna i /search korzysta z TMDb.
+"""
+import logging
+import math
+import re
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.models import db, hydrate_movies
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'movies_fts'
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+_CREATE_STATEMENTS = (
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, overview,
+        content='movies', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON movies BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, overview) VALUES (new.id, new.title, new.overview);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON movies BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, overview) VALUES ('delete', old.id, old.title, old.overview);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF title, overview ON movies BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, overview) VALUES ('delete', old.id, old.title, old.overview);
+        INSERT INTO {FTS_TABLE}(rowid, title, overview) VALUES (new.id, new.title, new.overview);
+    END
+    """,
+)
+
+
+def create_search_index():
+    """
+    Tworzy tabelę FTS5 z triggerami i indeksuje istniejące filmy.
+    Zwraca True, jeśli indeks powstał (False gdy już istnieje lub baza to nie SQLite).
+    """
+    if db.engine.dialect.name != 'sqlite' or search_index_exists():
+        return False
+    for statement in _CREATE_STATEMENTS:
+        db.session.execute(text(statement))
+    db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    db.session.commit()
+    return True
+
+
+def search_index_exists():
+    return db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first() is not None
+
+
+def match_expression(query):
+    """
+    Zapytanie FTS5 z tekstu użytkownika: każde słowo jako fraza z dopasowaniem
+    prefiksu ("mat"* znajdzie "Matrix"), słowa łączone przez AND.
+    None gdy w zapytaniu nie ma słów.
+    """
+    tokens = _TOKEN.findall(query.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def movie_to_result(movie):
+    """Film z bazy w kształcie wyniku wyszukiwania TMDb (dla tych samych szablonów)"""
+    return {
+        'id': movie.tmdb_id,
+        'title': movie.title,
+        'overview': movie.overview,
+        'poster_path': movie.poster_path,
+        'backdrop_path': movie.backdrop_path,
+        'release_date': str(movie.release_year) if movie.release_year else None,
+        'vote_average': movie.average_rating or 0.0,
+        'vote_count': movie.vote_count or 0,
+        'popularity': movie.popularity or 0.0,
+    }
+
+
+class MovieSearchIndex:
+    """
+    Wyszukiwanie w lokalnym katalogu. bm25 wybiera `candidates` najlepiej
+    dopasowanych filmów, które są następnie szeregowane według
+    -bm25 + popularity_weight · log(1 + popularity).
+    """
+
+    def __init__(self, title_weight=10.0, overview_weight=1.0, popularity_weight=0.5, candidates=200,
+                 recheck_interval=300):
+        self.title_weight = title_weight
+        self.overview_weight = overview_weight
+        self.popularity_weight = popularity_weight
+        self.candidates = candidates
+        self.recheck_interval = recheck_interval
+        self._available = False
+        self._checked_at = None
+
+    def available(self):
+        """
+        Czy indeks istnieje w bazie. Brak indeksu (np. przed flask migrate-db
+        albo po błędzie zapytania) sprawdzany jest ponownie co recheck_interval sekund.
+        """
+        if self._available:
+            return True
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.recheck_interval:
+            self._available = db.engine.dialect.name == 'sqlite' and search_index_exists()
+            self._checked_at = time.monotonic()
+        return self._available
+
+    def search(self, query, limit=20):
+        """
+        Filmy pasujące do zapytania, najlepsze najpierw (co najwyżej limit).
+        None gdy lokalny indeks jest niedostępny.
+        """
+        if not self.available():
+            return None
+        expression = match_expression(query)
+        if expression is None:
+            return []
+        try:
+            rows = db.session.execute(
+                text(
+                    f'SELECT movies.id, bm25({FTS_TABLE}, :title_weight, :overview_weight), movies.popularity '
+                    f'FROM {FTS_TABLE} JOIN movies ON movies.id = {FTS_TABLE}.rowid '
+                    f'WHERE {FTS_TABLE} MATCH :expression '
+                    f'ORDER BY 2 LIMIT :candidates'
+                ),
+                {
+                    'title_weight': self.title_weight,
+                    'overview_weight': self.overview_weight,
+                    'expression': expression,
+                    'candidates': self.candidates,
+                }
+            ).all()
+        except OperationalError:
+            # Indeks usunięty lub uszkodzony - TMDb do następnego sprawdzenia
+            logger.exception('Lokalne wyszukiwanie niedostępne')
+            db.session.rollback()
+            self._available = False
+            self._checked_at = time.monotonic()
+            return None
+        # bm25 w SQLite jest ujemne - im mniejsze, tym lepsze dopasowanie
+        ranked = sorted(
+            rows,
+            key=lambda row: row[1] - self.popularity_weight * math.log1p(max(row[2] or 0.0, 0.0))
+        )
+        return hydrate_movies(row[0] for row in ranked[:limit])
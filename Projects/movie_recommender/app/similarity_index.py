@@ -0,0 +1,243 @@
+import threading
+import numpy as np
+from scipy import sparse
+from app.genres import jaccard
+from app.artifact_store import dense_lookup
+
+
+class NeighborIndex:
+    """
+    Bazowy indeks najbliższych sąsiadów filmów: dla każdego filmu top-K
+    sąsiadów jako dwie tablice o stałej szerokości (identyfikatory i wyniki),
+    zamiast gęstej macierzy N×N. Wiersze zmienione po zbudowaniu trzymane są
+    w słowniku nadpisań, a nowe filmy dopisywane na końcu - tablice bazowe
+    mogą więc być zmapowane z pliku tylko do odczytu (ArtifactStore).
+    """
+
+    EMPTY = -1
+    KIND = None
+
+    def __init__(self, top_k=30):
+        self.top_k = top_k
+        self._lock = threading.RLock()
+        self._movie_ids = np.empty(0, dtype=np.int64)
+        self._extra_ids = []
+        self._row_by_id = np.full(0, -1, dtype=np.int64)
+        self._extra_rows = {}
+        self._neighbors = np.full((0, top_k), self.EMPTY, dtype=np.int64)
+        self._scores = np.zeros((0, top_k), dtype=np.float32)
+        self._overrides = {}
+
+    def __len__(self):
+        return len(self._movie_ids) + len(self._extra_ids)
+
+    def __contains__(self, movie_id):
+        return self._row_of(movie_id) is not None
+
+    def neighbors(self, movie_id):
+        """Zwraca (identyfikatory, wyniki) najbardziej podobnych filmów"""
+        with self._lock:
+            row = self._row_of(movie_id)
+            if row is None:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            ids, scores = self._row(row)
+            mask = ids != self.EMPTY
+            return ids[mask], scores[mask]
+
+    def max_movie_id(self):
+        """Największy identyfikator filmu w indeksie (0 dla pustego)"""
+        with self._lock:
+            movie_ids = self._all_movie_ids()
+            return int(movie_ids.max()) if len(movie_ids) else 0
+
+    def to_sparse(self, width=None):
+        """
+        Macierz CSR sąsiedztwa, w której wiersze i kolumny to identyfikatory
+        filmów, a wartości to wyniki podobieństwa (do obliczeń wsadowych)
+        """
+        with self._lock:
+            neighbors, scores = self._materialize()
+            movie_ids = self._all_movie_ids()
+        if width is None:
+            width = self.max_movie_id() + 1
+        rows = np.repeat(movie_ids, self.top_k)
+        cols = neighbors.ravel()
+        mask = cols != self.EMPTY
+        return sparse.csr_matrix(
+            (scores.ravel()[mask].astype(np.float64), (rows[mask], cols[mask])),
+            shape=(width, width)
+        )
+
+    def to_arrays(self):
+        """Tablice i metadane do zapisu w ArtifactStore (łącznie z dopisanymi filmami)"""
+        with self._lock:
+            neighbors, scores = self._materialize()
+            movie_ids = self._all_movie_ids()
+            arrays = {
+                'movie_ids': movie_ids,
+                'row_by_id': dense_lookup(movie_ids),
+                'neighbors': neighbors,
+                'scores': scores,
+            }
+            arrays.update(self._extra_arrays())
+        return arrays, {'kind': self.KIND, 'top_k': self.top_k}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        """
+        Indeks na tablicach z ArtifactStore.open (bez kopiowania - memmap).
+        ValueError dla artefaktu innego rodzaju.
+        """
+        if meta.get('kind') != cls.KIND:
+            raise ValueError(f"Nieobsługiwany format indeksu: {meta.get('kind')}")
+        index = cls(top_k=int(meta['top_k']))
+        index._set_movie_ids(arrays['movie_ids'], arrays['row_by_id'])
+        index._neighbors = arrays['neighbors']
+        index._scores = arrays['scores']
+        index._load_extra(arrays)
+        return index
+
+    def _set_movie_ids(self, movie_ids, row_by_id=None):
+        self._movie_ids = movie_ids
+        self._row_by_id = dense_lookup(movie_ids) if row_by_id is None else row_by_id
+
+    def _row_of(self, movie_id):
+        row = self._extra_rows.get(movie_id)
+        if row is not None:
+            return row
+        if 0 <= movie_id < len(self._row_by_id):
+            row = int(self._row_by_id[movie_id])
+            if row >= 0:
+                return row
+        return None
+
+    def _extra_arrays(self):
+        """Dodatkowe tablice zapisywane przez podklasy"""
+        return {}
+
+    def _load_extra(self, arrays):
+        pass
+
+    def _top_k(self, row_scores, movie_ids=None):
+        """Top-K (bez zerowego podobieństwa) posortowane malejąco"""
+        if movie_ids is None:
+            movie_ids = self._movie_ids
+        k = min(self.top_k, len(row_scores))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-row_scores, k - 1)[:k]
+        top = top[np.argsort(-row_scores[top], kind='stable')]
+        top = top[row_scores[top] > 0]
+        return movie_ids[top], row_scores[top].astype(np.float32)
+
+    def _padded(self, ids, scores):
+        padded_ids = np.full(self.top_k, self.EMPTY, dtype=np.int64)
+        padded_scores = np.zeros(self.top_k, dtype=np.float32)
+        padded_ids[:len(ids)] = ids
+        padded_scores[:len(scores)] = scores
+        return padded_ids, padded_scores
+
+    def _row(self, row):
+        if row in self._overrides:
+            return self._overrides[row]
+        return self._neighbors[row], self._scores[row]
+
+    def _all_movie_ids(self):
+        if not self._extra_ids:
+            return self._movie_ids
+        return np.concatenate([self._movie_ids, np.array(self._extra_ids, dtype=np.int64)])
+
+    def _materialize(self):
+        """Scala tablice bazowe z nadpisaniami w pełne tablice N×K"""
+        n_rows = len(self._movie_ids) + len(self._extra_ids)
+        neighbors = np.full((n_rows, self.top_k), self.EMPTY, dtype=np.int64)
+        scores = np.zeros((n_rows, self.top_k), dtype=np.float32)
+        neighbors[:len(self._neighbors)] = self._neighbors
+        scores[:len(self._scores)] = self._scores
+        for row, (ids, row_scores) in self._overrides.items():
+            neighbors[row] = ids
+            scores[row] = row_scores
+        return neighbors, scores
+
+
+class GenreSimilarityIndex(NeighborIndex):
+    """
+    Indeks najbliższych sąsiadów filmów według podobieństwa gatunków.
+
+    Podobieństwo to Jaccard masek bitowych gatunków (Movie.genre_mask).
+    Indeks buduje się offline, a nowe filmy dopisywane są przyrostowo.
+    """
+
+    KIND = 'genre-jaccard'
+
+    def __init__(self, top_k=30):
+        super().__init__(top_k)
+        self._masks = np.empty(0, dtype=np.uint64)
+        self._extra_masks = []
+
+    @classmethod
+    def build(cls, movies, top_k=30, chunk_size=512):
+        """
+        Buduje indeks z listy par (movie_id, maska gatunków).
+        Podobieństwo liczone jest blokami wierszy, więc pamięć to chunk_size×N.
+        """
+        index = cls(top_k=top_k)
+        movie_ids = np.array([mid for mid, _ in movies], dtype=np.int64)
+        masks = np.array([mask or 0 for _, mask in movies], dtype=np.uint64)
+
+        index._set_movie_ids(movie_ids)
+        index._masks = masks
+        index._neighbors = np.full((len(movie_ids), top_k), cls.EMPTY, dtype=np.int64)
+        index._scores = np.zeros((len(movie_ids), top_k), dtype=np.float32)
+
+        for start in range(0, len(movie_ids), chunk_size):
+            stop = min(start + chunk_size, len(movie_ids))
+            block = jaccard(masks[start:stop, None], masks[None, :])
+            # Film nie jest swoim własnym sąsiadem
+            block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+            for offset, row in enumerate(block):
+                ids, scores = index._top_k(row)
+                index._neighbors[start + offset, :len(ids)] = ids
+                index._scores[start + offset, :len(ids)] = scores
+
+        return index
+
+    def add_movie(self, movie_id, genre_mask):
+        """
+        Dodaje nowy film: wylicza jego sąsiadów i dopisuje go do list
+        sąsiadów filmów, dla których jest lepszy niż obecny K-ty wynik.
+        """
+        with self._lock:
+            if movie_id in self:
+                return
+            all_ids = self._all_movie_ids()
+            scores_all = jaccard(np.uint64(genre_mask or 0), self._all_masks())
+
+            row = len(all_ids)
+            self._extra_rows[movie_id] = row
+            self._extra_ids.append(movie_id)
+            self._extra_masks.append(genre_mask or 0)
+
+            ids, scores = self._top_k(scores_all, all_ids)
+            self._overrides[row] = self._padded(ids, scores)
+
+            for other_row in np.flatnonzero(scores_all > 0):
+                other_ids, other_scores = self._row(other_row)
+                score = scores_all[other_row]
+                if other_scores[-1] >= score and other_ids[-1] != self.EMPTY:
+                    continue
+                merged_ids = np.append(other_ids[other_ids != self.EMPTY], movie_id)
+                merged_scores = np.append(other_scores[other_ids != self.EMPTY], score)
+                order = np.argsort(-merged_scores, kind='stable')[:self.top_k]
+                self._overrides[other_row] = self._padded(merged_ids[order], merged_scores[order])
+
+    def _extra_arrays(self):
+        return {'masks': self._all_masks()}
+
+    def _load_extra(self, arrays):
+        self._masks = arrays['masks']
+
+    def _all_masks(self):
+        if not self._extra_masks:
+            return self._masks
+        return np.concatenate([self._masks, np.array(self._extra_masks, dtype=np.uint64)])
@@ -0,0 +1,180 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCacheTier:
+    """Warstwa w pamięci procesu z usuwaniem najdawniej używanych wpisów (LRU)"""
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, stored_at):
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheTier:
+    """
+    Trwała warstwa na dysku (plik SQLite), współdzielona między procesami.
+    Plik jest tworzony przy pierwszym użyciu, nie przy imporcie.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        """Połączenie (otwierane przy pierwszym użyciu) - wywoływane pod self._lock"""
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS tmdb_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)'
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get(self, key):
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT value, stored_at FROM tmdb_cache WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at):
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                'INSERT OR REPLACE INTO tmdb_cache (key, value, stored_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), stored_at)
+            )
+            connection.commit()
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute('DELETE FROM tmdb_cache')
+            connection.commit()
+
+
+class ResponseCache:
+    """
+    Cache odpowiedzi TMDb z osobnym TTL dla każdego endpointu.
+
+    Warstwy przeszukiwane są po kolei (pamięć, potem dysk), trafienie na
+    niższej warstwie jest kopiowane wyżej. Po upływie TTL wpis jest jeszcze
+    przez stale_ttl sekund zwracany od razu, a odświeżany w tle
+    (stale-while-revalidate).
+    """
+
+    def __init__(self, tiers, ttls=None, default_ttl=3600, stale_ttl=0):
+        self.tiers = tiers
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(endpoint, params):
+        """Klucz cache - bez klucza API, z posortowanymi parametrami"""
+        public_params = {k: v for k, v in params.items() if k != 'api_key'}
+        return f"{endpoint}:{json.dumps(public_params, sort_keys=True)}"
+
+    def get_or_fetch(self, endpoint, params, fetch):
+        """
+        Zwraca odpowiedź z cache albo wywołuje fetch() i zapisuje wynik.
+        Odpowiedzi None (błędy API) nie są zapisywane.
+        """
+        key = self.make_key(endpoint, params)
+        ttl = self.ttls.get(endpoint, self.default_ttl)
+        entry = self._lookup(key)
+        now = time.time()
+
+        if entry is not None:
+            value, stored_at = entry
+            age = now - stored_at
+            if age < ttl:
+                self._count('_hits')
+                return value
+            if age < ttl + self.stale_ttl:
+                self._count('_stale_hits')
+                self._refresh_in_background(key, fetch)
+                return value
+
+        self._count('_misses')
+        value = fetch()
+        if value is not None:
+            self._store(key, value, time.time())
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self._hits, 'stale_hits': self._stale_hits, 'misses': self._misses}
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def _lookup(self, key):
+        for level, tier in enumerate(self.tiers):
+            entry = tier.get(key)
+            if entry is not None:
+                for upper in self.tiers[:level]:
+                    upper.set(key, entry[0], entry[1])
+                return entry
+        return None
+
+    def _store(self, key, value, stored_at):
+        for tier in self.tiers:
+            tier.set(key, value, stored_at)
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = fetch()
+                if value is not None:
+                    self._store(key, value, time.time())
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
@@ -1,67 +1,82 @@
-import requests
 import json
+from app.http_transport import get_default_transport
+from app.tmdb_cache import ResponseCache, MemoryCacheTier, SQLiteCacheTier
 from config import Config
 
 class TMDbService:
-    def __init__(self):
-        self.api_key = Config.TMDB_API_KEY
-        self.base_url = Config.TMDB_BASE_URL
+    def __init__(self, base_url=None, api_key=None, cache=None, transport=None):
+        self.api_key = api_key or Config.TMDB_API_KEY
+        self.base_url = base_url or Config.TMDB_BASE_URL
         self.image_base_url = Config.TMDB_IMAGE_BASE_URL
-    
+        self.cache = cache if cache is not None else self._default_cache()
+        self.transport = transport or get_default_transport()
+
+    @staticmethod
+    def _default_cache():
+        """Cache z konfiguracji: pamięć (LRU) + opcjonalnie plik SQLite"""
+        if not Config.TMDB_CACHE_ENABLED:
+            return None
+        tiers = [MemoryCacheTier(max_size=Config.TMDB_CACHE_MEMORY_SIZE)]
+        if Config.TMDB_CACHE_PATH:
+            tiers.append(SQLiteCacheTier(Config.TMDB_CACHE_PATH))
+        return ResponseCache(
+            tiers,
+            ttls=Config.TMDB_CACHE_TTLS,
+            stale_ttl=Config.TMDB_CACHE_STALE_TTL
+        )
+
+    def _get(self, endpoint, path, params):
+        """Wykonuje zapytanie GET (przez cache, jeśli włączony)"""
+        def fetch():
+            response = self.transport.get(endpoint, f"{self.base_url}{path}", params=params)
+            if response is not None and response.status_code == 200:
+                return response.json()
+            return None
+
+        if self.cache is None:
+            return fetch()
+        return self.cache.get_or_fetch(endpoint, {'path': path, **params}, fetch)
+
     def get_popular_movies(self, page=1):
         """Pobiera popularne filmy z TMDb"""
-        url = f"{self.base_url}/movie/popular"
         params = {
             'api_key': self.api_key,
             'language': 'pl-PL',
             'page': page
         }
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            return response.json()
-        return None
-    
+        return self._get('popular', '/movie/popular', params)
+
     def search_movies(self, query, page=1):
         """Wyszukuje filmy po tytule"""
-        url = f"{self.base_url}/search/movie"
         params = {
             'api_key': self.api_key,
             'language': 'pl-PL',
             'query': query,
             'page': page
         }
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            return response.json()
-        return None
-    
+        return self._get('search', '/search/movie', params)
+
     def get_movie_details(self, tmdb_id):
         """Pobiera szczegóły filmu"""
-        url = f"{self.base_url}/movie/{tmdb_id}"
         params = {
             'api_key': self.api_key,
             'language': 'pl-PL'
         }
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            return response.json()
-        return None
-    
+        return self._get('movie', f'/movie/{tmdb_id}', params)
+
     def get_movie_genres(self):
         """Pobiera listę wszystkich gatunków"""
-        url = f"{self.base_url}/genre/movie/list"
         params = {
             'api_key': self.api_key,
             'language': 'pl-PL'
         }
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            return response.json()['genres']
+        data = self._get('genres', '/genre/movie/list', params)
+        if data:
+            return data['genres']
         return []
-    
+
     def discover_by_genre(self, genre_id, page=1):
         """Wyszukuje filmy po gatunku"""
-        url = f"{self.base_url}/discover/movie"
         params = {
             'api_key': self.api_key,
             'language': 'pl-PL',
@@ -69,11 +84,12 @@ class TMDbService:
             'page': page,
             'sort_by': 'popularity.desc'
         }
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            return response.json()
-        return None
-    
+        return self._get('discover', '/discover/movie', params)
+
+    def get_transport_stats(self):
+        """Opóźnienia i błędy zapytań do TMDb per endpoint"""
+        return self.transport.stats.snapshot()
+
     def get_poster_url(self, poster_path):
         """Zwraca pełny URL do plakatu filmu"""
         if poster_path:
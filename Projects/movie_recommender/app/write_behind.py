@@ -0,0 +1,350 @@
+import atexit
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.exc import InterfaceError, OperationalError
+from app.models import db, Rating, WatchHistory
+
+logger = logging.getLogger(__name__)
+
+RatingEvent = namedtuple('RatingEvent', 'user_id movie_id rating timestamp')
+WatchEvent = namedtuple('WatchEvent', 'user_id movie_id watched_at')
+# Ocena porzucona po nieudanych zapisach - subskrybenci wycofują ją z pamięci
+RatingDropped = namedtuple('RatingDropped', 'user_id movie_id rating')
+
+# Po tylu nieudanych zapisach z rzędu paczka jest porzucana
+MAX_FLUSH_ATTEMPTS = 3
+# Błędy połączenia i blokady bazy - cała paczka ponawiana, bez szukania błędnych zdarzeń
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+# SQLite (starsze wersje) przyjmuje najwyżej 999 parametrów w jednym zapytaniu
+MAX_SQL_PARAMETERS = 999
+
+
+class WriteBehindQueue:
+    """
+    Kolejka zapisów ocen i historii oglądania (write-behind).
+
+    Żądanie tylko dopisuje zdarzenie do pamięci; wątek w tle zapisuje je
+    paczkami co flush_interval sekund albo po przekroczeniu max_pending
+    zdarzeń. Kolejne oceny tej samej pary (użytkownik, film) są scalane -
+    zapisywana jest tylko ostatnia. Subskrybenci (np. silnik rekomendacji)
+    dostają każde zdarzenie od razu, przed zapisem do bazy, a gdy zdarzenia nie
+    uda się zapisać - RatingDropped dla każdej porzuconej oceny.
+    """
+
+    def __init__(self, app, flush_interval=0.5, max_pending=500):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._ratings = {}
+        self._watches = {}
+        self._in_flight = ({}, {})
+        self._subscribers = []
+        self._failed_attempts = 0
+        self._thread = None
+        self._stopping = False
+
+    def subscribe(self, callback):
+        """callback(event) wywoływany dla każdego RatingEvent / WatchEvent"""
+        self._subscribers.append(callback)
+
+    def rate(self, user_id, movie_id, rating):
+        rating_event = RatingEvent(user_id, movie_id, rating, datetime.utcnow())
+        with self._condition:
+            self._ratings[(user_id, movie_id)] = rating_event
+        self._enqueued(rating_event)
+
+    def watch(self, user_id, movie_id):
+        watch_event = WatchEvent(user_id, movie_id, datetime.utcnow())
+        with self._condition:
+            # Historia zapisuje tylko pierwsze obejrzenie
+            self._watches.setdefault((user_id, movie_id), watch_event)
+        self._enqueued(watch_event)
+
+    def pending_rating(self, user_id, movie_id):
+        """Ocena jeszcze nie zapisana w bazie (None jeśli brak)"""
+        with self._condition:
+            rating_event = self._ratings.get((user_id, movie_id)) or self._in_flight[0].get((user_id, movie_id))
+        return rating_event.rating if rating_event else None
+
+    def pending_ratings(self, user_id=None):
+        """
+        Oceny jeszcze nie zapisane w bazie (także paczka zapisywana w tej
+        chwili) - najnowsza dla każdej pary, opcjonalnie tylko jednego użytkownika
+        """
+        with self._condition:
+            events = dict(self._in_flight[0])
+            events.update(self._ratings)
+        return [rating_event for key, rating_event in events.items() if user_id is None or key[0] == user_id]
+
+    def has_pending_ratings(self, user_id):
+        with self._condition:
+            return any(key[0] == user_id for key in self._ratings) or \
+                any(key[0] == user_id for key in self._in_flight[0])
+
+    def pending_ratings_version(self, user_id):
+        """
+        (liczba, najnowszy czas) ocen użytkownika jeszcze nie zapisanych
+        w bazie - None jeśli brak
+        """
+        with self._condition:
+            events = [
+                event for pending in (self._ratings, self._in_flight[0])
+                for key, event in pending.items() if key[0] == user_id
+            ]
+        if not events:
+            return None
+        return len(events), max(event.timestamp for event in events)
+
+    def flush(self):
+        """
+        Zapisuje oczekujące zdarzenia w jednej transakcji, zwraca liczbę zapisanych.
+        Błąd danych (np. nieistniejący film) wyszukiwany jest bisekcją paczki -
+        zapisywane są pozostałe zdarzenia, a porzucane tylko błędne. Błędy
+        połączenia lub blokady bazy ponawiają całą paczkę przy kolejnym flush.
+        """
+        with self._flush_lock:
+            with self._condition:
+                ratings, watches = self._ratings, self._watches
+                self._ratings, self._watches = {}, {}
+                self._in_flight = (ratings, watches)
+            if not ratings and not watches:
+                return 0
+            events = list(ratings.values()) + list(watches.values())
+            dropped = None
+            try:
+                try:
+                    self._write(events)
+                    failed = []
+                except TRANSIENT_ERRORS:
+                    raise
+                except Exception:
+                    logger.exception('Nieudany zapis paczki %d zdarzeń, wyszukiwanie błędnych zdarzeń', len(events))
+                    failed = self._isolate_failures(events)
+                    dropped = _by_key(failed)
+            except Exception:
+                # Zapisy są idempotentne - ponowienie obejmuje też już zapisane części paczki
+                self._failed_attempts += 1
+                if self._failed_attempts >= MAX_FLUSH_ATTEMPTS:
+                    logger.exception('Porzucono %d zdarzeń po %d nieudanych zapisach',
+                                     len(events), self._failed_attempts)
+                    self._failed_attempts = 0
+                    dropped = (ratings, watches)
+                else:
+                    logger.exception('Nieudany zapis paczki zdarzeń, ponowienie przy następnym flush')
+                    self._requeue(ratings, watches)
+                return 0
+            finally:
+                with self._condition:
+                    self._in_flight = ({}, {})
+                if dropped is not None:
+                    # Już poza in-flight - subskrybenci nie widzą paczki jako oczekującej
+                    self._dropped(*dropped)
+            self._failed_attempts = 0
+            return len(events) - len(failed)
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=10):
+        """Zatrzymuje wątek i zapisuje wszystko, co zostało w kolejce"""
+        with self._condition:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+    def _enqueued(self, queued_event):
+        self._notify_subscribers(queued_event)
+        if self._thread is None:
+            self.start()
+        with self._condition:
+            self._condition.notify()
+
+    def _notify_subscribers(self, queued_event):
+        for callback in self._subscribers:
+            try:
+                callback(queued_event)
+            except Exception:
+                logger.exception('Błąd subskrybenta kolejki zapisów')
+
+    def _write(self, events):
+        """Zapisuje oceny i historię w jednej transakcji (wycofanej przy błędzie)"""
+        with self.app.app_context():
+            try:
+                upsert_ratings([e for e in events if isinstance(e, RatingEvent)])
+                insert_watches([e for e in events if isinstance(e, WatchEvent)])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _isolate_failures(self, events):
+        """
+        Zapisuje osobno obie połowy nieudanej paczki (rekurencyjnie dzieląc
+        te, które się nie zapisały), zwraca zdarzenia, których nie da się zapisać
+        """
+        if len(events) == 1:
+            return events
+        middle = len(events) // 2
+        failed = []
+        for half in (events[:middle], events[middle:]):
+            try:
+                self._write(half)
+            except TRANSIENT_ERRORS:
+                raise
+            except Exception:
+                failed += self._isolate_failures(half)
+        return failed
+
+    def _dropped(self, ratings, watches):
+        """Loguje porzucone zdarzenia i wycofuje oceny u subskrybentów"""
+        for rating_event in ratings.values():
+            logger.error('Porzucona ocena: użytkownik %s, film %s, ocena %s (%s)',
+                         rating_event.user_id, rating_event.movie_id, rating_event.rating, rating_event.timestamp)
+        for watch_event in watches.values():
+            logger.error('Porzucony wpis historii: użytkownik %s, film %s (%s)',
+                         watch_event.user_id, watch_event.movie_id, watch_event.watched_at)
+        # Subskrybenci sprawdzają stan w bazie
+        with self.app.app_context():
+            for rating_event in ratings.values():
+                self._notify_subscribers(
+                    RatingDropped(rating_event.user_id, rating_event.movie_id, rating_event.rating)
+                )
+
+    def _pending(self):
+        return len(self._ratings) + len(self._watches)
+
+    def _requeue(self, ratings, watches):
+        with self._condition:
+            # Nowsze oceny z kolejki mają pierwszeństwo, dla historii - wcześniejsze obejrzenie
+            for key, rating_event in ratings.items():
+                self._ratings.setdefault(key, rating_event)
+            self._watches.update(watches)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending() and not self._stopping:
+                    self._condition.wait()
+                if not self._stopping and self._pending() < self.max_pending:
+                    # Krótkie okno na zebranie paczki
+                    self._condition.wait_for(
+                        lambda: self._stopping or self._pending() >= self.max_pending,
+                        timeout=self.flush_interval
+                    )
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+
+def _by_key(events):
+    """(oceny, historia) jako słowniki (użytkownik, film) -> zdarzenie"""
+    ratings, watches = {}, {}
+    for queued_event in events:
+        target = ratings if isinstance(queued_event, RatingEvent) else watches
+        target[(queued_event.user_id, queued_event.movie_id)] = queued_event
+    return ratings, watches
+
+
+def upsert_ratings(rating_events):
+    """
+    Zapisuje oceny zapytaniami INSERT ... ON CONFLICT (user_id, movie_id) DO UPDATE
+    (SQLite/PostgreSQL) po tyle wierszy, ile mieści limit parametrów (4 na
+    ocenę); dla innych baz rozdziela insert i update.
+    """
+    chunk_size = MAX_SQL_PARAMETERS // 4
+    for start in range(0, len(rating_events), chunk_size):
+        _upsert_rating_chunk(rating_events[start:start + chunk_size])
+
+
+def _upsert_rating_chunk(rating_events):
+    rows = [
+        {'user_id': e.user_id, 'movie_id': e.movie_id, 'rating': e.rating, 'timestamp': e.timestamp}
+        for e in rating_events
+    ]
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(Rating).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id', 'movie_id'],
+            set_={'rating': statement.excluded.rating, 'timestamp': statement.excluded.timestamp}
+        )
+        db.session.execute(statement)
+        return
+
+    existing = {
+        (user_id, movie_id): rating_id
+        for rating_id, user_id, movie_id in db.session.query(Rating.id, Rating.user_id, Rating.movie_id).filter(
+            Rating.user_id.in_({row['user_id'] for row in rows}),
+            Rating.movie_id.in_({row['movie_id'] for row in rows})
+        )
+    }
+    updates = [
+        {'id': existing[(row['user_id'], row['movie_id'])], 'rating': row['rating'], 'timestamp': row['timestamp']}
+        for row in rows if (row['user_id'], row['movie_id']) in existing
+    ]
+    inserts = [row for row in rows if (row['user_id'], row['movie_id']) not in existing]
+    if inserts:
+        db.session.execute(db.insert(Rating), inserts)
+    if updates:
+        db.session.execute(db.update(Rating), updates)
+
+
+def insert_watches(watch_events):
+    """Dopisuje do historii pary (użytkownik, film), których jeszcze w niej nie ma"""
+    # Zapytanie o istniejące pary ma do 2 parametrów na wpis
+    chunk_size = MAX_SQL_PARAMETERS // 2
+    for start in range(0, len(watch_events), chunk_size):
+        _insert_watch_chunk(watch_events[start:start + chunk_size])
+
+
+def _insert_watch_chunk(watch_events):
+    existing = set(
+        db.session.query(WatchHistory.user_id, WatchHistory.movie_id).filter(
+            WatchHistory.user_id.in_({e.user_id for e in watch_events}),
+            WatchHistory.movie_id.in_({e.movie_id for e in watch_events})
+        )
+    )
+    rows = [
+        {'user_id': e.user_id, 'movie_id': e.movie_id, 'watched_at': e.watched_at}
+        for e in watch_events if (e.user_id, e.movie_id) not in existing
+    ]
+    if rows:
+        db.session.execute(db.insert(WatchHistory), rows)
+
+
+def enable_sqlite_wal(app):
+    """
+    Włącza tryb WAL dla połączeń SQLite (czytelnicy nie blokują zapisu
+    paczek z kolejki) oraz busy_timeout zamiast natychmiastowego błędu blokady
+    """
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA busy_timeout=5000')
+        cursor.close()
@@ -0,0 +1,26 @@
+"""
+Benchmarki uruchamiane z katalogu projektu (python -m benchmarks.<moduł>).
+
+app.py ma tę samą nazwę co pakiet app/ (bez __init__.py), więc ``import app``
+znalazłby moduł zamiast pakietu i ``app.models`` nie dałoby się zaimportować.
+Pakiet app/ rejestrowany jest jawnie w sys.modules przy imporcie benchmarków.
+"""
+import os
+import sys
+import types
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def register_app_package():
+    """Rejestruje katalog app/ jako pakiet ``app`` (jeśli nie jest już zaimportowany)"""
+    current = sys.modules.get('app')
+    if current is not None and hasattr(current, '__path__'):
+        return current
+    package = types.ModuleType('app')
+    package.__path__ = [os.path.join(PROJECT_DIR, 'app')]
+    sys.modules['app'] = package
+    return package
+
+
+register_app_package()
@@ -0,0 +1,221 @@
+"""
+Benchmark silnika rekomendacji na danych syntetycznych.
+
+Dla każdej skali tworzy tymczasową bazę SQLite, wypełnia ją danymi
+z synthetic_data i mierzy p50/p95, przepustowość oraz szczytową pamięć
+dla poszczególnych etapów. Wynik zapisywany jest jako JSON, który można
+porównać z poprzednim przebiegiem (--compare).
+
+Uruchomienie (z katalogu projektu):
+    python -m benchmarks.bench_engine --scales 1000,10000 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q)) * 1000 if samples else 0.0
+
+
+def measure(function, args_list, memory_samples=3):
+    """Czasy wywołań (ms) i szczytowa pamięć (KiB, tracemalloc) dla etapu"""
+    timings = []
+    started = time.perf_counter()
+    for args in args_list:
+        call_started = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    # Pamięć mierzona osobno - tracemalloc spowalnia wywołania
+    peak = 0
+    for args in args_list[:memory_samples]:
+        tracemalloc.start()
+        function(*args)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        'calls': len(timings),
+        'p50_ms': percentile(timings, 50),
+        'p95_ms': percentile(timings, 95),
+        'mean_ms': float(np.mean(timings)) * 1000 if timings else 0.0,
+        'throughput_per_s': len(timings) / elapsed if elapsed > 0 else 0.0,
+        'peak_memory_kib': peak / 1024,
+    }
+
+
+def measure_once(function):
+    """Jednorazowy etap (np. budowa indeksu): czas i szczytowa pamięć"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, {'seconds': elapsed, 'peak_memory_kib': peak / 1024}
+
+
+def run_scale(n_ratings, sample_users, seed):
+    """Pomiary jednej skali w tymczasowym katalogu (baza i modele), usuwanym na końcu"""
+    workdir = tempfile.mkdtemp(prefix='movierec-bench-')
+    try:
+        return _run_scale(workdir, n_ratings, sample_users, seed)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run_scale(workdir, n_ratings, sample_users, seed):
+    from flask import Flask
+    from app.models import db
+    from app.genres import genre_registry
+    from app.recommendation_engine import RecommendationEngine
+    from app.artifact_store import ArtifactStore
+    from benchmarks import synthetic_data
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        genre_registry.clear()
+        data, generate_stats = measure_once(lambda: synthetic_data.generate(n_ratings, seed=seed))
+        _, populate_stats = measure_once(lambda: synthetic_data.populate(data))
+
+        engine = RecommendationEngine()
+        engine.artifact_store = ArtifactStore(os.path.join(workdir, 'models'))
+
+        setup = {
+            'generate': generate_stats,
+            'populate_db': populate_stats,
+            'load_catalog': measure_once(engine.get_catalog)[1],
+            'load_rating_store': measure_once(engine.get_rating_store)[1],
+            'build_content_index': measure_once(engine.build_content_index)[1],
+        }
+
+        rng = np.random.default_rng(seed)
+        users = np.unique(data['ratings'][0]) + 1
+        users = rng.choice(users, size=min(sample_users, len(users)), replace=False).tolist()
+
+        # Wyniki etapów potrzebne jako wejście dla _combine_scores
+        pairs = [
+            (engine._content_based_filtering(u), engine._collaborative_filtering(u) or [])
+            for u in users
+        ]
+
+        def uncached_recommendations(user_id):
+            engine.cache.clear()
+            return engine.get_recommendations(user_id)
+
+        stages = {
+            '_content_based_filtering': measure(engine._content_based_filtering, [(u,) for u in users]),
+            '_collaborative_filtering': measure(engine._collaborative_filtering, [(u,) for u in users]),
+            '_combine_scores': measure(engine._combine_scores, pairs),
+            'get_recommendations': measure(uncached_recommendations, [(u,) for u in users]),
+            'get_recommendations_cached': measure(engine.get_recommendations, [(u,) for u in users]),
+            'get_recommendations_batch': measure(
+                engine.get_recommendations_batch,
+                [(users[i:i + 64],) for i in range(0, len(users), 64)]
+            ),
+        }
+        db.session.remove()
+        db.engine.dispose()
+
+    return {
+        'n_ratings': len(data['ratings'][0]),
+        'n_users': data['n_users'],
+        'n_movies': data['n_movies'],
+        'sample_users': len(users),
+        'setup': setup,
+        'stages': stages,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(current, baseline_path):
+    """Wypisuje stosunek p50/p95 bieżącego przebiegu do zapisanego wyniku"""
+    with open(baseline_path) as f:
+        baseline = {r['n_ratings']: r for r in json.load(f)['results']}
+    for result in current['results']:
+        previous = baseline.get(result['n_ratings'])
+        if previous is None:
+            continue
+        print(f"\n{result['n_ratings']} ocen (vs {baseline_path}):")
+        for stage, stats in result['stages'].items():
+            old = previous['stages'].get(stage)
+            if not old or not old['p50_ms'] or not old['p95_ms']:
+                continue
+            print(f"  {stage:32s} p50 x{stats['p50_ms'] / old['p50_ms']:.2f}  p95 x{stats['p95_ms'] / old['p95_ms']:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark RecommendationEngine na danych syntetycznych')
+    parser.add_argument('--scales', default='1000,10000,100000',
+                        help='Liczby ocen oddzielone przecinkami (np. 1000,10000,100000,1000000)')
+    parser.add_argument('--sample-users', type=int, default=50, help='Liczba użytkowników mierzonych na skalę')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='Poprzedni plik wyników do porównania')
+    args = parser.parse_args(argv)
+
+    # Artefakty modeli w katalogu tymczasowym, bez cache TMDb
+    model_dir = None
+    if 'MODEL_DIR' not in os.environ:
+        model_dir = os.environ['MODEL_DIR'] = tempfile.mkdtemp(prefix='movierec-models-')
+    os.environ.setdefault('TMDB_CACHE_ENABLED', '0')
+    try:
+        _run(args)
+    finally:
+        if model_dir is not None:
+            shutil.rmtree(model_dir, ignore_errors=True)
+
+
+def _run(args):
+    results = {'environment': environment(), 'results': []}
+    for scale in [int(s) for s in args.scales.split(',') if s]:
+        print(f'Skala {scale} ocen...', flush=True)
+        result = run_scale(scale, args.sample_users, args.seed)
+        results['results'].append(result)
+        for stage, stats in result['stages'].items():
+            print(f"  {stage:32s} p50 {stats['p50_ms']:9.2f} ms  p95 {stats['p95_ms']:9.2f} ms  "
+                  f"{stats['throughput_per_s']:9.1f}/s  peak {stats['peak_memory_kib']:9.0f} KiB")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'\nZapisano {args.output}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Kontrola czasu importu aplikacji.
+
+W osobnym procesie (bez cache modułów) importuje app.py, mierzy czas
+importu i sprawdza, czy nie załadował ciężkich modułów, które mają być
+wczytywane leniwie (numpy, scipy, silnik rekomendacji). Kończy się kodem 1,
+gdy mediana czasu przekracza budżet albo ciężki moduł został zaimportowany.
+
+Uruchomienie (z katalogu projektu):
+    python -m benchmarks.import_budget --budget-ms 800 --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Moduły, których sam import app.py nie może ładować
+FORBIDDEN_MODULES = ('numpy', 'scipy', 'pandas', 'sklearn', 'app.recommendation_engine')
+
+# app.py ma tę samą nazwę co pakiet app/, więc ładowany jest ze ścieżki
+# pod inną nazwą, a app/ rejestrowany jawnie jako pakiet
+CHILD_CODE = '''
+import importlib.util, json, os, sys, time, types
+project_dir = sys.argv[1]
+sys.path.insert(0, project_dir)
+started = time.perf_counter()
+package = types.ModuleType('app')
+package.__path__ = [os.path.join(project_dir, 'app')]
+sys.modules['app'] = package
+spec = importlib.util.spec_from_file_location('webapp', os.path.join(project_dir, 'app.py'))
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+elapsed = time.perf_counter() - started
+print(json.dumps({'seconds': elapsed, 'modules': sorted(sys.modules)}))
+'''
+
+
+def measure_import():
+    """Jeden import app.py w świeżym interpreterze: (sekundy, moduły, najwolniejsze importy)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_CODE, PROJECT_DIR],
+        capture_output=True, text=True, cwd=PROJECT_DIR,
+        env=dict(os.environ, METRICS_ENABLED='0', TMDB_CACHE_ENABLED='0')
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'Import app.py nie powiódł się:\n{result.stderr[-2000:]}')
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report['seconds'], set(report['modules']), parse_importtime(result.stderr)
+
+
+def parse_importtime(stderr):
+    """
+    Pary (moduł, skumulowany czas w ms) z wyjścia -X importtime.
+    Wcięcie nazwy (zagnieżdżenie importu) jest zachowane.
+    """
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings.append((name[1:].rstrip(), int(cumulative) / 1000))
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Budżet czasu importu app.py')
+    parser.add_argument('--budget-ms', type=float, default=800, help='Maksymalna mediana czasu importu')
+    parser.add_argument('--repeat', type=int, default=5, help='Liczba pomiarów (mediana)')
+    parser.add_argument('--top', type=int, default=10, help='Ile najwolniejszych importów pokazać')
+    args = parser.parse_args(argv)
+
+    samples = []
+    for _ in range(args.repeat):
+        seconds, modules, timings = measure_import()
+        samples.append(seconds * 1000)
+    median = statistics.median(samples)
+
+    print(f'Import app.py: mediana {median:.0f} ms (min {min(samples):.0f}, max {max(samples):.0f}), '
+          f'budżet {args.budget_ms:.0f} ms')
+    print('Najwolniejsze importy najwyższego poziomu:')
+    top_level = [(name, ms) for name, ms in timings if not name.startswith(' ')]
+    for name, ms in sorted(top_level, key=lambda item: -item[1])[:args.top]:
+        print(f'  {name:40s} {ms:8.1f} ms')
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f'mediana {median:.0f} ms przekracza budżet {args.budget_ms:.0f} ms')
+    loaded = [name for name in FORBIDDEN_MODULES if name in modules]
+    if loaded:
+        failures.append('import app.py ładuje moduły, które mają być leniwe: ' + ', '.join(loaded))
+    for failure in failures:
+        print(f'BŁĄD: {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Deterministyczny generator danych syntetycznych dla benchmarków:
+użytkownicy, filmy z rozkładem gatunków i oceny o rozkładzie potęgowym
+(popularność filmów i aktywność użytkowników według prawa Zipfa).
+"""
+import json
+import numpy as np
+from app.models import db, User, Movie, Rating
+from app.genres import genre_registry
+
+GENRES = [
+    'Drama', 'Comedy', 'Thriller', 'Action', 'Romance', 'Horror', 'Crime',
+    'Adventure', 'Science Fiction', 'Family', 'Fantasy', 'Mystery',
+    'Animation', 'Documentary', 'History', 'War', 'Music', 'Western', 'TV Movie',
+]
+
+# Skale: liczba ocen -> (użytkownicy, filmy)
+SCALES = {
+    1_000: (100, 500),
+    10_000: (1_000, 2_000),
+    100_000: (5_000, 10_000),
+    1_000_000: (30_000, 40_000),
+}
+
+
+def zipf_weights(n, exponent, rng):
+    """Wagi potęgowe 1/rank^exponent w losowej kolejności"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def generate(n_ratings, n_users=None, n_movies=None, seed=42):
+    """
+    Generuje dane w pamięci. Zwraca słownik z tablicami NumPy:
+    movie_genres (lista list), movie_popularity, ratings (user, movie, rating).
+    """
+    default_users, default_movies = SCALES.get(n_ratings, (max(10, n_ratings // 20), max(50, n_ratings // 25)))
+    n_users = n_users or default_users
+    n_movies = n_movies or default_movies
+    rng = np.random.default_rng(seed)
+
+    genre_weights = zipf_weights(len(GENRES), 1.0, rng)
+    genre_counts = rng.choice([1, 2, 3], size=n_movies, p=[0.4, 0.4, 0.2])
+    movie_genres = [
+        [GENRES[g] for g in rng.choice(len(GENRES), size=count, replace=False, p=genre_weights)]
+        for count in genre_counts
+    ]
+
+    movie_weights = zipf_weights(n_movies, 0.9, rng)
+    user_weights = zipf_weights(n_users, 0.7, rng)
+
+    # Losuj z nadmiarem i usuń powtórzone pary (unique_user_movie_rating)
+    n_samples = int(n_ratings * 1.3) + 100
+    users = rng.choice(n_users, size=n_samples, p=user_weights)
+    movies = rng.choice(n_movies, size=n_samples, p=movie_weights)
+    _, first = np.unique(users.astype(np.int64) * n_movies + movies, return_index=True)
+    first = np.sort(first)[:n_ratings]
+    users, movies = users[first], movies[first]
+
+    # Oceny: jakość filmu + nastawienie użytkownika + szum, w krokach co 0.5
+    movie_quality = rng.normal(3.4, 0.6, size=n_movies)
+    user_bias = rng.normal(0.0, 0.4, size=n_users)
+    values = movie_quality[movies] + user_bias[users] + rng.normal(0.0, 0.7, size=len(users))
+    values = np.clip(np.round(values * 2) / 2, 1.0, 5.0)
+
+    return {
+        'n_users': n_users,
+        'n_movies': n_movies,
+        'movie_genres': movie_genres,
+        'movie_popularity': (movie_weights * n_movies * 10).astype(np.float64),
+        'ratings': (users, movies, values),
+    }
+
+
+def populate(data, chunk_size=50_000):
+    """Zapisuje wygenerowane dane do bazy (wymaga kontekstu aplikacji)"""
+    # Maski gatunków przed zapisami w sesji - nowe gatunki zapisywane są osobnym połączeniem
+    movie_rows = [
+        {
+            'id': m + 1,
+            'tmdb_id': m + 1,
+            'title': f'Movie {m}',
+            'genres': json.dumps(genres),
+            'genre_mask': genre_registry.mask(genres),
+            'release_year': 1970 + m % 55,
+            'popularity': float(data['movie_popularity'][m]),
+        }
+        for m, genres in enumerate(data['movie_genres'])
+    ]
+    db.session.execute(db.insert(User), [
+        {'id': u + 1, 'username': f'user{u}', 'email': f'user{u}@example.com', 'password_hash': '!'}
+        for u in range(data['n_users'])
+    ])
+    db.session.execute(db.insert(Movie), movie_rows)
+    db.session.commit()
+
+    users, movies, values = data['ratings']
+    for start in range(0, len(users), chunk_size):
+        stop = start + chunk_size
+        db.session.execute(db.insert(Rating), [
+            {'user_id': int(u) + 1, 'movie_id': int(m) + 1, 'rating': float(r)}
+            for u, m, r in zip(users[start:stop], movies[start:stop], values[start:stop])
+        ])
+    db.session.commit()
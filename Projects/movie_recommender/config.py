@@ -13,8 +13,103 @@ class Config:
     TMDB_BASE_URL = os.environ.get('TMDB_BASE_URL') or 'https://api.themoviedb.org/3'
     TMDB_IMAGE_BASE_URL = 'https://image.tmdb.org/t/p/w500'
     
+    # TMDb HTTP transport (pooled session, rate limiting, retries)
+    TMDB_POOL_SIZE = 10  # Keep-alive connections per host
+    TMDB_CONNECT_TIMEOUT = 3.05  # Seconds
+    TMDB_READ_TIMEOUT = 10  # Seconds
+    TMDB_MAX_RETRIES = 3
+    TMDB_BACKOFF_FACTOR = 0.5  # Seconds, doubled on each retry
+    TMDB_MAX_BACKOFF = 30  # Seconds, also caps Retry-After
+    TMDB_RATE_LIMIT = 40  # Requests per second (client-side token bucket)
+    TMDB_RATE_BURST = 40
+    
+    # TMDb response cache (memory LRU + SQLite file)
+    TMDB_CACHE_ENABLED = os.environ.get('TMDB_CACHE_ENABLED', '1') != '0'
+    TMDB_CACHE_MEMORY_SIZE = 512  # Max responses kept in memory
+    # Empty TMDB_CACHE_PATH disables the file tier; by default it lives in the Flask instance folder next to movies.db
+    TMDB_CACHE_PATH = os.environ.get('TMDB_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'tmdb_cache.db'))
+    TMDB_CACHE_TTLS = {  # Seconds, per endpoint
+        'popular': 3600,
+        'search': 600,
+        'movie': 24 * 3600,
+        'genres': 7 * 24 * 3600,
+        'discover': 3600,
+    }
+    TMDB_CACHE_STALE_TTL = 24 * 3600  # Serve expired entries this long while refreshing in background
+    
+    # Local full-text search (SQLite FTS5 over title and overview)
+    SEARCH_PAGE_SIZE = 20  # Local results per page (TMDb returns 20)
+    SEARCH_INDEX_RECHECK_INTERVAL = 300  # Seconds between checks for a missing or failed local search index
+    SEARCH_CANDIDATES = 200  # Best bm25 matches re-ranked with popularity
+    SEARCH_TITLE_WEIGHT = 10.0  # bm25 weight of title relative to overview
+    SEARCH_POPULARITY_WEIGHT = 0.5  # Weight of log(1 + popularity) added to -bm25
+    
+    # Bulk catalog ingestion (flask ingest-catalog)
+    INGEST_WORKERS = 8  # Concurrent TMDb page fetches
+    INGEST_BATCH_SIZE = 500  # Movies per batched upsert
+    INGEST_CHECKPOINT_PATH = os.environ.get('INGEST_CHECKPOINT_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ingest_checkpoint.json')
+    RATINGS_CSV_CHUNK_SIZE = 50000  # Rows per executemany in import-ratings / export-ratings
+    
+    # Write-behind queue for ratings and watch history
+    WRITE_BEHIND_FLUSH_INTERVAL = 0.5  # Seconds between batched writes
+    WRITE_BEHIND_MAX_PENDING = 500  # Flush immediately above this many queued events
+    SQLITE_WAL = True  # journal_mode=WAL for SQLite databases
+    
+    # Instrumentation (/metrics endpoint, slow-request log)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+    SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 0))  # 0 disables slow-request logging
+    
     # Recommendation settings
-    MIN_RATINGS_FOR_COLLABORATIVE = 5  # Minimum ratings before using collaborative filtering
+    MIN_RATINGS_FOR_COLLABORATIVE = 5  # Minimum ratings of a user before collaborative candidates are used for them
     CONTENT_BASED_WEIGHT = 0.7
     COLLABORATIVE_WEIGHT = 0.3
     TOP_N_RECOMMENDATIONS = 10
+    RETRIEVAL_CANDIDATE_BUDGET = 200  # Max candidates each source passes to scoring
+    CATALOG_REFRESH_INTERVAL = 300  # Seconds between pulls of new movies into the in-memory catalog
+    RATING_STORE_REFRESH_INTERVAL = 60  # Seconds between pulls of ratings written by other processes into the in-memory matrix
+    LIST_PAGE_SIZE = 20  # Rows per page in my-ratings / my-history
+    
+    # Model artifacts (versioned .npy files, memory-mapped read-only by every worker process)
+    MODEL_DIR = os.environ.get('MODEL_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+    ARTIFACT_CHECK_INTERVAL = 30  # Seconds between checks for a newly published version
+    ARTIFACT_KEEP_VERSIONS = 3  # Older versions are deleted after publishing
+    CONTENT_INDEX_TOP_K = 30  # Number of similar movies stored per movie
+    ENGINE_WARM_UP = os.environ.get('ENGINE_WARM_UP', '1') != '0'  # Load engine and artifacts in background after the first request
+    
+    # Content text features (hashed overview + genres, random projection, appendable memmap)
+    CONTENT_TEXT_WEIGHT = 0.2  # Weight of overview similarity in the hybrid (0 disables)
+    CONTENT_TEXT_CANDIDATES = 100  # Most similar movies taken per user
+    CONTENT_HASH_FEATURES = 2 ** 14  # Hashing buckets before projection
+    CONTENT_EMBEDDING_DIM = 128  # Projected vector size (float32)
+    CONTENT_GENRE_WEIGHT = 2.0  # Weight of a genre token relative to an overview word
+    
+    # Collaborative backend: 'neighborhood' (user-based), 'item' (item-based) or 'mf' (matrix factorization)
+    COLLABORATIVE_BACKEND = os.environ.get('COLLABORATIVE_BACKEND') or 'neighborhood'
+    MF_FACTORS = 32
+    MF_REGULARIZATION = 0.1
+    MF_ITERATIONS = 15
+    MF_CANDIDATES = 100  # Number of top-scored movies taken from the factor model
+    ITEM_NEIGHBORS_TOP_K = 50  # Co-rated neighbors stored per movie
+    ITEM_NEIGHBORS_MIN_SUPPORT = 2  # Minimum users who rated both movies
+    ITEM_NEIGHBORS_CHUNK_SIZE = 1024  # Movies per sparse product block (bounds memory)
+    
+    # Per-user recommendation cache
+    RECOMMENDATION_CACHE_SIZE = 1000  # Max cached users (LRU eviction)
+    RECOMMENDATION_CACHE_TTL = 600  # Seconds
+    RECOMMENDATION_CACHE_GLOBAL_REFRESH = 60  # Seconds before recomputing after others' changes
+    
+    # JSON API (/api/recommendations)
+    API_RECOMMENDATIONS_LIMIT = 100  # Length of the ranked list paged through by the API
+    API_PAGE_SIZE = 20  # Default items per page
+    API_MAX_PAGE_SIZE = 100  # Upper bound for ?limit=
+    
+    # Nightly precompute job (flask precompute-recommendations)
+    PRECOMPUTE_BATCH_SIZE = 256  # Users scored per batch
+    PRECOMPUTE_WORKERS = int(os.environ.get('PRECOMPUTE_WORKERS', 0)) or None  # Default: all cores
+    PRECOMPUTE_MAX_AGE = 24 * 3600  # Seconds before precomputed rows are considered stale
+    
+    # Offline evaluation (flask evaluate)
+    EVALUATION_TEST_FRACTION = 0.2  # Newest share of ratings held out as the test period
+    EVALUATION_K = 10  # Cut-off for precision@K, recall@K and NDCG@K
+    EVALUATION_BATCH_SIZE = 256  # Users scored per pool task
+    EVALUATION_LATENCY_USERS = 200  # Users timed on the per-user serving path per grid point
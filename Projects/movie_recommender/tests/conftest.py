@@ -0,0 +1,33 @@
+"""
+Wspólne fikstury testów (uruchamianych z katalogu projektu: pytest tests/).
+
+app.py przesłania pakiet app/ przy zwykłym imporcie - pakiet rejestrowany
+jest tak jak w benchmarkach, przed importem modułów aplikacji.
+"""
+import os
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from benchmarks import register_app_package  # noqa: E402
+
+register_app_package()
+
+from flask import Flask  # noqa: E402
+from app.models import db  # noqa: E402
+
+
+@pytest.fixture
+def flask_app(tmp_path):
+    """Aplikacja z pustą bazą SQLite w katalogu tymczasowym (z aktywnym kontekstem)"""
+    flask_app = Flask(__name__)
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(flask_app)
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
@@ -0,0 +1,61 @@
+import numpy as np
+
+from app.genres import GenreRegistry, jaccard, popcount
+from app.models import db, Genre, Movie
+
+
+def stored_bits():
+    return dict(db.session.query(Genre.name, Genre.bit))
+
+
+def test_popcount_and_jaccard():
+    masks = np.array([0b0000, 0b0111, 0b0101, 1 << 62], dtype=np.uint64)
+    assert popcount(masks).tolist() == [0, 3, 2, 1]
+    np.testing.assert_allclose(jaccard(masks[1], masks), [0.0, 1.0, 2 / 3, 0.0])
+
+
+def test_mask_and_names_round_trip(flask_app):
+    registry = GenreRegistry()
+    mask = registry.mask(['Drama', 'Comedy', 'Drama'])
+    assert mask == 0b11
+    assert registry.names(mask) == ['Drama', 'Comedy']
+    assert stored_bits() == {'Drama': 0, 'Comedy': 1}
+
+
+def test_new_genre_survives_caller_rollback(flask_app):
+    registry = GenreRegistry()
+    # Jak w movie_detail: maska liczona przed zapisem filmu, zapis wycofany
+    bit = registry.bit('Horror')
+    db.session.add(Movie(tmdb_id=1, title='Wycofany', genre_mask=1 << bit))
+    db.session.flush()
+    db.session.rollback()
+
+    # Gatunek zapisany we własnej transakcji - bit w pamięci ma wiersz w bazie
+    assert Movie.query.count() == 0
+    assert stored_bits() == {'Horror': bit}
+    assert GenreRegistry().bit('Western') == bit + 1
+
+
+def test_bit_taken_by_another_process_is_retried(flask_app, monkeypatch):
+    registry = GenreRegistry()
+    registry.bit('Drama')
+    insert = registry._insert
+
+    def racing_insert(name, bit):
+        # Inny proces zajmuje ten sam bit tuż przed zapisem
+        monkeypatch.setattr(registry, '_insert', insert)
+        insert('Musical', bit)
+        insert(name, bit)
+
+    monkeypatch.setattr(registry, '_insert', racing_insert)
+    assert registry.bit('Comedy') == 2
+    assert stored_bits() == {'Drama': 0, 'Musical': 1, 'Comedy': 2}
+    assert registry.names(0b110) == ['Musical', 'Comedy']
+
+
+def test_names_reloads_genres_added_by_other_processes(flask_app):
+    registry = GenreRegistry()
+    registry.bit('Drama')
+    other = GenreRegistry()
+    mask = other.mask(['Drama', 'Sci-Fi'])
+    assert registry.names(mask) == ['Drama', 'Sci-Fi']
@@ -0,0 +1,115 @@
+import csv
+import json
+from datetime import datetime
+
+from app.models import db, Movie, Rating, User
+from app.movielens import export_ratings, import_movies, import_ratings, read_links
+
+LINKS = """movieId,imdbId,tmdbId
+1,0114709,862
+2,0113497,8844
+3,0113228,
+4,0114885,31357
+"""
+
+MOVIES = """movieId,title,genres
+1,Toy Story (1995),Adventure|Animation|Children
+2,Jumanji (1995),Adventure|Fantasy
+3,Grumpier Old Men (1995),Comedy|Romance
+4,Waiting to Exhale,(no genres listed)
+"""
+
+RATINGS = """userId,movieId,rating,timestamp
+1,1,4.0,964982703
+1,2,0.5,964981247
+1,3,4.0,964982224
+2,4,3.5,847434962
+2,1,5.0,847435000
+7,2,4.5,1106635946
+"""
+
+
+def write(path, content):
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+def saved_ratings():
+    """Oceny jako {(nazwa użytkownika, tmdb_id): (ocena, czas)}"""
+    rows = (
+        db.session.query(User.username, Movie.tmdb_id, Rating.rating, Rating.timestamp)
+        .join(User, User.id == Rating.user_id)
+        .join(Movie, Movie.id == Rating.movie_id)
+    )
+    return {(username, tmdb_id): (rating, timestamp) for username, tmdb_id, rating, timestamp in rows}
+
+
+def test_read_links_skips_rows_without_tmdb_id(tmp_path):
+    links = read_links(write(tmp_path / 'links.csv', LINKS))
+    assert links == {1: 862, 2: 8844, 4: 31357}
+
+
+def test_import_movies_parses_title_year_and_genres(flask_app, tmp_path):
+    links = read_links(write(tmp_path / 'links.csv', LINKS))
+    movies_path = write(tmp_path / 'movies.csv', MOVIES)
+
+    assert import_movies(movies_path, links, batch_size=2) == 3
+    assert import_movies(movies_path, links) == 0
+
+    toy_story = Movie.query.filter_by(tmdb_id=862).one()
+    assert (toy_story.title, toy_story.release_year) == ('Toy Story', 1995)
+    assert json.loads(toy_story.genres) == ['Adventure', 'Animation', 'Children']
+    untitled = Movie.query.filter_by(tmdb_id=31357).one()
+    assert (untitled.title, untitled.release_year, json.loads(untitled.genres)) == ('Waiting to Exhale', None, [])
+
+
+def test_import_ratings_skips_unlinked_movies_and_clips_scale(flask_app, tmp_path):
+    links = read_links(write(tmp_path / 'links.csv', LINKS))
+    import_movies(write(tmp_path / 'movies.csv', MOVIES), links)
+
+    stats = import_ratings(write(tmp_path / 'ratings.csv', RATINGS), links, chunk_size=2)
+
+    assert stats == {'ratings': 5, 'skipped': 1, 'clipped': 1, 'users': 3}
+    ratings = saved_ratings()
+    assert ratings[('ml1', 862)] == (4.0, datetime(2000, 7, 30, 18, 45, 3))
+    assert ratings[('ml1', 8844)][0] == 1.0
+    assert ratings[('ml2', 31357)][0] == 3.5
+    assert {user.email for user in User.query} == {f'ml{user}@movielens.invalid' for user in (1, 2, 7)}
+
+    # Ponowny import aktualizuje istniejące oceny zamiast je dublować
+    write(tmp_path / 'update.csv', 'userId,movieId,rating,timestamp\n1,1,2.0,964990000\n')
+    stats = import_ratings(tmp_path / 'update.csv', links)
+    assert (stats['ratings'], stats['users']) == (1, 0)
+    assert Rating.query.count() == 5
+    assert saved_ratings()[('ml1', 862)][0] == 2.0
+
+
+def test_export_then_import_round_trips_ratings(flask_app, tmp_path):
+    links = read_links(write(tmp_path / 'links.csv', LINKS))
+    import_movies(write(tmp_path / 'movies.csv', MOVIES), links)
+    import_ratings(write(tmp_path / 'ratings.csv', RATINGS), links)
+    user_names = dict(db.session.query(User.id, User.username))
+    before = saved_ratings()
+
+    ratings_out = tmp_path / 'export' / 'ratings.csv'
+    links_out = tmp_path / 'export' / 'links.csv'
+    ratings_out.parent.mkdir()
+    assert export_ratings(ratings_out, links_out, chunk_size=2) == len(before)
+
+    with open(ratings_out, newline='', encoding='utf-8') as f:
+        exported = list(csv.DictReader(f))
+    assert {row['rating'] for row in exported} == {'4', '1', '3.5', '5', '4.5'}
+
+    # Ponowny import eksportu: userId = users.id, więc konta to ml<users.id>
+    Rating.query.delete()
+    User.query.delete()
+    db.session.commit()
+    stats = import_ratings(ratings_out, read_links(links_out), chunk_size=2)
+
+    assert (stats['ratings'], stats['skipped'], stats['clipped']) == (len(before), 0, 0)
+    expected = {
+        (f'ml{user_id}', tmdb_id): value
+        for user_id, username in user_names.items()
+        for (name, tmdb_id), value in before.items() if name == username
+    }
+    assert saved_ratings() == expected
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.models import db, Rating
+from app.rating_store import RatingStore
+
+RATINGS = [
+    (1, 10, 5.0), (1, 20, 3.0), (1, 30, 4.0),
+    (2, 10, 4.0), (2, 20, 2.0), (2, 40, 5.0),
+    (3, 30, 1.0), (3, 40, 4.0),
+    (4, 50, 5.0),
+]
+
+
+def as_dict(store, user_id):
+    movie_ids, ratings = store.user_ratings(user_id)
+    return dict(zip(movie_ids.tolist(), ratings.tolist()))
+
+
+def brute_force_similarities(ratings, user_id):
+    """Podobieństwo cosinusowe z pełnych wektorów ocen (wzorzec dla similar_users)"""
+    by_user = {}
+    for user, movie, rating in ratings:
+        by_user.setdefault(user, {})[movie] = rating
+    target = by_user[user_id]
+    result = {}
+    for other, values in by_user.items():
+        dot = sum(rating * target[movie] for movie, rating in values.items() if movie in target)
+        if other == user_id or dot <= 0:
+            continue
+        norm = np.sqrt(sum(r * r for r in values.values())) * np.sqrt(sum(r * r for r in target.values()))
+        result[other] = dot / norm
+    return result
+
+
+@pytest.mark.parametrize('compact_threshold', [1000, 1])
+def test_pending_upserts_match_compacted_store(compact_threshold):
+    store = RatingStore.from_ratings(RATINGS, compact_threshold=compact_threshold)
+    store.upsert(1, 20, 5.0)   # zmiana istniejącej oceny
+    store.upsert(1, 60, 4.0)   # nowy film
+    store.upsert(5, 10, 3.0)   # nowy użytkownik
+
+    expected = [(u, m, r) for u, m, r in RATINGS if (u, m) != (1, 20)] + [(1, 20, 5.0), (1, 60, 4.0), (5, 10, 3.0)]
+    reference = RatingStore.from_ratings(expected)
+
+    assert store.nnz == reference.nnz == len(expected)
+    for user_id in (1, 2, 3, 4, 5):
+        assert as_dict(store, user_id) == as_dict(reference, user_id)
+    for user_id in (1, 2, 5):
+        users, sims = store.similar_users(user_id)
+        expected_users, expected_sims = reference.similar_users(user_id)
+        assert users.tolist() == expected_users.tolist()
+        np.testing.assert_allclose(sims, expected_sims)
+
+
+def test_compact_keeps_ratings_and_empties_pending_buffer():
+    store = RatingStore.from_ratings(RATINGS)
+    store.upsert(2, 30, 3.5)
+    before = {user_id: as_dict(store, user_id) for user_id in (1, 2, 3, 4)}
+
+    csr, user_ids, movie_ids = store.to_csr()
+
+    assert store._pending_count == 0
+    assert csr.nnz == store.nnz == len(RATINGS) + 1
+    assert {user_id: as_dict(store, user_id) for user_id in (1, 2, 3, 4)} == before
+    row = user_ids.tolist().index(2)
+    column = movie_ids.tolist().index(30)
+    assert csr[row, column] == pytest.approx(3.5)
+
+
+def test_similar_users_matches_brute_force_cosine():
+    store = RatingStore.from_ratings(RATINGS)
+    store.upsert(3, 10, 2.0)
+    ratings = RATINGS + [(3, 10, 2.0)]
+
+    users, sims = store.similar_users(1, k=10)
+    expected = brute_force_similarities(ratings, 1)
+
+    assert set(users.tolist()) == set(expected)
+    for user_id, similarity in zip(users.tolist(), sims.tolist()):
+        assert similarity == pytest.approx(expected[user_id])
+    assert list(sims) == sorted(sims, reverse=True)
+
+
+def test_similar_users_respects_k_and_unknown_users():
+    store = RatingStore.from_ratings(RATINGS)
+    users, _ = store.similar_users(1, k=1)
+    assert len(users) == 1
+    assert len(store.similar_users(99)[0]) == 0
+    assert len(store.similar_users(4)[0]) == 0
+
+
+def test_remove_and_set_user_ratings_survive_compaction():
+    store = RatingStore.from_ratings(RATINGS)
+    store.remove(1, 10)
+    assert 10 not in as_dict(store, 1)
+    assert store.nnz == len(RATINGS) - 1
+
+    changed = store.set_user_ratings(2, {20: 2.0, 70: 1.0})
+    assert changed == 3   # 10 i 40 usunięte, 70 dodany
+    assert as_dict(store, 2) == {20: 2.0, 70: 1.0}
+
+    store.compact()
+    assert as_dict(store, 1) == {20: 3.0, 30: 4.0}
+    assert as_dict(store, 2) == {20: 2.0, 70: 1.0}
+    assert store.nnz == store.to_csr()[0].nnz == len(RATINGS) - 1 - 2 + 1
+
+
+def test_refresh_reads_new_and_recently_changed_ratings(flask_app):
+    now = datetime.utcnow()
+    db.session.add_all([
+        Rating(user_id=1, movie_id=10, rating=5.0, timestamp=now - timedelta(days=1)),
+        Rating(user_id=2, movie_id=10, rating=3.0, timestamp=now),
+    ])
+    db.session.commit()
+    store = RatingStore.load(db.session)
+    assert store.loaded_at is not None
+
+    db.session.add(Rating(user_id=3, movie_id=20, rating=4.0, timestamp=now - timedelta(days=30)))
+    Rating.query.filter_by(user_id=2, movie_id=10).update({'rating': 1.0, 'timestamp': now + timedelta(seconds=1)})
+    db.session.commit()
+
+    assert store.refresh(db.session) == 2
+    assert as_dict(store, 2) == {10: 1.0}
+    assert as_dict(store, 3) == {20: 4.0}
+    assert store.refresh(db.session) == 0
@@ -0,0 +1,71 @@
+import json
+import logging
+
+import numpy as np
+import pytest
+
+from app.artifact_store import ArtifactStore
+from app.genres import genre_registry
+from app.models import db, Movie, Rating
+from app.recommendation_engine import ITEM_NEIGHBORS, MF_MODEL, RecommendationEngine
+
+GENRES = ['Action', 'Drama', 'Comedy']
+
+
+@pytest.fixture
+def engine(flask_app, tmp_path):
+    genre_registry.clear()
+    masks = [genre_registry.mask([genre]) for genre in GENRES]
+    db.session.add_all(
+        Movie(id=movie_id, tmdb_id=movie_id, title=f'Film {movie_id}', popularity=float(movie_id),
+              genres=json.dumps([GENRES[movie_id % 3]]), genre_mask=masks[movie_id % 3])
+        for movie_id in range(1, 31)
+    )
+    rng = np.random.default_rng(3)
+    db.session.add_all(
+        Rating(user_id=user_id, movie_id=int(movie_id), rating=float(rng.integers(1, 6)))
+        for user_id in range(1, 11)
+        for movie_id in rng.choice(np.arange(1, 31), size=8, replace=False)
+    )
+    db.session.commit()
+    engine = RecommendationEngine(artifact_store=ArtifactStore(str(tmp_path / 'models')))
+    engine.collaborative_backend = 'mf'
+    yield engine
+    genre_registry.clear()
+
+
+def publish_foreign_mf_artifact(engine):
+    engine.artifact_store.publish(MF_MODEL, {'values': np.zeros(3)}, {'kind': 'other'})
+
+
+def test_unreadable_mf_artifact_falls_back_to_neighbourhood(engine, caplog):
+    publish_foreign_mf_artifact(engine)
+
+    with caplog.at_level(logging.ERROR, logger='app.recommendation_engine'):
+        assert engine.get_mf_model() is None
+        recommendations = engine.get_recommendations(1)
+        assert engine.get_mf_model() is None
+
+    assert recommendations
+    assert [record.getMessage() for record in caplog.records] == [f'Nie można wczytać artefaktu {MF_MODEL}']
+    assert engine.get_recommendations_batch([1, 2])[1]
+
+
+def test_unreadable_new_version_keeps_loaded_mf_model(engine):
+    model = engine.train_mf_model()
+    assert engine.get_mf_model() is model
+
+    publish_foreign_mf_artifact(engine)
+    engine.artifact_check_interval = 0
+    assert engine.get_mf_model() is model
+
+    engine.train_mf_model()
+    assert engine.get_mf_model() is not model
+
+
+def test_unreadable_item_neighbors_fall_back_to_user_neighbourhood(engine):
+    engine.collaborative_backend = 'item'
+    engine.artifact_store.publish(ITEM_NEIGHBORS, {'values': np.zeros(3)}, {'kind': 'other'})
+
+    assert engine.get_item_neighbors() is None
+    assert engine.get_recommendations(1)
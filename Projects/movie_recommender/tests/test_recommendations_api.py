@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+
+from app import recommendations_api
+from app.models import db, Rating
+from app.recommendations_api import (
+    decode_cursor, encode_cursor, rating_version, recommendations_etag, resume_position,
+)
+
+
+class FakeQueue:
+    def __init__(self, version=None):
+        self.version = version
+
+    def pending_ratings_version(self, user_id):
+        return self.version
+
+
+class FakeTime:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def recommendations(*movie_ids):
+    return [{'movie_id': movie_id, 'score': 1.0} for movie_id in movie_ids]
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(40, 1234)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (40, 1234)
+    assert decode_cursor(None) == (0, None)
+    assert decode_cursor('') == (0, None)
+
+
+@pytest.mark.parametrize('cursor', ['@@', 'bm90LWEtY3Vyc29y', encode_cursor(-1, 5), encode_cursor('x', 5)])
+def test_decode_cursor_rejects_invalid_values(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_resume_position_continues_after_last_movie():
+    items = recommendations(1, 2, 3, 4, 5)
+    assert resume_position(items, (0, None)) == 0
+    assert resume_position(items, (2, 2)) == 2
+
+
+def test_resume_position_follows_shifted_list():
+    # Film 2 przesunął się z pozycji 2 na 4 - kolejna strona zaczyna się za nim
+    items = recommendations(7, 8, 1, 2, 3)
+    assert resume_position(items, (2, 2)) == 4
+    # Filmu nie ma już na liście - zostaje zapisana pozycja
+    assert resume_position(items, (3, 99)) == 3
+
+
+def test_etag_depends_on_every_version_part(monkeypatch):
+    clock = FakeTime(1200.0)
+    monkeypatch.setattr(recommendations_api, 'time', clock)
+    base = recommendations_etag(1, (3, None, None), 'model-a', 600)
+    assert base == recommendations_etag(1, (3, None, None), 'model-a', 600)
+    assert base != recommendations_etag(2, (3, None, None), 'model-a', 600)
+    assert base != recommendations_etag(1, (4, None, None), 'model-a', 600)
+    assert base != recommendations_etag(1, (3, None, None), 'model-b', 600)
+
+    clock.now = 1799.0
+    assert base == recommendations_etag(1, (3, None, None), 'model-a', 600)
+    clock.now = 1800.0
+    assert base != recommendations_etag(1, (3, None, None), 'model-a', 600)
+
+
+def test_rating_version_changes_with_saved_and_pending_ratings(flask_app):
+    empty = rating_version(1, FakeQueue())
+    assert empty == (0, None, None)
+
+    db.session.add(Rating(user_id=1, movie_id=10, rating=4.0, timestamp=datetime(2024, 1, 1)))
+    db.session.add(Rating(user_id=2, movie_id=10, rating=4.0, timestamp=datetime(2024, 2, 1)))
+    db.session.commit()
+    saved = rating_version(1, FakeQueue())
+    assert saved[:2] == (1, datetime(2024, 1, 1))
+
+    pending = rating_version(1, FakeQueue((1, datetime(2024, 3, 1))))
+    assert pending != saved
+    assert rating_version(1) == saved
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from app.retrieval import (
+    EMPTY, CandidateSource, RetrievalPipeline, UserContext,
+    candidates, exclude, mean_by_movie, to_recommendations, top_k,
+)
+
+
+class StaticSource(CandidateSource):
+    """Źródło zwracające stałych kandydatów (albo None)"""
+
+    def __init__(self, found, weight=1.0, name='static'):
+        super().__init__(weight)
+        self.found = found
+        self.name = name
+        self.budgets = []
+
+    def generate(self, user, budget):
+        self.budgets.append(budget)
+        return self.found
+
+
+def as_pairs(found):
+    return list(zip(found.movie_ids.tolist(), np.round(found.scores, 6).tolist()))
+
+
+def test_exclude_removes_only_listed_movies():
+    found = candidates([5, 1, 9, 3, 12], [0.5, 0.1, 0.9, 0.3, 1.2])
+    result = exclude(found, np.array([1, 3, 7, 100]))
+    assert as_pairs(result) == [(5, 0.5), (9, 0.9), (12, 1.2)]
+
+
+def test_exclude_handles_ids_beyond_excluded_range_and_empty_inputs():
+    found = candidates([200, 2], [1.0, 2.0])
+    assert as_pairs(exclude(found, np.array([1, 2]))) == [(200, 1.0)]
+    assert exclude(found, np.empty(0, dtype=np.int64)) is found
+    assert exclude(EMPTY, np.array([1])) is EMPTY
+
+
+def test_top_k_returns_best_descending_with_stable_ties():
+    found = candidates([1, 2, 3, 4, 5], [0.2, 0.9, 0.5, 0.9, 0.1])
+    assert as_pairs(top_k(found, 3)) == [(2, 0.9), (4, 0.9), (3, 0.5)]
+    assert as_pairs(top_k(found, None)) == [(2, 0.9), (4, 0.9), (3, 0.5), (1, 0.2), (5, 0.1)]
+    assert len(top_k(found, 0).movie_ids) == 0
+    assert len(top_k(found, 10).movie_ids) == 5
+
+
+def test_top_k_matches_full_sort():
+    rng = np.random.default_rng(7)
+    found = candidates(np.arange(1000), rng.random(1000))
+    expected = np.argsort(-found.scores, kind='stable')[:25]
+    assert top_k(found, 25).movie_ids.tolist() == expected.tolist()
+
+
+def test_mean_by_movie_averages_duplicates():
+    result = mean_by_movie(np.array([3, 1, 3, 3]), np.array([1.0, 2.0, 2.0, 3.0]))
+    assert as_pairs(result) == [(1, 2.0), (3, 2.0)]
+    assert mean_by_movie(np.empty(0, dtype=np.int64), np.empty(0)) is EMPTY
+
+
+def test_user_context_excludes_rated_and_selects_liked():
+    user = UserContext(1, [30, 10, 20], [5.0, 2.0, 3.5])
+    assert user.excluded.tolist() == [10, 20, 30]
+    assert sorted(user.liked_movie_ids().tolist()) == [20, 30]
+
+
+def test_candidate_source_requires_generate():
+    class Incomplete(CandidateSource):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_pipeline_normalises_weights_over_active_sources():
+    first = StaticSource(candidates([1, 2], [1.0, 0.5]), weight=0.6, name='first')
+    second = StaticSource(candidates([2, 3], [1.0, 1.0]), weight=0.2, name='second')
+    silent = StaticSource(None, weight=0.2, name='silent')
+    pipeline = RetrievalPipeline([first, second, silent], k=10, budget=50)
+
+    result = pipeline.run(UserContext(1, [], []))
+
+    # Wagi 0.6 i 0.2 normalizowane do 0.75 i 0.25 (źródło bez kandydatów pominięte)
+    assert as_pairs(result) == [(1, 0.75), (2, 0.625), (3, 0.25)]
+    assert first.budgets == second.budgets == silent.budgets == [50]
+
+
+def test_pipeline_single_active_source_keeps_its_scores():
+    only = StaticSource(candidates([4, 5, 6], [0.3, 0.9, 0.6]), weight=0.1)
+    empty = StaticSource(EMPTY)
+    result = RetrievalPipeline([only, empty], k=2).run(UserContext(1, [], []))
+    assert as_pairs(result) == [(5, 0.9), (6, 0.6)]
+    assert to_recommendations(result) == [{'movie_id': 5, 'score': 0.9}, {'movie_id': 6, 'score': 0.6}]
+
+
+def test_pipeline_without_candidates_returns_empty():
+    result = RetrievalPipeline([StaticSource(None)], k=5).run(UserContext(1, [], []))
+    assert len(result.movie_ids) == 0
@@ -0,0 +1,229 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+
+from app import http_transport
+from app.http_transport import HTTPTransport, TokenBucket
+from app.tmdb_cache import MemoryCacheTier, ResponseCache, SQLiteCacheTier
+from app.tmdb_service import TMDbService
+
+
+class FakeClock:
+    """Zegar i sleep bez czekania - czas przesuwa tylko sleep"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    """Sesja HTTP zwracająca kolejne odpowiedzi (albo rzucająca wyjątki) z listy"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append((url, params))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class FakeTransport:
+    """Transport zliczający zapytania TMDbService"""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = []
+
+    def get(self, endpoint, url, params=None):
+        self.calls.append((endpoint, url, dict(params)))
+        return FakeResponse(200, self.payload)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(http_transport, 'time', clock)
+    return clock
+
+
+def make_transport(responses, **kwargs):
+    transport = HTTPTransport(**kwargs)
+    transport.session = FakeSession(responses)
+    return transport
+
+
+def test_token_bucket_allows_burst_then_waits_for_refill(clock):
+    bucket = TokenBucket(rate=10, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.1)]
+
+
+def test_token_bucket_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(rate=10, capacity=2)
+    clock.now += 60
+    for _ in range(2):
+        bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert len(clock.sleeps) == 1
+
+
+def test_transport_waits_for_retry_after_seconds(clock):
+    transport = make_transport(
+        [FakeResponse(429, headers={'Retry-After': '2'}), FakeResponse(200, {'ok': True})],
+        max_retries=3
+    )
+    response = transport.get('popular', 'https://tmdb.test/movie/popular')
+
+    assert response.status_code == 200
+    assert clock.sleeps == [2.0]
+    stats = transport.stats.snapshot()['popular']
+    assert stats['requests'] == 2
+    assert stats['errors'] == 1
+    assert stats['retries'] == 1
+
+
+def test_transport_caps_retry_after_at_max_backoff(clock):
+    transport = make_transport(
+        [FakeResponse(503, headers={'Retry-After': '3600'}), FakeResponse(200)],
+        max_backoff=30
+    )
+    transport.get('movie', 'https://tmdb.test/movie/1')
+    assert clock.sleeps == [30]
+
+
+def test_transport_accepts_retry_after_http_date(clock):
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=10), usegmt=True)
+    transport = make_transport([FakeResponse(429, headers={'Retry-After': past}), FakeResponse(200)])
+    transport.get('movie', 'https://tmdb.test/movie/1')
+    assert clock.sleeps == [0.0]
+
+
+def test_transport_returns_client_errors_without_retrying(clock):
+    transport = make_transport([FakeResponse(404)])
+    assert transport.get('movie', 'https://tmdb.test/movie/1').status_code == 404
+    assert clock.sleeps == []
+
+
+def test_transport_returns_none_after_connection_errors(clock):
+    transport = make_transport([requests.ConnectionError()] * 3, max_retries=2, backoff_factor=0.5)
+    assert transport.get('movie', 'https://tmdb.test/movie/1') is None
+    # Backoff z jitterem: 0.5 * 2^próba * [0.5, 1)
+    assert len(clock.sleeps) == 2
+    assert 0.25 <= clock.sleeps[0] < 0.5
+    assert 0.5 <= clock.sleeps[1] < 1.0
+    assert transport.stats.snapshot()['movie']['errors'] == 3
+
+
+def test_response_cache_serves_fresh_entries_without_fetching():
+    cache = ResponseCache([MemoryCacheTier()], default_ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {'page': 1}
+
+    assert cache.get_or_fetch('popular', {'page': 1}, fetch) == {'page': 1}
+    assert cache.get_or_fetch('popular', {'page': 1}, fetch) == {'page': 1}
+    assert len(calls) == 1
+    assert cache.stats() == {'hits': 1, 'stale_hits': 0, 'misses': 1}
+
+
+def test_response_cache_does_not_store_failed_fetches():
+    cache = ResponseCache([MemoryCacheTier()], default_ttl=60)
+    assert cache.get_or_fetch('popular', {}, lambda: None) is None
+    assert cache.get_or_fetch('popular', {}, lambda: {'ok': True}) == {'ok': True}
+    assert cache.stats()['misses'] == 2
+
+
+def test_response_cache_serves_stale_entry_and_revalidates_in_background():
+    memory = MemoryCacheTier()
+    cache = ResponseCache([memory], ttls={'movie': 60}, stale_ttl=3600)
+    key = ResponseCache.make_key('movie', {'id': 1})
+    memory.set(key, {'title': 'stary'}, time.time() - 120)
+    refreshed = threading.Event()
+
+    def fetch():
+        refreshed.set()
+        return {'title': 'nowy'}
+
+    assert cache.get_or_fetch('movie', {'id': 1}, fetch) == {'title': 'stary'}
+    assert refreshed.wait(5)
+    deadline = time.time() + 5
+    while memory.get(key)[0] != {'title': 'nowy'} and time.time() < deadline:
+        time.sleep(0.01)
+    assert memory.get(key)[0] == {'title': 'nowy'}
+    assert cache.stats()['stale_hits'] == 1
+
+
+def test_response_cache_fetches_synchronously_after_stale_window():
+    memory = MemoryCacheTier()
+    cache = ResponseCache([memory], ttls={'movie': 60}, stale_ttl=60)
+    memory.set(ResponseCache.make_key('movie', {}), {'title': 'stary'}, time.time() - 600)
+    assert cache.get_or_fetch('movie', {}, lambda: {'title': 'nowy'}) == {'title': 'nowy'}
+    assert cache.stats()['misses'] == 1
+
+
+def test_response_cache_promotes_sqlite_hits_to_memory(tmp_path):
+    memory = MemoryCacheTier()
+    disk = SQLiteCacheTier(str(tmp_path / 'cache.db'))
+    cache = ResponseCache([memory, disk], default_ttl=60)
+    key = ResponseCache.make_key('genres', {})
+    disk.set(key, {'genres': []}, time.time())
+
+    assert cache.get_or_fetch('genres', {}, lambda: pytest.fail('fetch')) == {'genres': []}
+    assert memory.get(key)[0] == {'genres': []}
+
+
+def test_sqlite_tier_creates_file_on_first_use_and_is_shared(tmp_path):
+    path = tmp_path / 'nested' / 'cache.db'
+    writer = SQLiteCacheTier(str(path))
+    assert not path.exists()
+
+    writer.set('key', {'value': 1}, 123.0)
+    assert path.exists()
+    assert SQLiteCacheTier(str(path)).get('key') == ({'value': 1}, 123.0)
+
+
+def test_tmdb_service_cache_key_ignores_api_key():
+    cache = ResponseCache([MemoryCacheTier()], default_ttl=60)
+    transport = FakeTransport({'results': []})
+    first = TMDbService(base_url='https://tmdb.test', api_key='a', cache=cache, transport=transport)
+    second = TMDbService(base_url='https://tmdb.test', api_key='b', cache=cache, transport=transport)
+
+    assert first.search_movies('matrix') == {'results': []}
+    assert second.search_movies('matrix') == {'results': []}
+    assert len(transport.calls) == 1
+    endpoint, url, params = transport.calls[0]
+    assert (endpoint, url, params['api_key']) == ('search', 'https://tmdb.test/search/movie', 'a')
@@ -0,0 +1,116 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import write_behind
+from app.models import Rating, WatchHistory
+from app.write_behind import MAX_FLUSH_ATTEMPTS, RatingDropped, WriteBehindQueue
+
+
+@pytest.fixture
+def queue(flask_app):
+    # Długie okno paczki - wątek w tle nie zapisuje przed jawnym flush()
+    queue = WriteBehindQueue(flask_app, flush_interval=60, max_pending=10_000)
+    events = []
+    queue.subscribe(events.append)
+    queue.events = events
+    yield queue
+    queue.stop()
+
+
+def saved_ratings():
+    return {(r.user_id, r.movie_id): r.rating for r in Rating.query}
+
+
+def dropped(queue):
+    return [e for e in queue.events if isinstance(e, RatingDropped)]
+
+
+def test_flush_coalesces_ratings_and_skips_known_watches(queue):
+    queue.rate(1, 10, 3.0)
+    queue.rate(1, 10, 4.0)
+    queue.rate(2, 10, 5.0)
+    queue.watch(1, 10)
+    queue.watch(1, 10)
+    assert queue.pending_rating(1, 10) == 4.0
+
+    assert queue.flush() == 3
+    assert saved_ratings() == {(1, 10): 4.0, (2, 10): 5.0}
+    assert queue.pending_ratings() == []
+
+    queue.watch(1, 10)
+    assert queue.flush() == 1
+    assert WatchHistory.query.count() == 1
+
+
+def test_invalid_event_is_dropped_without_the_rest_of_the_batch(queue):
+    for user_id in range(1, 8):
+        queue.rate(user_id, 10, 4.0)
+    queue.rate(3, 20, None)   # NOT NULL - błąd danych tylko tego zdarzenia
+    queue.watch(5, 10)
+
+    assert queue.flush() == 8
+    assert saved_ratings() == {(user_id, 10): 4.0 for user_id in range(1, 8)}
+    assert WatchHistory.query.count() == 1
+    assert dropped(queue) == [RatingDropped(3, 20, None)]
+    assert queue.pending_ratings() == []
+
+
+def test_transient_errors_retry_whole_batch_then_drop_it(queue, monkeypatch):
+    calls = []
+
+    def locked(rating_events):
+        calls.append(len(rating_events))
+        raise OperationalError('INSERT', {}, Exception('database is locked'))
+
+    monkeypatch.setattr(write_behind, 'upsert_ratings', locked)
+    queue.rate(1, 10, 4.0)
+    queue.rate(2, 10, 3.0)
+
+    for _ in range(MAX_FLUSH_ATTEMPTS - 1):
+        assert queue.flush() == 0
+        assert len(queue.pending_ratings()) == 2
+    # Bez bisekcji - każda próba zapisuje całą paczkę
+    assert calls == [2] * (MAX_FLUSH_ATTEMPTS - 1)
+    assert dropped(queue) == []
+
+    assert queue.flush() == 0
+    assert queue.pending_ratings() == []
+    assert sorted(dropped(queue)) == [RatingDropped(1, 10, 4.0), RatingDropped(2, 10, 3.0)]
+
+
+def test_transient_error_during_bisection_requeues_batch(queue, monkeypatch):
+    upsert = write_behind.upsert_ratings
+    calls = []
+
+    def failing(rating_events):
+        calls.append(len(rating_events))
+        if len(calls) == 1:
+            raise ValueError('błędny wiersz')
+        if len(calls) == 3:
+            raise OperationalError('INSERT', {}, Exception('database is locked'))
+        upsert(rating_events)
+
+    monkeypatch.setattr(write_behind, 'upsert_ratings', failing)
+    for user_id in range(1, 5):
+        queue.rate(user_id, 10, 4.0)
+
+    assert queue.flush() == 0
+    assert calls == [4, 2, 2]
+    assert dropped(queue) == []
+    assert len(queue.pending_ratings()) == 4
+
+    monkeypatch.setattr(write_behind, 'upsert_ratings', upsert)
+    assert queue.flush() == 4
+    assert saved_ratings() == {(user_id, 10): 4.0 for user_id in range(1, 5)}
+
+
+def test_pending_ratings_include_batch_in_flight(queue, monkeypatch):
+    seen = []
+
+    def recording(rating_events):
+        seen.append(queue.pending_ratings(1))
+
+    monkeypatch.setattr(write_behind, 'upsert_ratings', recording)
+    queue.rate(1, 10, 4.0)
+    queue.flush()
+    assert [[(e.user_id, e.movie_id, e.rating) for e in pending] for pending in seen] == [[(1, 10, 4.0)]]